@@ -0,0 +1,267 @@
+"""Generate many decks headlessly from a CSV or JSONL manifest.
+
+Usage:
+    python batch_generate.py manifest.csv --out decks/ [--provider gemini] [--llm-concurrency 4]
+                             [--render-workers 2] [--renderer native] [--two-phase] [--no-cache]
+
+Each manifest row has a topic and optionally slide_count (default 5), instructions,
+brand (a brand JSON file relative to the manifest, or inline JSON) and id. LLM calls
+run on a thread pool, rendering on a process pool, and every finished item is
+appended to <out>/results.jsonl with its timings or error, the seconds spent in
+each stage, token counts and the slides whose text still overflows after font
+fitting. Items with more than LARGE_DECK_FROM content slides (default 30, up to
+300) run in large-deck mode (large_deck.py): sections, then chunks of slides
+rendered straight into the deck file on the LLM thread. Each item's traces can
+also be logged as JSON lines by setting TELEMETRY_LOG (see telemetry.py).
+Re-running the same command skips items that already have an "ok" record and a deck on disk, so an
+interrupted batch picks up where it stopped.
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+import telemetry
+from generation import DEFAULT_BRAND, generate_large, generate_slides
+from large_deck import LARGE_DECK_FROM
+from llm_providers import API_KEY_ENV, DEFAULT_MODELS
+from renderers import DEFAULT_RENDERER, RENDERERS
+
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    load_dotenv = None
+
+
+def load_manifest(path):
+    """Rows from a .csv (header row) or .jsonl manifest"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            return [dict(row) for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:60] or 'deck'
+
+
+def load_brand(value, base_dir):
+    """Brand from a JSON file or inline JSON, layered over the default EduBridge brand"""
+    if not value:
+        return DEFAULT_BRAND
+    if isinstance(value, str):
+        if value.lstrip().startswith('{'):
+            value = json.loads(value)
+        else:
+            with open(os.path.join(base_dir, value), encoding='utf-8') as f:
+                value = json.load(f)
+    return {**DEFAULT_BRAND, **value, 'colors': {**DEFAULT_BRAND['colors'], **value.get('colors', {})}}
+
+
+def prepare_items(rows, manifest_path):
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    items = []
+    for index, row in enumerate(rows, 1):
+        topic = (row.get('topic') or '').strip()
+        if not topic:
+            raise ValueError(f"Manifest row {index} has no topic")
+        items.append({
+            'id': str(row.get('id') or f"{index:04d}-{slugify(topic)}"),
+            'topic': topic,
+            'slide_count': int(row.get('slide_count') or 5),
+            'instructions': row.get('instructions') or '',
+            'brand': load_brand(row.get('brand'), base_dir),
+        })
+    ids = [item['id'] for item in items]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Manifest ids must be unique")
+    return items
+
+
+def completed_ids(results_path, out_dir):
+    """Ids with an ok record whose deck is still on disk"""
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get('status') == 'ok' and os.path.exists(os.path.join(out_dir, record.get('output', ''))):
+                done.add(record['id'])
+    return done
+
+
+def _init_render_process():
+    # One Node worker per render process; the process pool provides the parallelism
+    os.environ['PPTX_RENDER_WORKERS'] = '1'
+
+
+def stage_seconds(trace):
+    """{stage: seconds} for the top-level stages of a trace"""
+    return {row['stage']: row['seconds'] for row in trace.breakdown() if row['depth'] == 1}
+
+
+def render_item(item_id, slide_structure, brand_config, renderer):
+    from renderers import TEXT_FIT, render_deck
+    from text_fit import fit_deck
+    started = time.perf_counter()
+    overflow = []
+    with telemetry.trace('render', item=item_id, renderer=renderer) as trace:
+        if TEXT_FIT:
+            with telemetry.span('fit', slides=len(slide_structure['slides'])):
+                slide_structure, overflow = fit_deck(slide_structure, brand_config)
+        pptx_data = render_deck(slide_structure, brand_config, renderer, fit_text=False)
+    return (pptx_data, list(dict.fromkeys(number for number, _ in overflow)), time.perf_counter() - started,
+            stage_seconds(trace))
+
+
+def generate_item(item, args, api_key):
+    started = time.perf_counter()
+    with telemetry.trace('generate', item=item['id'], provider=args.provider, two_phase=args.two_phase) as trace:
+        slide_structure, failed, report = generate_slides(args.provider, api_key, item['topic'], item['slide_count'],
+                                                          item['instructions'], args.model, not args.no_cache,
+                                                          args.two_phase)
+    input_tokens, output_tokens = trace.tokens()
+    return (slide_structure, failed, report, time.perf_counter() - started, stage_seconds(trace),
+            {'input': input_tokens, 'output': output_tokens})
+
+
+def generate_large_item(item, args, api_key):
+    """Generate and render a large deck in one go, straight into its file in args.out"""
+    from renderers import DeckWriter
+    started = time.perf_counter()
+    path = os.path.join(args.out, f"{item['id']}.pptx")
+    try:
+        with telemetry.trace('generate', item=item['id'], provider=args.provider, large_deck=True) as trace, \
+                open(path + '.part', 'wb') as f:
+            writer = DeckWriter(item['brand'], f, args.renderer)
+            try:
+                _, failed, report = generate_large(args.provider, api_key, item['topic'], item['slide_count'],
+                                                   writer, item['instructions'], args.model, not args.no_cache)
+                writer.finish()
+            except Exception:
+                # Before the file is closed, so the zip isn't finished into it later
+                writer.close()
+                raise
+        os.replace(path + '.part', path)
+    except Exception:
+        # A failed item leaves no half-written deck behind
+        try:
+            os.remove(path + '.part')
+        except OSError:
+            pass
+        raise
+    input_tokens, output_tokens = trace.tokens()
+    return (writer.slide_count, failed, report, writer.overflow, time.perf_counter() - started, stage_seconds(trace),
+            {'input': input_tokens, 'output': output_tokens})
+
+
+def run_batch(args):
+    os.makedirs(args.out, exist_ok=True)
+    results_path = args.results or os.path.join(args.out, 'results.jsonl')
+    items = prepare_items(load_manifest(args.manifest), args.manifest)
+    done = completed_ids(results_path, args.out)
+    todo = [item for item in items if item['id'] not in done]
+    api_key = args.api_key or os.environ.get(API_KEY_ENV[args.provider], '')
+    if todo and not api_key:
+        raise SystemExit(f"Set {API_KEY_ENV[args.provider]} or pass --api-key")
+    print(f"{len(items)} items, {len(items) - len(todo)} already done, {len(todo)} to generate", file=sys.stderr)
+
+    counts = {'ok': 0, 'error': 0}
+    started = {}
+
+    def record(item, **fields):
+        entry = {'id': item['id'], 'topic': item['topic'], 'slide_count': item['slide_count'], **fields,
+                 'total_s': round(time.perf_counter() - started[item['id']], 3),
+                 'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+        results.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        results.flush()
+        counts[entry['status']] += 1
+        detail = entry.get('output') if entry['status'] == 'ok' else entry.get('error')
+        print(f"[{counts['ok'] + counts['error']}/{len(todo)}] {entry['status']:5} {item['id']} "
+              f"({entry['total_s']:.1f}s) {detail}", file=sys.stderr)
+
+    with open(results_path, 'a', encoding='utf-8') as results, \
+            concurrent.futures.ThreadPoolExecutor(args.llm_concurrency) as llm_pool, \
+            concurrent.futures.ProcessPoolExecutor(args.render_workers, mp_context=multiprocessing.get_context('spawn'),
+                                                   initializer=_init_render_process) as render_pool:
+        pending = {}
+        for item in todo:
+            started[item['id']] = time.perf_counter()
+            if item['slide_count'] > LARGE_DECK_FROM:
+                pending[llm_pool.submit(generate_large_item, item, args, api_key)] = ('large', item, None)
+            else:
+                pending[llm_pool.submit(generate_item, item, args, api_key)] = ('llm', item, None)
+        try:
+            while pending:
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    stage, item, info = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        record(item, status='error', stage=stage, error=f"{type(e).__name__}: {e}", **(info or {}))
+                        continue
+                    if stage == 'large':
+                        slides, failed, report, overflow, total_s, stages, tokens = result
+                        output = f"{item['id']}.pptx"
+                        record(item, status='ok', output=output, llm_s=round(total_s, 3),
+                               bytes=os.path.getsize(os.path.join(args.out, output)), slides=slides,
+                               failed_slides=[n for n, _ in failed], repair=report,
+                               overflow_slides=list(dict.fromkeys(number for number, _ in overflow)),
+                               stages=stages, tokens=tokens)
+                    elif stage == 'llm':
+                        slide_structure, failed, report, llm_s, stages, tokens = result
+                        info = {'llm_s': round(llm_s, 3), 'failed_slides': [n for n, _ in failed], 'repair': report,
+                                'stages': stages, 'tokens': tokens}
+                        render_future = render_pool.submit(render_item, item['id'], slide_structure, item['brand'],
+                                                           args.renderer)
+                        pending[render_future] = ('render', item, dict(info, slides=len(slide_structure['slides'])))
+                    else:
+                        pptx_data, overflow_slides, render_s, stages = result
+                        output = f"{item['id']}.pptx"
+                        with open(os.path.join(args.out, output), 'wb') as f:
+                            f.write(pptx_data)
+                        info['stages'] = dict(info['stages'], **stages)
+                        record(item, status='ok', output=output, render_s=round(render_s, 3),
+                               bytes=len(pptx_data), overflow_slides=overflow_slides, **info)
+        except KeyboardInterrupt:
+            for future in pending:
+                future.cancel()
+            print("Interrupted; re-run the same command to resume", file=sys.stderr)
+            raise
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate decks from a CSV/JSONL manifest")
+    parser.add_argument('manifest', help="CSV with a header row, or JSONL")
+    parser.add_argument('--out', default='decks', help="Output directory for decks and results.jsonl")
+    parser.add_argument('--results', help="Results JSONL path (default <out>/results.jsonl)")
+    parser.add_argument('--provider', choices=sorted(DEFAULT_MODELS), default='gemini')
+    parser.add_argument('--model', help="Model name (default depends on provider)")
+    parser.add_argument('--api-key', help="API key (default from ANTHROPIC_API_KEY / GOOGLE_API_KEY)")
+    parser.add_argument('--llm-concurrency', type=int, default=4, help="Decks generated at once")
+    parser.add_argument('--render-workers', type=int, default=min(4, os.cpu_count() or 1), help="Render processes")
+    parser.add_argument('--renderer', choices=RENDERERS, default=DEFAULT_RENDERER)
+    parser.add_argument('--two-phase', action='store_true', help="Outline first, then slides in parallel")
+    parser.add_argument('--no-cache', action='store_true', help="Skip the LLM response cache")
+    args = parser.parse_args(argv)
+    if load_dotenv:
+        load_dotenv()
+    counts = run_batch(args)
+    print(f"done: {counts['ok']} ok, {counts['error']} failed", file=sys.stderr)
+    return 1 if counts['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""File size and render time with the brand compiled into the slide layout.
+
+Usage: python benchmarks/bench_brand_master.py [slides ...]
+
+For decks of each size (default 10, 50, 200 slides cycled from the all-layouts
+fixture) this renders:
+
+- inline:  the native engine with the brand header, footer and background
+           repeated on every slide, as both engines used to draw them
+- native:  the native engine with the brand on the slide layout
+- node:    pptxgenjs with the brand on a slide master
+
+The slide cache is bypassed so every run renders every slide.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pptx_native  # noqa: E402
+from render_pool import get_render_pool  # noqa: E402
+from text_fit import fit_deck  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'all_layouts.json')
+REPEATS = 5
+
+
+def render_inline(slide_structure, brand_config):
+    builder = pptx_native.PptxBuilder(brand_config)
+    chrome = pptx_native.brand_master(builder.theme)
+    for slide in slide_structure['slides']:
+        s = pptx_native.build_slide(slide, builder.theme)
+        s.background = chrome.background
+        # Header first and footer last, the order the per-slide helpers drew them in
+        s.shapes = chrome.shapes[:4] + s.shapes + chrome.shapes[4:]
+        builder.add_slide_xml(s.to_xml(builder.slide_count + 1))
+    return builder.finish()
+
+
+def timed(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        data = fn()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[REPEATS // 2] * 1000, len(data)
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [10, 50, 200]
+    with open(FIXTURE, encoding='utf-8') as f:
+        fixture = json.load(f)
+    base, brand = fixture['slides']['slides'], fixture['brand']
+    pool = get_render_pool()
+    print(f"{'slides':>6}  {'engine':8}{'ms':>10}{'KB':>10}")
+    for n in sizes:
+        deck = {'slides': [dict(base[i % len(base)], slideNumber=i + 1) for i in range(n)]}
+        deck, _ = fit_deck(deck, brand)
+        pool.render_deck(deck, brand)   # warm up
+        for name, fn in (('inline', lambda: render_inline(deck, brand)),
+                         ('native', lambda: pptx_native.render_deck(deck, brand)),
+                         ('node', lambda: pool.render_deck(deck, brand))):
+            ms, size = timed(fn)
+            print(f"{n:>6}  {name:8}{ms:>10.1f}{size / 1024:>10.1f}")
+    print(f"compiled layouts cached: {pptx_native._compile_layout.cache_info().currsize}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Memory and time of a 100-300 slide deck, single-shot versus large-deck mode.
+
+Usage: python benchmarks/bench_large_deck.py [--slides 100,300] [--renderers node,native] [--out results.json]
+
+For each deck size and engine, two modes run in their own Python process so
+peak RSS belongs to that run alone:
+
+- single  generate_slides() with the whole deck in one reply, then
+          render_deck() to bytes and a file. Real providers can't return this
+          many slides under max_tokens; the stub ignores the limit so the
+          memory of holding everything at once can be measured
+- large   generate_large() writing chunk by chunk through a DeckWriter into
+          the file (large_deck.py)
+
+The provider is fake_llm_server's reply builder with no latency, patched in
+for llm_providers.text_stream, and the LLM and slide caches are off. Reported
+per run: seconds, peak RSS of the Python process, peak traced Python heap
+(tracemalloc), the Node worker's peak RSS, the file size, and the Python RSS
+after every 50 slides and once the file is written.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(BASE_DIR, 'fixtures', 'all_layouts.json')
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+SAMPLE_EVERY = 50
+
+
+def current_rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def peak_rss():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def run_case(mode, slides, renderer):
+    os.environ.update(LLM_CACHE_PATH=':memory:', SLIDE_CACHE_MAX_MB='0', PPTX_RENDER_WORKERS='1', TELEMETRY_LOG='0')
+    sys.path.insert(0, BASE_DIR)
+    import llm_providers
+    from fake_llm_server import FakeLLM
+    from generation import generate_large, generate_slides
+    from render_pool import get_render_pool
+    from renderers import DeckWriter, render_deck
+
+    fake = FakeLLM()
+
+    def text_stream(provider, api_key, model, prompt, max_tokens=None, schema=None):
+        text, _ = fake.render(prompt, bool(schema), None)
+        for i in range(0, len(text), 256):
+            yield text[i:i + 256]
+    llm_providers.text_stream = text_stream
+    with open(FIXTURE, encoding='utf-8') as f:
+        brand = json.load(f)['brand']
+    pool = get_render_pool() if renderer == 'node' else None
+    if pool:
+        render_deck({'slides': [{'slideNumber': 1, 'title': 'Warm up', 'isTitle': True}]}, brand, 'node')
+
+    samples = []
+
+    def on_slide(slide):
+        if slide.get('slideNumber', 0) % SAMPLE_EVERY == 0:
+            samples.append((slide['slideNumber'], current_rss()))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'deck.pptx')
+        if mode == 'single':
+            structure, failed, _ = generate_slides('gemini', 'bench', 'Large deck benchmark', slides,
+                                                   use_cache=False, on_slide=on_slide)
+            data = render_deck(structure, brand, renderer)
+            with open(path, 'wb') as f:
+                f.write(data)
+        else:
+            with open(path, 'wb') as f:
+                writer = DeckWriter(brand, f, renderer)
+                _, failed, _ = generate_large('gemini', 'bench', 'Large deck benchmark', slides, writer,
+                                              use_cache=False, on_slide=on_slide)
+                writer.finish()
+        seconds = time.perf_counter() - started
+        samples.append((slides + 1, current_rss()))
+        size = os.path.getsize(path)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {'mode': mode, 'slides': slides + 1, 'renderer': renderer, 'failed': len(failed), 'seconds': seconds,
+              'bytes': size, 'python_peak_rss': peak_rss(), 'python_heap_peak': heap_peak,
+              'node_peak_rss': max(pool.peak_rss(), default=None) if pool else None, 'rss_by_slide': samples}
+    if pool:
+        pool.close()
+    return result
+
+
+def _mb(n):
+    return f"{n / 1024 / 1024:.1f}" if n else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory of large decks, single-shot versus large-deck mode")
+    parser.add_argument('--slides', default='100,300', help="Comma-separated content slide counts")
+    parser.add_argument('--renderers', default='node,native')
+    parser.add_argument('--out', help="Results JSON (default benchmarks/results/large-deck-<timestamp>.json)")
+    parser.add_argument('--run-case', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        mode, slides, renderer = args.run_case
+        print(json.dumps(run_case(mode, int(slides), renderer)))
+        return 0
+
+    results = []
+    print(f"{'slides':>6}  {'engine':7}{'mode':7}{'s':>7}{'py RSS MB':>11}{'py heap MB':>11}{'node RSS MB':>12}"
+          f"{'KB':>8}  RSS MB every {SAMPLE_EVERY} slides")
+    for slides in [int(n) for n in args.slides.split(',')]:
+        for renderer in args.renderers.split(','):
+            for mode in ('single', 'large'):
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', mode, str(slides),
+                                       renderer], capture_output=True, text=True, cwd=BASE_DIR)
+                if proc.returncode:
+                    print(f"{slides:>6}  {renderer:7}{mode:7} ERROR {proc.stderr.strip().splitlines()[-1:]}")
+                    continue
+                case = json.loads(proc.stdout.strip().splitlines()[-1])
+                results.append(case)
+                curve = ' '.join(_mb(rss) for _, rss in case['rss_by_slide'])
+                print(f"{case['slides']:>6}  {renderer:7}{mode:7}{case['seconds']:>7.2f}{_mb(case['python_peak_rss']):>11}"
+                      f"{_mb(case['python_heap_peak']):>11}{_mb(case['node_peak_rss']):>12}{case['bytes'] / 1024:>8.0f}"
+                      f"  {curve}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"large-deck-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'created': datetime.now().isoformat(timespec='seconds'), 'cases': results}, f, indent=2)
+    print(f"results written to {out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Re-render cost with the slide cache: whole deck vs one edited slide.
+
+Usage: python benchmarks/bench_slide_cache.py [renderer] [iterations]
+
+Renders a 10-slide deck built from the all-layouts fixture cold, then again
+unchanged, then with one slide's title edited, then with one brand color
+changed (which touches every slide). Each edit is new text, so every "edit"
+run is a real miss for exactly one slide.
+"""
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renderers import render_deck  # noqa: E402
+from slide_cache import get_slide_cache  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'all_layouts.json')
+
+
+def ten_slides(slide_structure):
+    slides = list(slide_structure['slides'])
+    for extra in slides[1:3]:
+        slides.append(dict(extra, title=extra['title'] + ' (recap)'))
+    return {'slides': [dict(slide, slideNumber=n) for n, slide in enumerate(slides, 1)]}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    renderer = sys.argv[1] if len(sys.argv) > 1 else 'node'
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with open(FIXTURE, encoding='utf-8') as f:
+        fixture = json.load(f)
+    deck, brand = ten_slides(fixture['slides']), fixture['brand']
+    cache = get_slide_cache()
+    render_deck(deck, brand, renderer)   # warm the worker pool
+    cache.clear()
+
+    results = {'cold (10 misses)': [], 'unchanged (10 hits)': [], 'one slide edited': [], 'brand color changed': []}
+    for i in range(iterations):
+        cache.clear()
+        results['cold (10 misses)'].append(timed(lambda: render_deck(deck, brand, renderer)))
+        results['unchanged (10 hits)'].append(timed(lambda: render_deck(deck, brand, renderer)))
+        edited = copy.deepcopy(deck)
+        edited['slides'][4]['title'] += f' v{i}'
+        results['one slide edited'].append(timed(lambda: render_deck(edited, brand, renderer)))
+        recolored = dict(brand, colors=dict(brand['colors'], coral=f'F961{i:02d}'))
+        results['brand color changed'].append(timed(lambda: render_deck(deck, recolored, renderer)))
+
+    print(f"renderer: {renderer}, {iterations} iterations, median ms")
+    for name, times in results.items():
+        print(f"{name:22}{sorted(times)[len(times) // 2]:>10.2f}")
+    stats = cache.summary()
+    print(f"hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses), "
+          f"{stats['entries']} parts, {stats['bytes'] / 1024:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Cost of fitting text before rendering, for a batch of distinct decks.
+
+Usage: python benchmarks/bench_text_fit.py [decks]
+
+Every deck is the all-layouts fixture with a deck number appended to each title
+and list entry, so content text is never repeated between decks while the brand
+header and footer are, as in a real batch. Reports the cold (empty cache) time
+for the whole batch and the per-deck cost next to a native render.
+"""
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pptx_native  # noqa: E402
+import text_fit  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'all_layouts.json')
+
+
+def make_decks(slide_structure, count):
+    decks = []
+    for i in range(count):
+        deck = copy.deepcopy(slide_structure)
+        for slide in deck['slides']:
+            slide['title'] = f"{slide['title']} {i}"
+            for name, value in (slide.get('content') or {}).items():
+                if isinstance(value, list):
+                    slide['content'][name] = [f"{v} ({i})" if isinstance(v, str) else v for v in value]
+        decks.append(deck)
+    return decks
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with open(FIXTURE, encoding='utf-8') as f:
+        fixture = json.load(f)
+    decks = make_decks(fixture['slides'], count)
+
+    text_fit.word_units.cache_clear()
+    text_fit.fit_font_size.cache_clear()
+    start = time.perf_counter()
+    shrunk = overflow = 0
+    for deck in decks:
+        fitted, texts = text_fit.fit_deck(deck, fixture['brand'])
+        shrunk += sum(len(s.get('fontSizes', {})) for s in fitted['slides'])
+        overflow += len(texts)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for deck in decks[:20]:
+        pptx_native.render_deck(deck, fixture['brand'])
+    render_ms = (time.perf_counter() - start) / min(count, 20) * 1000
+
+    slides = sum(len(d['slides']) for d in decks)
+    print(f"{count} decks, {slides} slides: fit in {fit_s:.2f}s ({fit_s / count * 1000:.2f} ms/deck)")
+    print(f"native render: {render_ms:.2f} ms/deck")
+    print(f"frames shrunk: {shrunk}, still overflowing: {overflow}")
+    print(f"word cache: {text_fit.word_units.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Per-request render cost: copytree(node_modules) vs the shared render workspace vs the worker pool.
+
+Usage: python benchmarks/bench_workspace.py [iterations]
+
+All three render the same deck (fixtures/all_layouts.json) end to end, node
+process and IPC included:
+
+- copytree   the old per-request path: a temp dir with its own copy of
+             node_modules and the renderer script, the job written to disk,
+             one node process per deck and the PPTX read back from disk
+- workspace  RenderWorkspace.render_once(): one node process per deck that
+             resolves pptxgenjs from the shared install through NODE_PATH,
+             job in over stdin and PPTX out over stdout
+- pool       a warm render worker (render_pool), as the apps use it
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from render_pool import RenderPool  # noqa: E402
+from render_workspace import DECK_RENDERER, RenderWorkspace  # noqa: E402
+
+FIXTURE = os.path.join(BASE_DIR, 'fixtures', 'all_layouts.json')
+
+
+def tree_size(path):
+    files = size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def copytree_render(node_src, slides, brand):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        shutil.copytree(node_src, os.path.join(temp_dir, 'node_modules'))
+        shutil.copy(DECK_RENDERER, temp_dir)
+        with open(os.path.join(temp_dir, 'job.json'), 'w', encoding='utf-8') as f:
+            json.dump({'slides': slides, 'brand': brand}, f)
+        # No NODE_PATH, so require() can only resolve from the copy
+        env = {k: v for k, v in os.environ.items() if k != 'NODE_PATH'}
+        subprocess.run(['node', os.path.basename(DECK_RENDERER), 'job.json', 'output.pptx'], cwd=temp_dir, env=env,
+                       check=True, capture_output=True, timeout=90)
+        with open(os.path.join(temp_dir, 'output.pptx'), 'rb') as f:
+            return f.read()
+
+
+def bench(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        data = fn()
+    return (time.perf_counter() - start) / iterations * 1000, len(data)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with open(FIXTURE, encoding='utf-8') as f:
+        fixture = json.load(f)
+    slides, brand = fixture['slides'], fixture['brand']
+    workspace = RenderWorkspace(debug_dir='')
+    pool = RenderPool(size=1, health_interval=0, workspace=workspace)
+    files, size = tree_size(workspace.node_modules)
+    try:
+        rows = [
+            ('copytree', bench(lambda: copytree_render(workspace.node_modules, slides, brand), iterations),
+             files + 3, size),
+            ('workspace', bench(lambda: workspace.render_once(slides, brand), iterations), 0, 0),
+            ('pool', bench(lambda: pool.render_deck(slides, brand), iterations), 0, 0),
+        ]
+    finally:
+        pool.close()
+
+    print(f"node_modules: {workspace.node_modules} ({files} files, {size / 1024 / 1024:.1f} MiB)")
+    print(f"deck: {len(slides['slides'])} slides, {iterations} renders each")
+    print(f"{'':12}{'ms/deck':>10}{'pptx bytes':>12}{'files written':>16}{'bytes copied':>14}")
+    for name, (ms, pptx_size), written, copied in rows:
+        print(f"{name:12}{ms:>10.1f}{pptx_size:>12}{written:>16}{copied:>14}")
+    base = rows[0][1][0]
+    print(f"speedup vs copytree: workspace {base / rows[1][1][0]:.1f}x, pool {base / rows[2][1][0]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""Load test of the Generate button's pipeline with concurrent simulated users.
+
+Usage:
+    python benchmarks/load_test.py [--users 1,2,4,8,16] [--duration 20] [--slides 5] [--renderer node]
+                                   [--job-workers 4] [--ttft lognormal:800:0.5] [--chunk-delay fixed:5]
+                                   [--rate-429 0] [--retry-after 1] [--overload-rate 0] [--down anthropic]
+                                   [--truncate-rate 0] [--malformed-rate 0]
+                                   [--provider-url http://127.0.0.1:8765] [--out report.json]
+                                   [--compare earlier.json]
+
+Each simulated user does what a trainer clicking Generate does in app.py: it
+submits a job to the shared job queue, polls its status until the deck is done
+and submits the next one, for --duration seconds per concurrency level. Levels
+run one after another in the same process, like one app instance picking up
+more users.
+
+The provider is stubbed in-process with fake_llm_server's reply builder and
+latency and fault draws, so nothing leaves the machine and no SDK is needed.
+With --provider-url the real SDKs are used instead, pointed at a running
+fake_llm_server.py (or anything else speaking the provider APIs).
+
+Per level the report has decks per minute, p50/p95/p99 of each stage (queue
+wait, first slide, total, and every traced stage: llm, parse, fit, render,
+node_render, ...), errors by message and queue rejections, and the peak RSS
+and open file descriptors of this process plus its Node workers. The report
+ends with the provider gateway's state per lane (retries, 429s, failovers,
+circuit opens, AIMD limit; see provider_gateway.py). Reports go
+to benchmarks/results/ as JSON; --compare prints the change against an
+earlier one.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(BASE_DIR, 'fixtures', 'all_layouts.json')
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+PERCENTILES = (50, 95, 99)
+SAMPLE_INTERVAL = 0.2
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of values (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(p / 100 * len(ordered)))) - 1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return children
+
+
+def process_usage():
+    """(rss bytes, open fds) of this process plus its children, or (None, None) without /proc"""
+    if not os.path.isdir('/proc/self/fd'):
+        return None, None
+    page = os.sysconf('SC_PAGE_SIZE')
+    rss = fds = 0
+    for pid in [os.getpid()] + _children(os.getpid()):
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                rss += int(f.read().split()[1]) * page
+            fds += len(os.listdir(f'/proc/{pid}/fd'))
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss, fds
+
+
+class Sampler:
+    """Background thread recording peak RSS and open fds while a level runs"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_rss = self.peak_fds = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            rss, fds = process_usage()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+                self.peak_fds = max(self.peak_fds or 0, fds)
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class StubProviderError(RuntimeError):
+    """What the stubbed provider raises for a drawn 429 (with retry_after) or overload"""
+
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def stub_provider(fake):
+    """A stand-in for llm_providers.text_stream that streams fake's replies with its latency and faults"""
+    import telemetry
+    from slide_repair import CHARS_PER_TOKEN
+
+    def text_stream(provider, api_key, model, prompt, max_tokens=None, schema=None):
+        fault, ttft = fake.draw(provider)
+        fake.count('requests', provider, 'streamed', *([fault] if fault else []))
+        if fault == 'rate_limited':
+            time.sleep(min(ttft, 0.05))
+            raise StubProviderError(f"429 from the stubbed {provider} provider", 429, fake.retry_after)
+        if fault == 'overloaded':
+            time.sleep(min(ttft, 0.05))
+            raise StubProviderError(f"529 from the stubbed {provider} provider", 529)
+        text, _ = fake.render(prompt, bool(schema), fault, max_tokens)
+        time.sleep(ttft)
+        for i, chunk in enumerate(fake.chunks(text)):
+            if i:
+                time.sleep(fake.delay())
+            yield chunk
+        telemetry.annotate(input_tokens=len(prompt) // CHARS_PER_TOKEN, output_tokens=len(text) // CHARS_PER_TOKEN)
+    return text_stream
+
+
+def simulated_user(queue, brand, args, user, deadline, results, lock):
+    """Generate decks back to back until the deadline, recording each finished job's snapshot"""
+    from job_queue import QueueFull
+    n = 0
+    while time.monotonic() < deadline:
+        n += 1
+        topic = f"Load test user {user} deck {n}"
+        try:
+            job_id = queue.submit(args.provider, 'load-test', topic, args.slides, brand, use_cache=False,
+                                  two_phase=args.two_phase, renderer=args.renderer)
+        except QueueFull:
+            with lock:
+                results['rejected'] += 1
+            time.sleep(args.poll * 10)
+            continue
+        while True:
+            job = queue.status(job_id)
+            if job is None or job['status'] in ('done', 'failed'):
+                break
+            time.sleep(args.poll)
+        with lock:
+            results['jobs'].append(job)
+
+
+def summarize(jobs, rejected, elapsed):
+    stages = defaultdict(list)
+    errors = Counter()
+    for job in jobs:
+        if job is None:
+            errors['expired before it was read'] += 1
+            continue
+        if job['status'] == 'failed':
+            errors[(job['error'] or 'unknown').splitlines()[0][:120]] += 1
+            continue
+        stages['queue_wait'].append(job['started'] - job['created'])
+        stages['total'].append(job['finished'] - job['created'])
+        if 'first_slide_s' in job['timings']:
+            stages['first_slide'].append(job['timings']['first_slide_s'])
+        per_job = defaultdict(float)
+        for row in job['stages']:
+            per_job[row['stage']] += row['seconds']
+        for stage, seconds in per_job.items():
+            stages[stage].append(seconds)
+    ok = len(stages.get('total', []))
+    return {
+        'jobs': len(jobs), 'ok': ok, 'failed': sum(errors.values()), 'rejected': rejected,
+        'error_rate': round(sum(errors.values()) / len(jobs), 4) if jobs else 0.0,
+        'elapsed_s': round(elapsed, 3), 'decks_per_min': round(ok / elapsed * 60, 2) if elapsed else 0.0,
+        'stages': {stage: dict({f'p{p}': round(percentile(values, p), 4) for p in PERCENTILES}, n=len(values))
+                   for stage, values in stages.items()},
+        'errors': dict(errors.most_common()),
+    }
+
+
+def run_level(users, brand, args):
+    from job_queue import get_job_queue
+    queue = get_job_queue()
+    results = {'jobs': [], 'rejected': 0}
+    lock = threading.Lock()
+    started = time.monotonic()
+    deadline = started + args.duration
+    with Sampler() as sampler:
+        threads = [threading.Thread(target=simulated_user, args=(queue, brand, args, user, deadline, results, lock),
+                                    daemon=True) for user in range(1, users + 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    level = summarize(results['jobs'], results['rejected'], time.monotonic() - started)
+    level.update(users=users, peak_rss=sampler.peak_rss, peak_fds=sampler.peak_fds)
+    return level
+
+
+def compare(report, earlier):
+    """Lines with the change in throughput, p95 total and peak RSS per concurrency level"""
+    before = {level['users']: level for level in earlier.get('levels', [])}
+    lines = []
+    for level in report['levels']:
+        old = before.get(level['users'])
+        if not old:
+            continue
+        changes = []
+        for label, get in (('decks/min', lambda lv: lv['decks_per_min']),
+                           ('p95 total', lambda lv: lv['stages'].get('total', {}).get('p95')),
+                           ('error rate', lambda lv: lv['error_rate']),
+                           ('peak RSS', lambda lv: lv['peak_rss'])):
+            new_value, old_value = get(level), get(old)
+            if old_value and new_value is not None:
+                changes.append(f"{label} {(new_value - old_value) / old_value:+.0%}")
+        lines.append(f"{level['users']:>5} users  " + ', '.join(changes))
+    return lines
+
+
+def _ms(value):
+    return f"{value * 1000:.0f}" if value is not None else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the generation pipeline with concurrent users")
+    parser.add_argument('--users', default='1,2,4,8', help="Comma-separated concurrency levels to ramp through")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds per level")
+    parser.add_argument('--slides', type=int, default=5, help="Content slides per deck")
+    parser.add_argument('--provider', choices=('gemini', 'anthropic'), default='gemini')
+    parser.add_argument('--renderer', choices=('node', 'native'), default=None)
+    parser.add_argument('--two-phase', action='store_true', help="Outline first, then slides in parallel")
+    parser.add_argument('--job-workers', type=int, help="JOB_WORKERS for the job queue (default: the app's)")
+    parser.add_argument('--poll', type=float, default=0.05, help="Seconds between status polls")
+    parser.add_argument('--ttft', default='lognormal:800:0.5', help="Stub time to first token (ms)")
+    parser.add_argument('--chunk-delay', default='fixed:5', help="Stub delay between streamed chunks (ms)")
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1, help="Stub retry-after seconds sent with 429s")
+    parser.add_argument('--overload-rate', type=float, default=0.0)
+    parser.add_argument('--down', default='', help="Providers whose every stub request is overloaded")
+    parser.add_argument('--truncate-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--provider-url', help="Use the real SDKs against this server instead of the in-process stub")
+    parser.add_argument('--out', help="Report JSON (default benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier report to compare against")
+    args = parser.parse_args(argv)
+
+    # Settings read at import time go in before the app's modules are loaded
+    os.environ.setdefault('TELEMETRY_LOG', '0')
+    os.environ['LLM_CACHE_PATH'] = ':memory:'
+    if args.job_workers:
+        os.environ['JOB_WORKERS'] = str(args.job_workers)
+    if args.provider_url:
+        os.environ['LLM_BASE_URL'] = args.provider_url
+    sys.path.insert(0, BASE_DIR)
+    import job_queue
+    import llm_providers
+    from fake_llm_server import FakeLLM
+    from provider_gateway import get_gateway
+    from render_pool import get_render_pool
+    from renderers import DEFAULT_RENDERER
+
+    fake = None
+    if not args.provider_url:
+        fake = FakeLLM(args.ttft, args.chunk_delay, 40, args.rate_429, args.retry_after, args.truncate_rate,
+                       args.malformed_rate, seed=args.seed, overload_rate=args.overload_rate,
+                       down=[p for p in args.down.split(',') if p])
+        llm_providers.text_stream = stub_provider(fake)
+    with open(FIXTURE, encoding='utf-8') as f:
+        brand = json.load(f)['brand']
+    renderer = args.renderer or DEFAULT_RENDERER
+    if renderer == 'node':
+        get_render_pool()   # start the workers before the first level, as the app does on its first render
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'config': dict(vars(args), renderer=renderer, job_workers=job_queue.JOB_WORKERS,
+                       job_queue_depth=job_queue.JOB_QUEUE_DEPTH,
+                       provider_stub=None if args.provider_url else 'in-process'),
+        'levels': [],
+    }
+    print(f"{'users':>5}{'decks':>7}{'fail':>6}{'rej':>6}{'decks/min':>11}{'queue p95':>11}{'llm p95':>9}"
+          f"{'render p95':>12}{'total p50':>11}{'p95':>7}{'p99':>7}{'RSS MB':>8}{'fds':>6}   (ms)")
+    for users in [int(u) for u in args.users.split(',')]:
+        level = run_level(users, brand, args)
+        report['levels'].append(level)
+        p95 = lambda stage: level['stages'].get(stage, {}).get('p95')   # noqa: E731
+        total = level['stages'].get('total', {})
+        print(f"{users:>5}{level['ok']:>7}{level['failed']:>6}{level['rejected']:>6}{level['decks_per_min']:>11.1f}"
+              f"{_ms(p95('queue_wait')):>11}{_ms(p95('llm')):>9}{_ms(p95('render')):>12}{_ms(total.get('p50')):>11}"
+              f"{_ms(total.get('p95')):>7}{_ms(total.get('p99')):>7}"
+              f"{(level['peak_rss'] or 0) / 1024 / 1024:>8.0f}{level['peak_fds'] or 0:>6}")
+        for error, count in level['errors'].items():
+            print(f"       {count} x {error}")
+    report['python_peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (
+        1 if sys.platform == 'darwin' else 1024)
+    if fake:
+        report['provider_stats'] = dict(fake.stats)
+    report['gateway'] = get_gateway().summary()
+    for name, lane in report['gateway'].items():
+        print(f"gateway {name}: limit {lane['limit']}, {lane['retries']} retries, {lane['rate_limited']} x 429, "
+              f"{lane['overloaded']} overloaded, {lane['failovers']} failovers, circuit {lane['circuit']} "
+              f"(opened {lane['circuit_opens']}x), throttled {lane['throttled_s']:.1f}s, "
+              f"backoff {lane['backoff_s']:.1f}s")
+    job_queue.get_job_queue().close()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {out}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            earlier = json.load(f)
+        print(f"\nchange against {args.compare} ({earlier.get('created', '?')}):")
+        print('\n'.join(compare(report, earlier)) or 'no concurrency levels in common')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""Benchmark suite for the generation and render pipeline, with the LLM replayed.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--cases deck_6,deck_50] [--repeat 3] [--out results.json]
+                                        [--compare earlier.json]
+
+Cases are built from fixtures/all_layouts.json:
+
+- layout_<name>  the title slide plus one slide of that layout (one case per layout)
+- title          the title slide alone
+- deck_6, deck_50, deck_500
+                 a title slide plus content slides cycling through every layout
+
+Each case runs in its own Python process (with one Node worker) so peak RSS
+belongs to that case alone. Stages are timed separately:
+
+- llm       generate_slides() with the provider stream replaced by the case's
+            slide structure replayed as a model would stream it (fenced JSON in
+            small chunks): parsing, streaming callbacks and slide validation,
+            no network and no response cache
+- prepare   text fitting and encoding the render job. This is the stage that
+            used to generate JavaScript source per deck
+- node      rendering on the warm pptxgenjs worker (no slide cache)
+- native    rendering with the pure-Python engine (no slide cache)
+
+Timings are the median (and min) of --repeat runs. Results, zip sizes and the
+peak RSS of the Python process and the Node worker go to a JSON file; pass an
+earlier file with --compare to print the change per case.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(BASE_DIR, 'fixtures', 'all_layouts.json')
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+DECK_SIZES = (6, 50, 500)
+CHUNK_CHARS = 64
+METRICS = ('llm_s', 'prepare_s', 'node_s', 'native_s', 'node_bytes', 'native_bytes', 'python_peak_rss',
+           'node_peak_rss')
+
+
+def load_fixture():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_cases(fixture):
+    """{case name: slide structure}"""
+    slides = fixture['slides']['slides']
+    title = next(s for s in slides if s.get('isTitle'))
+    content = [s for s in slides if not s.get('isTitle')]
+    cases = {f"layout_{s['layout']}": [title, s] for s in content}
+    cases['title'] = [title]
+    for size in DECK_SIZES:
+        cases[f'deck_{size}'] = [title] + [content[i % len(content)] for i in range(size - 1)]
+    return {name: {'slides': [dict(s, slideNumber=n) for n, s in enumerate(deck, 1)]} for name, deck in cases.items()}
+
+
+def recorded_stream(slide_structure):
+    """A stand-in for llm_providers.text_stream that replays slide_structure as streamed model output"""
+    text = f"```json\n{json.dumps(slide_structure, ensure_ascii=False, indent=2)}\n```"
+
+    def text_stream(*args, **kwargs):
+        for i in range(0, len(text), CHUNK_CHARS):
+            yield text[i:i + CHUNK_CHARS]
+    return text_stream
+
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2], min(times), result
+
+
+def run_case(name, repeat):
+    """Time every stage of one case in this process; returns its result dict"""
+    os.environ['LLM_CACHE_PATH'] = ':memory:'
+    os.environ['PPTX_RENDER_WORKERS'] = '1'
+    sys.path.insert(0, BASE_DIR)
+    import generation
+    import llm_providers
+    import pptx_native
+    from render_pool import get_render_pool
+    from text_fit import fit_deck
+
+    fixture = load_fixture()
+    brand = fixture['brand']
+    structure = build_cases(fixture)[name]
+    content_slides = len(structure['slides']) - 1
+    llm_providers.text_stream = recorded_stream(structure)
+    pool = get_render_pool()
+    pool.render_deck({'slides': structure['slides'][:1]}, brand)   # start the worker outside the timings
+
+    result = {'slides': len(structure['slides']), 'repeat': repeat}
+    llm_s, llm_min, (generated, failed, _) = timed(
+        lambda: generation.generate_slides('gemini', 'replay', name, content_slides, use_cache=False), repeat)
+    if failed or len(generated['slides']) != len(structure['slides']):
+        raise RuntimeError(f"{name}: replayed deck came back with {len(generated['slides'])} slides, failed {failed}")
+
+    def prepare():
+        fitted, _ = fit_deck(generated, brand)
+        json.dumps({'op': 'render', 'slides': fitted, 'brand': brand})
+        return fitted
+    prepare_s, prepare_min, fitted = timed(prepare, repeat)
+    node_s, node_min, node_data = timed(lambda: pool.render_deck(fitted, brand), repeat)
+    native_s, native_min, native_data = timed(lambda: pptx_native.render_deck(fitted, brand), repeat)
+
+    result.update(
+        llm_s=llm_s, llm_min_s=llm_min, prepare_s=prepare_s, prepare_min_s=prepare_min,
+        node_s=node_s, node_min_s=node_min, native_s=native_s, native_min_s=native_min,
+        node_bytes=len(node_data), native_bytes=len(native_data),
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        python_peak_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+        node_peak_rss=max(pool.peak_rss(), default=None),
+        renderer_version=pool.renderer_version, native_renderer_version=pptx_native.NATIVE_RENDERER_VERSION,
+    )
+    pool.close()
+    return result
+
+
+def compare(results, earlier):
+    """Lines showing the change of every metric against an earlier results file"""
+    lines = []
+    for name, case in results['cases'].items():
+        before = earlier.get('cases', {}).get(name)
+        if not before or 'error' in case or 'error' in before:
+            continue
+        changes = []
+        for metric in METRICS:
+            old, new = before.get(metric), case.get(metric)
+            if old and new is not None:
+                changes.append(f"{metric} {(new - old) / old:+.0%}")
+        lines.append(f"{name:28} " + ', '.join(changes))
+    return lines
+
+
+def _fmt_bytes(n):
+    return f"{n / 1024 / 1024:.1f}M" if n else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the generation and render pipeline")
+    parser.add_argument('--cases', help="Comma-separated case names (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the median is reported")
+    parser.add_argument('--out', help="Results JSON (default benchmarks/results/bench-<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier results JSON to compare against")
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.repeat)))
+        return 0
+
+    names = list(build_cases(load_fixture()))
+    if args.cases:
+        unknown = set(args.cases.split(',')) - set(names)
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}; choose from {', '.join(names)}")
+        names = [n for n in names if n in args.cases.split(',')]
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'node': subprocess.run(['node', '--version'], capture_output=True, text=True).stdout.strip(),
+        'repeat': args.repeat,
+        'cases': {},
+    }
+    print(f"{'case':28}{'slides':>7}{'llm ms':>9}{'prep ms':>9}{'node ms':>9}{'native ms':>10}"
+          f"{'node KB':>9}{'native KB':>10}{'py RSS':>8}{'node RSS':>9}")
+    for name in names:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', name, '--repeat', str(args.repeat)],
+                              capture_output=True, text=True, cwd=BASE_DIR)
+        if proc.returncode:
+            results['cases'][name] = {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+            print(f"{name:28} ERROR {results['cases'][name]['error']}")
+            continue
+        case = json.loads(proc.stdout.strip().splitlines()[-1])
+        results['cases'][name] = case
+        print(f"{name:28}{case['slides']:>7}{case['llm_s'] * 1000:>9.1f}{case['prepare_s'] * 1000:>9.1f}"
+              f"{case['node_s'] * 1000:>9.1f}{case['native_s'] * 1000:>10.1f}{case['node_bytes'] / 1024:>9.0f}"
+              f"{case['native_bytes'] / 1024:>10.0f}{_fmt_bytes(case['python_peak_rss']):>8}"
+              f"{_fmt_bytes(case['node_peak_rss']):>9}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            earlier = json.load(f)
+        print(f"\nchange against {args.compare} ({earlier.get('created', '?')}):")
+        print('\n'.join(compare(results, earlier)) or 'no cases in common')
+    return 1 if any('error' in case for case in results['cases'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
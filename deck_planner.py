@@ -0,0 +1,243 @@
+"""Two-phase generation: a compact outline first, then every slide's content in parallel.
+
+One prompt for the whole deck means latency grows with every output token and a
+single malformed slide spoils the response. Here the model first returns only
+titles and layouts, then each content slide is requested on its own, with at most
+`concurrency` requests in flight. A slide that comes back broken is retried on its
+own instead of regenerating the deck. The result has the same {"slides": [...]}
+shape the renderers take.
+
+call(prompt, schema) is expected to return parsed JSON; schema is 'outline' or
+'content:<layout>' so structured-output providers can constrain each reply.
+With call_llm, a reply that misses the layout's fields raises and isn't cached,
+so the retry reaches the provider again.
+
+regenerate_slide() reuses the per-slide request to redo a single slide of a
+finished deck, optionally in another layout, with the other slides as context.
+
+Every prompt starts with STYLE_GUIDE, the rules, layout contracts and example
+that don't change between requests, so providers can cache it (prompt_cache.py).
+"""
+import asyncio
+import json
+import os
+
+import slide_schema
+from prompt_cache import split_prompt
+
+SLIDE_CONCURRENCY = int(os.environ.get('LLM_SLIDE_CONCURRENCY', 8))
+
+# Field contract per layout, as spelled out in the single-shot prompts
+LAYOUT_FIELDS = {
+    'numbered_boxes': ('"boxes" array with 4 SHORT strings (max 15 words each)', ['boxes']),
+    'definition_boxes': ('"definition" string (max 40 words) AND "boxes" array with 3 SHORT strings (max 12 words each)',
+                         ['definition', 'boxes']),
+    'split_layout': ('"bullets" array (5 strings) AND "highlights" array (3 SHORT strings max 10 words each)',
+                     ['bullets', 'highlights']),
+    'icon_grid': ('"items" array (6 strings or objects with text, max 8 words each)', ['items']),
+    'comparison_table': ('"left_title", "left_points" (3 SHORT), "right_title", "right_points" (3 SHORT)',
+                         ['left_title', 'left_points', 'right_title', 'right_points']),
+    'flow_diagram': ('"steps" array (4 SHORT strings max 8 words) AND "outcome" string', ['steps', 'outcome']),
+    'three_boxes': ('"boxes" array with 3 strings (max 12 words each)', ['boxes']),
+}
+
+EXAMPLE_DECK = {'slides': [
+    {'slideNumber': 1, 'title': 'Cloud Computing', 'subtitle': 'Overview', 'isTitle': True},
+    {'slideNumber': 2, 'title': 'What Is Cloud Computing', 'layout': 'definition_boxes',
+     'reasoning': 'Defines the core idea',
+     'content': {'definition': 'Renting computing power, storage and software over the internet instead of '
+                               'owning and running the hardware yourself',
+                 'boxes': ['Pay only for what you use', 'Scale up or down in minutes', 'No servers to maintain']}},
+    {'slideNumber': 3, 'title': 'Why Teams Move to the Cloud', 'layout': 'numbered_boxes',
+     'reasoning': 'Four parallel reasons',
+     'content': {'boxes': ['Lower upfront cost than buying servers', 'New environments ready in minutes',
+                           'Global reach without new data centers', 'Managed security and backups included']}},
+    {'slideNumber': 4, 'title': 'Service Models', 'layout': 'three_boxes', 'reasoning': 'Exactly three options',
+     'content': {'boxes': ['IaaS: rent virtual machines and networks', 'PaaS: deploy code, skip the servers',
+                           'SaaS: use finished apps in the browser']}},
+    {'slideNumber': 5, 'title': 'Core Building Blocks', 'layout': 'icon_grid', 'reasoning': 'Six short items',
+     'content': {'items': ['Compute instances', 'Object storage', 'Managed databases', 'Virtual networks',
+                           'Identity and access', 'Monitoring and alerts']}},
+    {'slideNumber': 6, 'title': 'Public vs Private Cloud', 'layout': 'comparison_table',
+     'reasoning': 'Two options side by side',
+     'content': {'left_title': 'Public Cloud',
+                 'left_points': ['Shared provider hardware', 'Pay as you go', 'Fastest to start'],
+                 'right_title': 'Private Cloud',
+                 'right_points': ['Dedicated hardware', 'Fixed capacity cost', 'Full control of data']}},
+    {'slideNumber': 7, 'title': 'Migrating an App', 'layout': 'flow_diagram', 'reasoning': 'Ordered steps',
+     'content': {'steps': ['Assess the current app', 'Choose the service model', 'Move data and code',
+                           'Test and switch traffic'],
+                 'outcome': 'The app runs in the cloud with no downtime for users'}},
+    {'slideNumber': 8, 'title': 'Getting Started', 'layout': 'split_layout',
+     'reasoning': 'Detail plus key takeaways',
+     'content': {'bullets': ['Create an account with a free tier', 'Set a monthly budget alert first',
+                             'Launch one small virtual machine', 'Store files in object storage',
+                             'Delete what you no longer use'],
+                 'highlights': ['Start small and learn', 'Watch costs from day one', 'Automate repeat tasks']}},
+]}
+
+# Rules, layout contracts and an example deck. They are the same for every request, so every prompt
+# starts with them as the static prefix the providers cache (prompt_cache.py)
+STYLE_GUIDE = f"""You write slide content for EduBridge training presentations. Slides are rendered into fixed boxes, so the JSON you return must follow these rules exactly.
+
+CRITICAL RULES:
+1. Return ONLY pure JSON (no markdown, no backticks, no explanations)
+2. DO NOT use markdown formatting like **bold** or *italic* or `code` in text
+3. Use plain text only - no asterisks, no special formatting
+4. Keep text concise to fit in boxes (numbered_boxes: max 15 words per box)
+5. The first slide of a deck is the title slide: "isTitle": true with a title and a short subtitle, no layout
+6. Every other slide has a "title", a "layout", a one-line "reasoning" for the layout and a "content" object
+
+LAYOUTS - pick the BEST one for what each slide says. EVERY content slide MUST have the layout's required fields:
+{chr(10).join(f'- {name}: needs {fields}' for name, (fields, _) in LAYOUT_FIELDS.items())}
+
+Choosing a layout:
+- definition_boxes: introducing or defining a concept, with three supporting points
+- numbered_boxes: four parallel reasons, benefits, tips or facts
+- three_boxes: exactly three options, types or pillars
+- icon_grid: six short items such as tools, features or components
+- comparison_table: two things side by side (before/after, pros/cons, A vs B)
+- flow_diagram: ordered steps of a process that lead to an outcome
+- split_layout: a topic with several details plus the key takeaways
+Use varied layouts across a deck and avoid the same layout on consecutive slides.
+
+Example of a valid deck, one slide per layout:
+{json.dumps(EXAMPLE_DECK, ensure_ascii=False, indent=2)}
+
+"""
+
+
+class PlanError(ValueError):
+    """Raised when the outline or a slide's content doesn't match the expected shape"""
+
+
+def outline_prompt(topic, slide_count, instructions=''):
+    return split_prompt(STYLE_GUIDE, f"""Plan a presentation on "{topic}" with {slide_count + 1} total slides (1 title + {slide_count} content).
+{f'Special instructions: {instructions}' if instructions else ''}
+
+Do NOT write slide content yet. For each content slide give only a short title, the BEST layout for what it will say
+and the reasoning. Return ONLY pure JSON: {{"slides": [...]}} with the title slide first.""")
+
+
+def slide_prompt(topic, slide, outline, instructions='', issues=()):
+    """The request for one slide's content; issues are what was wrong with the last reply, when it is retried"""
+    fields, _ = LAYOUT_FIELDS[slide['layout']]
+    others = ', '.join(s.get('title', '') for s in outline['slides'] if s is not slide and not s.get('isTitle'))
+    problems = ''.join(f'\n- {issue}' for issue in issues)
+    if problems:
+        problems = f'\n\nThe last reply for this slide had these problems, fix them:{problems}'
+    return split_prompt(STYLE_GUIDE, f"""Write the content for one slide of a presentation on "{topic}".
+{f'Special instructions: {instructions}' if instructions else ''}
+
+Slide {slide['slideNumber']}: "{slide['title']}" (layout: {slide['layout']})
+Other slides in the deck, do not repeat their content: {others}
+
+The content object MUST have: {fields}{problems}
+
+Return: {{"content": {{...}}}}""")
+
+
+def check_outline(outline):
+    slides = outline.get('slides') if isinstance(outline, dict) else None
+    if not slides:
+        raise PlanError("Outline has no slides")
+    for number, slide in enumerate(slides, 1):
+        slide.setdefault('slideNumber', number)
+        if not slide.get('isTitle'):
+            slide['layout'] = slide.get('layout') or 'numbered_boxes'
+            if slide['layout'] not in LAYOUT_FIELDS:
+                slide['layout'] = 'numbered_boxes'
+    return outline
+
+
+def check_content(layout, response):
+    content = response.get('content', response) if isinstance(response, dict) else None
+    try:
+        typed = slide_schema.parse_content(layout, content)
+    except slide_schema.SchemaError as e:
+        raise PlanError(str(e)) from e
+    return {f: getattr(typed, f) for f in LAYOUT_FIELDS[layout][1]}
+
+
+async def _fill_slide(call, topic, slide, outline, instructions, semaphore, retries):
+    prompt = slide_prompt(topic, slide, outline, instructions)
+    for attempt in range(retries + 1):
+        async with semaphore:
+            try:
+                response = await asyncio.to_thread(call, prompt, f"content:{slide['layout']}")
+                return dict(slide, content=check_content(slide['layout'], response))
+            except Exception:
+                if attempt == retries:
+                    raise
+
+
+async def fill_outline(call, topic, outline, instructions='', concurrency=SLIDE_CONCURRENCY, retries=1, on_slide=None):
+    """Request every content slide concurrently; on_slide sees slides in deck order as soon as they're ready"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    slides = outline['slides']
+    tasks = {i: asyncio.ensure_future(_fill_slide(call, topic, slide, outline, instructions, semaphore, retries))
+             for i, slide in enumerate(slides) if not slide.get('isTitle')}
+    done = [None] * len(slides)
+    failed = []
+    emitted = 0
+    for i, slide in enumerate(slides):
+        if i not in tasks:
+            done[i] = slide
+    pending = set(tasks.values())
+    while True:
+        # Hand out the finished prefix so streaming consumers keep slide order
+        while emitted < len(slides) and done[emitted] is not None:
+            if done[emitted] is not False and on_slide:
+                on_slide(done[emitted])
+            emitted += 1
+        if not pending:
+            break
+        finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for i, task in tasks.items():
+            if task in finished:
+                try:
+                    done[i] = task.result()
+                except Exception as e:
+                    done[i] = False
+                    failed.append((slides[i]['slideNumber'], str(e)))
+    return {'slides': [s for s in done if s]}, sorted(failed)
+
+
+def regenerate_slide(call, topic, slide_structure, index, layout=None, instructions='', retries=1):
+    """New content for slides[index], in layout if given; returns the new slide and leaves the deck untouched"""
+    slide = slide_structure['slides'][index]
+    if slide.get('isTitle'):
+        raise PlanError("The title slide has no layout content to regenerate")
+    current = slide.get('layout') or 'numbered_boxes'
+    layout = layout or current
+    if layout not in LAYOUT_FIELDS:
+        raise PlanError(f'Unknown layout "{layout}"')
+    target = {k: v for k, v in slide.items() if k not in ('content', 'fontSizes')}
+    target.update(layout=layout, slideNumber=slide.get('slideNumber', index + 1))
+    if layout != current:
+        target['reasoning'] = f"Switched from {current}"
+    outline = dict(slide_structure, slides=[target if i == index else s for i, s in enumerate(slide_structure['slides'])])
+    prompt = slide_prompt(topic, target, outline, instructions)
+    if layout != current and slide.get('content'):
+        body, _, tail = prompt.dynamic.rpartition('\n\nReturn:')
+        prompt = split_prompt(prompt.static, (
+            f"{body}\n\nThe slide currently uses the {current} layout with this content; rework the same "
+            f"points for the new layout: {json.dumps(slide['content'], ensure_ascii=False)}\n\nReturn:{tail}"))
+    for attempt in range(retries + 1):
+        try:
+            return dict(target, content=check_content(layout, call(prompt, f'content:{layout}')))
+        except Exception:
+            if attempt == retries:
+                raise
+
+
+def generate_deck(call, topic, slide_count, instructions='', concurrency=SLIDE_CONCURRENCY, on_outline=None, on_slide=None):
+    """Outline, then parallel slide content. call(prompt, schema) returns parsed JSON.
+
+    Returns (slide_structure, failed) where failed lists (slideNumber, error) for
+    slides that still failed after a retry and were left out of the deck.
+    """
+    outline = check_outline(call(outline_prompt(topic, slide_count, instructions), 'outline'))
+    if on_outline:
+        on_outline(outline)
+    return asyncio.run(fill_outline(call, topic, outline, instructions, concurrency, on_slide=on_slide))
@@ -0,0 +1,256 @@
+// Static pptxgenjs renderer for EduBridge decks.
+// Takes the slide structure produced by the LLM plus brand_config as plain JSON
+// data, so nothing user- or model-supplied is ever compiled as code.
+//
+//   const { renderDeck } = require("./deck_renderer");
+//   const pres = renderDeck(slideStructure, brandConfig);
+//
+// CLI (one-off renders): node deck_renderer.js [job.json|-] [output.pptx|-]
+//   where the job is {"slides": {...slide structure...}, "brand": {...brand_config...}}
+//   and "-" (the default) means stdin / stdout.
+//
+// Bump RENDERER_VERSION whenever the rendered output changes.
+const PptxGenJS = require("pptxgenjs");
+
+const RENDERER_VERSION = "2.0.0";
+
+function makeTheme(brand) {
+  const c = brand.colors;
+  return {
+    colors: {
+      primary1: c.yellow, primary2: c.green, primary3: c.teal, primary4: c.blue,
+      accent1: c.coral, accent2: c.purple, background: c.cream,
+      textDark: c.darkText, textLight: c.lightText, white: c.white,
+    },
+    companyName: brand.company_name,
+    tagline1: brand.tagline_1,
+    tagline2: brand.tagline_2,
+    hashtag: brand.hashtag,
+    footerText: brand.footer_text,
+    font: brand.font,
+  };
+}
+
+function extractText(obj) {
+  let text = "";
+  if (typeof obj === "string") text = obj;
+  else if (typeof obj === "object" && obj !== null) text = obj.text || obj.title || obj.name || obj.description || obj.content || JSON.stringify(obj);
+  else text = String(obj);
+  // Remove markdown formatting
+  text = text.replace(/\*\*(.+?)\*\*/g, "$1").replace(/\*(.+?)\*/g, "$1").replace(/`(.+?)`/g, "$1").replace(/\*\*/g, "").replace(/\*/g, "");
+  return text.trim();
+}
+
+// Brand chrome lives on one slide master/layout that every slide references, instead of
+// being repeated in each slide's XML. Masters are compiled once per brand config.
+const MASTER_NAME = "BRAND";
+const masterCache = new Map();
+const MASTER_CACHE_SIZE = 32;
+
+function text(t, options) {
+  return { text: { text: t, options } };
+}
+
+function brandMaster(brand, th) {
+  const key = JSON.stringify(brand);
+  let master = masterCache.get(key);
+  if (!master) {
+    const font = th.font;
+    const light = th.colors.textLight;
+    master = {
+      title: MASTER_NAME,
+      background: { color: th.colors.background },
+      objects: [
+        text(th.companyName, { x: 0.5, y: 0.3, w: 2, h: 0.4, fontSize: 16, bold: true, color: th.colors.textDark, fontFace: font }),
+        text(th.tagline1, { x: 2.6, y: 0.3, w: 5, h: 0.4, fontSize: 9, color: light, fontFace: font }),
+        text(th.tagline2, { x: 2.6, y: 0.55, w: 5, h: 0.3, fontSize: 8, color: light, fontFace: font }),
+        text(th.hashtag, { x: 8.5, y: 0.3, w: 1, h: 0.4, fontSize: 9, color: light, fontFace: font, align: "right" }),
+        text(th.footerText, { x: 0.5, y: 5.2, w: 9, h: 0.2, fontSize: 8, color: light, fontFace: font, align: "center" }),
+      ],
+    };
+    if (masterCache.size >= MASTER_CACHE_SIZE) masterCache.delete(masterCache.keys().next().value);
+    masterCache.set(key, master);
+  }
+  return master;
+}
+
+// Text frames the fitter shrank, keyed by shape index on the slide (see text_fit.py)
+function applyFontSizes(s, sizes) {
+  let idx = 0;
+  const addText = s.addText.bind(s);
+  const addShape = s.addShape.bind(s);
+  s.addText = (text, opts) => {
+    const size = sizes[idx++];
+    return addText(text, size ? { ...opts, fontSize: size } : opts);
+  };
+  s.addShape = (shape, opts) => {
+    idx++;
+    return addShape(shape, opts);
+  };
+}
+
+function newSlide(p, th) {
+  const s = p.addSlide({ masterName: MASTER_NAME });
+  if (th.fontSizes) applyFontSizes(s, th.fontSizes);
+  return s;
+}
+
+function addTitle(s, th, t, fontSize = 32) {
+  s.addText(t, { x: 0.5, y: 1.1, w: 9, h: 0.5, fontSize, bold: true, color: th.colors.textDark, fontFace: th.font, align: "center" });
+}
+
+function title_slide(p, th, slide) {
+  const s = newSlide(p, th);
+  s.addText(slide.title, { x: 0.5, y: 2, w: 9, h: 1, fontSize: 48, bold: true, color: th.colors.textDark, fontFace: th.font, align: "center", valign: "middle" });
+  if ("subtitle" in slide) {
+    s.addText(slide.subtitle, { x: 0.5, y: 3.2, w: 9, h: 0.5, fontSize: 20, color: th.colors.textLight, fontFace: th.font, align: "center", italic: true });
+  }
+}
+
+const LAYOUTS = {
+  numbered_boxes(p, th, t, c) {
+    const s = newSlide(p, th);
+    addTitle(s, th, t);
+    const cols = [th.colors.primary1, th.colors.primary2, th.colors.primary3, th.colors.primary4];
+    (c.boxes || []).slice(0, 4).forEach((b, i) => {
+      const x = 0.5 + i * 2.3;
+      s.addShape(p.shapes.RECTANGLE, { x, y: 2.2, w: 2.1, h: 2.4, fill: { color: cols[i] } });
+      s.addText(String(i + 1).padStart(2, "0"), { x, y: 2.3, w: 2.1, h: 0.8, fontSize: 72, bold: true, color: th.colors.white, fontFace: th.font, align: "center", valign: "top" });
+      s.addText(extractText(b), { x: x + 0.15, y: 3.3, w: 1.8, h: 1.1, fontSize: 16, bold: true, color: th.colors.white, fontFace: th.font, align: "left", valign: "top" });
+    });
+  },
+
+  definition_boxes(p, th, t, c) {
+    const s = newSlide(p, th);
+    addTitle(s, th, t);
+    s.addShape(p.shapes.RECTANGLE, { x: 1, y: 1.9, w: 8, h: 1.2, fill: { color: th.colors.white } });
+    s.addShape(p.shapes.RECTANGLE, { x: 1, y: 1.9, w: 0.08, h: 1.2, fill: { color: th.colors.primary3 } });
+    s.addText(extractText(c.definition || ""), { x: 1.3, y: 2.05, w: 7.4, h: 1, fontSize: 14, color: th.colors.textDark, fontFace: th.font, valign: "middle" });
+    const cols = [th.colors.primary1, th.colors.primary2, th.colors.primary4];
+    (c.boxes || []).slice(0, 3).forEach((b, i) => {
+      const x = 1 + i * 2.7;
+      s.addShape(p.shapes.RECTANGLE, { x, y: 3.4, w: 2.4, h: 1, fill: { color: cols[i] } });
+      s.addText(extractText(b), { x: x + 0.15, y: 3.5, w: 2.1, h: 0.8, fontSize: 13, bold: true, color: th.colors.white, fontFace: th.font, align: "center", valign: "middle" });
+    });
+  },
+
+  split_layout(p, th, t, c) {
+    const s = newSlide(p, th);
+    addTitle(s, th, t, 28);
+    (c.bullets || []).slice(0, 5).forEach((b, i) => {
+      s.addShape(p.shapes.OVAL, { x: 0.7, y: 2 + i * 0.6, w: 0.15, h: 0.15, fill: { color: th.colors.primary3 } });
+      s.addText(extractText(b), { x: 1, y: 1.95 + i * 0.6, w: 4.5, h: 0.5, fontSize: 11, color: th.colors.textDark, fontFace: th.font });
+    });
+    const hcols = [th.colors.primary2, th.colors.primary4, th.colors.accent1];
+    (c.highlights || []).slice(0, 3).forEach((h, i) => {
+      const y = 2 + i * 1;
+      s.addShape(p.shapes.RECTANGLE, { x: 5.8, y, w: 3.5, h: 0.8, fill: { color: hcols[i] } });
+      s.addText(extractText(h), { x: 6, y: y + 0.1, w: 3.3, h: 0.6, fontSize: 14, bold: true, color: th.colors.white, fontFace: th.font, valign: "middle" });
+    });
+  },
+
+  icon_grid(p, th, t, c) {
+    const s = newSlide(p, th);
+    addTitle(s, th, t);
+    const cols = [th.colors.primary1, th.colors.primary2, th.colors.primary3, th.colors.primary4, th.colors.accent1, th.colors.accent2];
+    (c.items || []).slice(0, 6).forEach((item, i) => {
+      const col = i % 3, row = Math.floor(i / 3), x = 1.2 + col * 2.7, y = 2.3 + row * 1.5;
+      s.addShape(p.shapes.RECTANGLE, { x, y, w: 2.4, h: 1.2, fill: { color: th.colors.white }, line: { color: cols[i % 6], width: 3 } });
+      s.addShape(p.shapes.OVAL, { x: x + 0.85, y: y + 0.15, w: 0.7, h: 0.7, fill: { color: cols[i % 6] } });
+      const icon = typeof item === "object" ? item.icon || "✓" : "✓";
+      s.addText(String(icon), { x: x + 0.85, y: y + 0.15, w: 0.7, h: 0.7, fontSize: 24, color: th.colors.white, fontFace: th.font, align: "center", valign: "middle" });
+      s.addText(extractText(item), { x: x + 0.1, y: y + 0.7, w: 2.2, h: 0.4, fontSize: 11, bold: true, color: th.colors.textDark, fontFace: th.font, align: "center" });
+    });
+  },
+
+  comparison_table(p, th, t, c) {
+    const s = newSlide(p, th);
+    addTitle(s, th, t);
+    s.addShape(p.shapes.OVAL, { x: 4.6, y: 2.3, w: 0.8, h: 0.8, fill: { color: th.colors.accent1 } });
+    s.addText("VS", { x: 4.6, y: 2.3, w: 0.8, h: 0.8, fontSize: 18, bold: true, color: th.colors.white, fontFace: th.font, align: "center", valign: "middle" });
+    const sides = [
+      { x: 0.7, color: th.colors.primary4, title: c.left_title || "A", points: c.left_points || [] },
+      { x: 5.6, color: th.colors.primary2, title: c.right_title || "B", points: c.right_points || [] },
+    ];
+    sides.forEach((side) => {
+      s.addShape(p.shapes.RECTANGLE, { x: side.x, y: 1.9, w: 3.7, h: 0.5, fill: { color: side.color } });
+      s.addText(extractText(side.title), { x: side.x, y: 1.9, w: 3.7, h: 0.5, fontSize: 18, bold: true, color: th.colors.white, fontFace: th.font, align: "center", valign: "middle" });
+      side.points.slice(0, 3).forEach((pt, i) => {
+        s.addShape(p.shapes.RECTANGLE, { x: side.x, y: 2.5 + i * 0.5, w: 3.7, h: 0.4, fill: { color: th.colors.white }, line: { color: side.color, width: 2 } });
+        s.addText(extractText(pt), { x: side.x + 0.15, y: 2.55 + i * 0.5, w: 3.4, h: 0.3, fontSize: 11, color: th.colors.textDark, fontFace: th.font, valign: "middle" });
+      });
+    });
+  },
+
+  flow_diagram(p, th, t, c) {
+    const s = newSlide(p, th);
+    addTitle(s, th, t);
+    const cols = [th.colors.primary1, th.colors.primary2, th.colors.primary3, th.colors.primary4];
+    (c.steps || []).slice(0, 4).forEach((step, i) => {
+      const x = 0.8 + i * 2.3;
+      s.addShape(p.shapes.RECTANGLE, { x, y: 2.5, w: 2, h: 0.8, fill: { color: cols[i] } });
+      s.addText(extractText(step), { x: x + 0.1, y: 2.6, w: 1.8, h: 0.6, fontSize: 12, bold: true, color: th.colors.white, fontFace: th.font, align: "center", valign: "middle" });
+      if (i < 3) s.addShape(p.shapes.RIGHT_ARROW, { x: x + 2.1, y: 2.7, w: 0.7, h: 0.4, fill: { color: th.colors.textLight } });
+    });
+    if (c.outcome) {
+      s.addShape(p.shapes.RECTANGLE, { x: 1, y: 4, w: 8, h: 0.6, fill: { color: th.colors.accent1 } });
+      s.addText("🎯 " + extractText(c.outcome), { x: 1.2, y: 4.1, w: 7.6, h: 0.4, fontSize: 13, bold: true, color: th.colors.white, fontFace: th.font, valign: "middle" });
+    }
+  },
+
+  three_boxes(p, th, t, c) {
+    const s = newSlide(p, th);
+    addTitle(s, th, t);
+    const cols = [th.colors.primary1, th.colors.primary2, th.colors.primary4];
+    (c.boxes || []).slice(0, 3).forEach((b, i) => {
+      const x = 1 + i * 2.7;
+      s.addShape(p.shapes.RECTANGLE, { x, y: 2.5, w: 2.4, h: 1.5, fill: { color: cols[i] } });
+      s.addText(extractText(b), { x: x + 0.2, y: 2.7, w: 2, h: 1.1, fontSize: 14, bold: true, color: th.colors.white, fontFace: th.font, align: "center", valign: "middle" });
+    });
+  },
+};
+
+function renderDeck(slideStructure, brandConfig, Pptx = PptxGenJS) {
+  const th = makeTheme(brandConfig);
+  const pres = new Pptx();
+  pres.layout = "LAYOUT_16x9";
+  pres.author = th.companyName;
+  pres.defineSlideMaster(brandMaster(brandConfig, th));
+  for (const slide of slideStructure.slides) {
+    if (slide.placeholder) {
+      // An empty slide on the brand master; the caller swaps in the slide's cached XML (slide_cache.py)
+      newSlide(pres, th);
+      continue;
+    }
+    const sth = slide.fontSizes ? { ...th, fontSizes: slide.fontSizes } : th;
+    if (slide.isTitle) {
+      title_slide(pres, sth, slide);
+      continue;
+    }
+    const layout = slide.layout || "numbered_boxes";
+    if (!Object.prototype.hasOwnProperty.call(LAYOUTS, layout)) {
+      throw new Error(`Unknown layout "${layout}" on slide ${slide.slideNumber}`);
+    }
+    LAYOUTS[layout](pres, sth, slide.title, slide.content || {});
+  }
+  return pres;
+}
+
+module.exports = { RENDERER_VERSION, LAYOUTS, renderDeck, extractText };
+
+if (require.main === module) {
+  // "-" reads the job from stdin / writes the PPTX bytes to stdout
+  const fs = require("fs");
+  const [jobFile = "-", outFile = "-"] = process.argv.slice(2);
+  const job = JSON.parse(fs.readFileSync(jobFile === "-" ? 0 : jobFile, "utf8"));
+  renderDeck(job.slides, job.brand)
+    .write({ outputType: "nodebuffer" })
+    .then((data) => {
+      if (outFile === "-") process.stdout.write(data);
+      else fs.writeFileSync(outFile, data);
+    })
+    .catch((e) => {
+      console.error(String((e && e.message) || e));
+      process.exit(1);
+    });
+}
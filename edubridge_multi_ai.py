@@ -1,10 +1,20 @@
 import streamlit as st
-import subprocess
-import tempfile
 import os
-import json
-import re
+import time
 from datetime import datetime
+from renderers import DeckBuilder, RenderError
+from llm_cache import get_llm_cache
+from llm_clients import get_clients
+from slide_cache import get_slide_cache
+from llm_providers import call_llm
+from deck_planner import generate_deck, regenerate_slide, slide_prompt, LAYOUT_FIELDS, STYLE_GUIDE
+from prompt_cache import split_prompt, get_prompt_cache, describe as describe_prompt_cache
+from hedging import call_fastest, get_hedger, describe as describe_hedging
+from provider_gateway import get_gateway, describe as describe_gateway
+from slide_repair import repair_deck, validate_slide, describe as describe_repair
+from pptx_native import extract_text
+from text_fit import describe as describe_overflow
+import telemetry
 
 # Page config
 st.set_page_config(
@@ -57,6 +67,8 @@ st.markdown("""
 # Initialize session state
 if 'template_configured' not in st.session_state:
     st.session_state.template_configured = False
+if 'api_keys' not in st.session_state:
+    st.session_state.api_keys = {}
 if 'brand_config' not in st.session_state:
     st.session_state.brand_config = {
         'company_name': 'EduBridge',
@@ -79,6 +91,124 @@ if 'brand_config' not in st.session_state:
         'font': 'Calibri'
     }
 
+# Layout-selection instructions; the same for every deck, so they are part of the cached prompt prefix
+LAYOUT_SELECTION = """You are a presentation design expert.
+
+For EACH slide:
+1. Determine content type
+2. Select BEST layout from: definition_boxes, split_layout, icon_grid, numbered_boxes, comparison_table, flow_diagram, three_boxes
+3. Provide appropriate content
+
+Return ONLY valid JSON:
+{
+  "slides": [
+    {
+      "slideNumber": 1,
+      "title": "Main Title",
+      "subtitle": "Optional tagline",
+      "isTitle": true
+    },
+    {
+      "slideNumber": 2,
+      "title": "Slide Title",
+      "layout": "definition_boxes",
+      "reasoning": "Why this layout",
+      "content": {
+        "definition": "Explanation text",
+        "boxes": ["Point 1", "Point 2", "Point 3"]
+      }
+    }
+  ]
+}
+
+"""
+
+# AI Functions
+PROVIDERS = {"Anthropic Claude": 'anthropic', "Google Gemini": 'gemini'}
+KEY_ENV = {'anthropic': 'ANTHROPIC_API_KEY', 'gemini': 'GOOGLE_API_KEY'}
+
+
+def provider_key(provider):
+    """The API key entered for a provider this session (it outlives switching provider), else its env var"""
+    return st.session_state.api_keys.get(provider) or os.environ.get(KEY_ENV[provider], "")
+
+
+def call_claude(api_key, prompt, use_cache=True, on_slide=None, schema='deck'):
+    """Call Anthropic Claude API, streaming slides to on_slide as they complete"""
+    try:
+        return call_llm('anthropic', api_key, prompt, 'claude-sonnet-4-20250514', use_cache, on_slide, schema=schema)
+    except Exception as e:
+        st.error(f"Claude API Error: {str(e)}")
+        raise
+
+
+def call_gemini(api_key, prompt, use_cache=True, on_slide=None, schema='deck'):
+    """Call Google Gemini API, streaming slides to on_slide as they complete"""
+    try:
+        return call_llm('gemini', api_key, prompt, 'gemini-1.5-pro', use_cache, on_slide, schema=schema)
+    except Exception as e:
+        st.error(f"Gemini API Error: {str(e)}")
+        raise
+
+
+def call_hedged(api_keys, primary, prompt, use_cache=True, on_slide=None, schema='deck'):
+    """Call the primary provider, also asking the other one if no reply has started by the hedge deadline"""
+    try:
+        return call_fastest(
+            primary,
+            api_keys,
+            prompt,
+            {'anthropic': 'claude-sonnet-4-20250514', 'gemini': 'gemini-1.5-pro'},
+            use_cache,
+            on_slide,
+            schema=schema
+        )
+    except Exception as e:
+        st.error(f"AI API Error: {str(e)}")
+        raise
+
+
+def store_deck(slide_structure, topic, instructions, provider, pptx_data, overflow):
+    """Keep the generated deck in the session so single slides can be changed later"""
+    st.session_state.deck = {
+        'id': datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'structure': slide_structure,
+        'topic': topic,
+        'instructions': instructions,
+        'provider': provider,
+        'pptx': pptx_data,
+        'overflow': overflow,
+        'versions': [0] * len(slide_structure['slides']),
+        'message': None
+    }
+
+
+def update_slide(index, slide, message):
+    """Swap one slide into the stored structure and rebuild; unchanged slides come from the slide cache"""
+    saved = st.session_state.deck
+    slides = list(saved['structure']['slides'])
+    slides[index] = slide
+    slide_structure = dict(saved['structure'], slides=slides)
+    started = time.time()
+    deck = DeckBuilder(st.session_state.brand_config)
+    saved['pptx'] = deck.finish(slide_structure)
+    saved['structure'] = slide_structure
+    saved['overflow'] = deck.overflow
+    saved['versions'][index] += 1
+    saved['message'] = f"{message}, deck rebuilt in {time.time() - started:.1f}s"
+
+
+def edited_entries(old, text):
+    """One entry per non-empty line; object entries keep their other keys (e.g. icon)"""
+    entries = []
+    for i, line in enumerate(l.strip() for l in text.splitlines() if l.strip()):
+        if i < len(old) and isinstance(old[i], dict):
+            entries.append(dict(old[i], text=line))
+        else:
+            entries.append(line)
+    return entries
+
+
 # Header
 st.markdown('<div class="main-header">🎓 EduBridge AI PPT Generator</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">Multi-AI Support: Claude & Gemini</div>', unsafe_allow_html=True)
@@ -99,27 +229,49 @@ with st.sidebar:
     st.markdown("### 🔑 API Settings")
     
     if ai_provider == "Anthropic Claude":
-        api_key = st.text_input(
+        st.session_state.api_keys['anthropic'] = st.text_input(
             "Anthropic API Key",
+            value=st.session_state.api_keys.get('anthropic', ''),
             type="password",
             help="Get from: console.anthropic.com"
         )
-        if not api_key:
-            api_key = os.environ.get("ANTHROPIC_API_KEY", "")
+        api_key = provider_key('anthropic')
         
         st.info("**Model:** Claude Sonnet 4.5")
         
     else:  # Google Gemini
-        api_key = st.text_input(
+        st.session_state.api_keys['gemini'] = st.text_input(
             "Google API Key",
+            value=st.session_state.api_keys.get('gemini', ''),
             type="password",
             help="Get from: aistudio.google.com/apikey"
         )
-        if not api_key:
-            api_key = os.environ.get("GOOGLE_API_KEY", "")
+        api_key = provider_key('gemini')
         
         st.info("**Model:** Gemini 1.5 Pro")
     
+    # Fastest mode: hedge a slow reply with the other provider
+    fastest = st.checkbox(
+        "⚡ Fastest: also ask the other AI if this one is slow",
+        value=False,
+        help="If no reply has started by the hedge deadline, the same request goes to the other provider "
+             "and the first valid reply wins"
+    )
+    other_key = ''
+    if fastest:
+        other = 'gemini' if ai_provider == "Anthropic Claude" else 'anthropic'
+        st.session_state.api_keys[other] = st.text_input(
+            f"{'Google' if other == 'gemini' else 'Anthropic'} API Key (fastest mode)",
+            value=st.session_state.api_keys.get(other, ''),
+            type="password"
+        )
+        other_key = provider_key(other)
+        if not other_key:
+            st.warning("Fastest mode needs the other provider's API key")
+    hedged = get_hedger().summary()
+    if describe_hedging(hedged):
+        st.caption(describe_hedging(hedged))
+    
     st.markdown("---")
     
     # Template Configuration
@@ -135,6 +287,45 @@ with st.sidebar:
     
     st.markdown("---")
     
+    # Response cache
+    st.markdown("### ⚡ Response Cache")
+    
+    use_cache = st.checkbox(
+        "Reuse cached AI responses",
+        value=True,
+        help="Untick to always call the AI (the fresh response still updates the cache)"
+    )
+    cache_stats = get_llm_cache().summary()
+    st.caption(
+        f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | "
+        f"Entries: {cache_stats['entries']} ({cache_stats['bytes'] / 1024:.0f} KB)"
+    )
+    if st.button("🗑️ Clear cache"):
+        get_llm_cache().clear()
+    slides_cached = get_slide_cache().summary()
+    st.caption(
+        f"Rendered slides reused: {slides_cached['hit_rate']:.0%} | "
+        f"Cached: {slides_cached['entries']} ({slides_cached['bytes'] / 1024:.0f} KB)"
+    )
+    prompt_cached = get_prompt_cache().summary()
+    if describe_prompt_cache(prompt_cached):
+        st.caption(describe_prompt_cache(prompt_cached))
+    gateway = get_gateway().summary()
+    if describe_gateway(gateway):
+        st.caption(f"🚦 {describe_gateway(gateway)}")
+    pool = get_clients().pool_stats()
+    st.caption(
+        f"Clients reused: {pool['reused']}/{pool['reused'] + pool['created']} | "
+        f"Open connections: {pool['http_connections']} ({pool['http_idle']} idle)"
+    )
+    show_timings = st.checkbox(
+        "⏱️ Show timing breakdown",
+        value=False,
+        help="Time spent in each stage (AI call, parsing, fitting, rendering) after each generation"
+    )
+    
+    st.markdown("---")
+    
     st.markdown("### 🧠 How It Works")
     st.markdown(f"""
     **AI Provider:** {ai_provider} 🤖
@@ -233,6 +424,11 @@ if not st.session_state.get('show_config', False):
             placeholder="e.g., Focus on practical examples, Include case studies",
             height=100
         )
+        
+        two_phase = st.checkbox(
+            "⚡ Outline first, then write slides in parallel",
+            help="Asks for titles and layouts, then generates every slide concurrently"
+        )
     
     with col2:
         st.markdown("### 📊 Preview")
@@ -265,8 +461,14 @@ if not st.session_state.get('show_config', False):
         elif not topic:
             st.error("⚠️ Please enter a presentation topic")
         else:
+            trace = None
             try:
-                with st.spinner("🎨 Creating your presentation..."):
+                with st.spinner("🎨 Creating your presentation..."), telemetry.trace(
+                    'generate',
+                    provider=ai_provider,
+                    slides=slide_count + 1,
+                    two_phase=two_phase
+                ) as trace:
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
@@ -274,281 +476,243 @@ if not st.session_state.get('show_config', False):
                     status_text.text(f"🧠 {ai_provider} analyzing content...")
                     progress_bar.progress(15)
                     
-                    analysis_prompt = f"""You are a presentation design expert. Create a slide structure for: "{topic}"
-
-Create {slide_count + 1} slides (1 title + {slide_count} content).
+                    # AI decisions and the deck fill in live as each slide finishes streaming
+                    decisions = st.expander("🤖 AI Layout Decisions", expanded=True)
+                    deck = DeckBuilder(st.session_state.brand_config)
+                    started = time.time()
+                    timing = {}
+                    
+                    def on_slide(slide):
+                        timing.setdefault('first_slide', time.time() - started)
+                        done = deck.received + 1
+                        progress_bar.progress(min(15 + 50 * done // (slide_count + 1), 65))
+                        status_text.text(f"✍️ Slide {done}/{slide_count + 1}: {slide.get('title', '')}")
+                        if not slide.get('isTitle'):
+                            decisions.write(f"**Slide {slide.get('slideNumber', done)}: {slide.get('title', '')}**")
+                            decisions.write(f"- Layout: `{slide.get('layout', 'standard')}`")
+                            decisions.write(f"- Reason: {slide.get('reasoning', 'N/A')}")
+                            decisions.write("---")
+                        deck.stream_slide(slide)
+                    
+                    # Call appropriate AI
+                    call = call_claude if ai_provider == "Anthropic Claude" else call_gemini
+                    if fastest and other_key:
+                        primary = PROVIDERS[ai_provider]
+                        api_keys = {
+                            primary: api_key,
+                            'gemini' if primary == 'anthropic' else 'anthropic': other_key
+                        }
 
-{f'Requirements: {instructions}' if instructions else ''}
+                        def call(key, prompt, use_cache=True, on_slide=None, schema='deck'):
+                            return call_hedged(api_keys, primary, prompt, use_cache, on_slide, schema)
+                    if two_phase:
+                        status_text.text(f"📋 {ai_provider} planning outline...")
+                        slide_structure, failed = generate_deck(
+                            lambda p, schema: call(api_key, p, use_cache, schema=schema),
+                            topic,
+                            slide_count,
+                            instructions,
+                            on_outline=lambda o: status_text.text(
+                                f"📋 Outline ready: {len(o['slides'])} slides, writing content..."
+                            ),
+                            on_slide=on_slide
+                        )
+                        for number, error in failed:
+                            st.warning(f"⚠️ Slide {number} left out: {error}")
+                        # A bad slide is regenerated on its own, like the rest of the deck
+                        analysis_prompt = ''
 
-For EACH slide:
-1. Determine content type
-2. Select BEST layout from: definition_boxes, split_layout, icon_grid, numbered_boxes, comparison_table, flow_diagram, three_boxes
-3. Provide appropriate content
+                        def per_slide(slide, issues):
+                            return slide_prompt(topic, slide, slide_structure, instructions, issues)
+                    else:
+                        # The static layout-selection block goes in the cached prefix, the topic after it
+                        analysis_prompt = split_prompt(
+                            STYLE_GUIDE + LAYOUT_SELECTION,
+                            f"""Create a slide structure for: "{topic}"
 
-Return ONLY valid JSON:
-{{
-  "slides": [
-    {{
-      "slideNumber": 1,
-      "title": "Main Title",
-      "subtitle": "Optional tagline",
-      "isTitle": true
-    }},
-    {{
-      "slideNumber": 2,
-      "title": "Slide Title",
-      "layout": "definition_boxes",
-      "reasoning": "Why this layout",
-      "content": {{
-        "definition": "Explanation text",
-        "boxes": ["Point 1", "Point 2", "Point 3"]
-      }}
-    }}
-  ]
-}}"""
+Create {slide_count + 1} slides (1 title + {slide_count} content).
 
-                    # Call appropriate AI
-                    if ai_provider == "Anthropic Claude":
-                        slide_structure = call_claude(api_key, analysis_prompt)
-                    else:
-                        slide_structure = call_gemini(api_key, analysis_prompt)
-                    
-                    progress_bar.progress(35)
-                    status_text.text(f"✅ Structure created: {len(slide_structure['slides'])} slides")
-                    
-                    # Show AI decisions
-                    with st.expander("🤖 AI Layout Decisions"):
-                        for slide in slide_structure['slides']:
-                            if not slide.get('isTitle'):
-                                st.write(f"**Slide {slide['slideNumber']}: {slide['title']}**")
-                                st.write(f"- Layout: `{slide.get('layout', 'standard')}`")
-                                st.write(f"- Reason: {slide.get('reasoning', 'N/A')}")
-                                st.write("---")
-                    
-                    # Step 2: Generate code
-                    status_text.text("💻 Building presentation...")
-                    progress_bar.progress(60)
+{f'Requirements: {instructions}' if instructions else ''}"""
+                        )
+                        per_slide = None
+                        slide_structure = call(api_key, analysis_prompt, use_cache, on_slide)
                     
-                    js_code = generate_presentation_code(
+                    # Fix only the slides that break their layout contract
+                    slide_structure, failed, repair = repair_deck(
+                        lambda p, schema: call(api_key, p, use_cache, schema=schema),
+                        topic,
                         slide_structure,
-                        st.session_state.brand_config
+                        analysis_prompt,
+                        time.time() - started,
+                        slide_prompt=per_slide
                     )
+                    for number, error in failed:
+                        st.warning(f"⚠️ Slide {number} left out: {error}")
+                    if repair['repaired'] or repair['fixed_locally'] or failed:
+                        deck = DeckBuilder(st.session_state.brand_config)
+                    if describe_repair(repair):
+                        st.caption(f"🩹 {describe_repair(repair)}")
+                    
+                    progress_bar.progress(65)
+                    status_text.text(f"✅ Structure created: {len(slide_structure['slides'])} slides")
                     
+                    # Step 2: Render the slides collected while streaming
                     progress_bar.progress(75)
                     status_text.text("🎨 Rendering slides...")
                     
-                    # Step 3: Execute
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        js_file = os.path.join(temp_dir, 'generate.js')
-                        with open(js_file, 'w', encoding='utf-8') as f:
-                            f.write(js_code)
-                        
-                        result = subprocess.run(
-                            ['node', js_file],
-                            cwd=temp_dir,
-                            capture_output=True,
-                            text=True,
-                            timeout=90
-                        )
+                    try:
+                        pptx_data = deck.finish(slide_structure)
+                    except RenderError as e:
+                        st.error(f"❌ Error: {str(e)}")
+                    else:
+                        progress_bar.progress(100)
+                        status_text.text("✅ Presentation ready!")
                         
-                        if result.returncode != 0:
-                            st.error(f"❌ Error: {result.stderr}")
-                        else:
-                            output_file = os.path.join(temp_dir, 'output.pptx')
-                            
-                            if os.path.exists(output_file):
-                                with open(output_file, 'rb') as f:
-                                    pptx_data = f.read()
-                                
-                                progress_bar.progress(100)
-                                status_text.text("✅ Presentation ready!")
-                                
-                                st.markdown('<div class="success-box">', unsafe_allow_html=True)
-                                st.markdown(f"""
-                                ### ✅ Success!
-                                - 🤖 **AI Used:** {ai_provider}
-                                - 🎨 **Branding:** {st.session_state.brand_config['company_name']}
-                                - 📊 **Slides:** {len(slide_structure['slides'])} total
-                                """)
-                                st.markdown('</div>', unsafe_allow_html=True)
-                                
-                                filename = f"{topic.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx"
-                                
-                                st.download_button(
-                                    label="📥 Download Presentation",
-                                    data=pptx_data,
-                                    file_name=filename,
-                                    mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                                    use_container_width=True
-                                )
-                            else:
-                                st.error("❌ File not created. Try again.")
+                        st.markdown('<div class="success-box">', unsafe_allow_html=True)
+                        st.markdown(f"""
+                        ### ✅ Success!
+                        - 🤖 **AI Used:** {ai_provider}
+                        - 🎨 **Branding:** {st.session_state.brand_config['company_name']}
+                        - 📊 **Slides:** {len(slide_structure['slides'])} total
+                        - ⏱️ **First slide:** {timing.get('first_slide', 0):.1f}s, **deck ready:** {time.time() - started:.1f}s
+                        """)
+                        st.markdown('</div>', unsafe_allow_html=True)
+                        store_deck(slide_structure, topic, instructions, PROVIDERS[ai_provider], pptx_data, deck.overflow)
             
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
-
-
-def call_claude(api_key, prompt):
-    """Call Anthropic Claude API"""
-    try:
-        import anthropic
-        client = anthropic.Anthropic(api_key=api_key)
+            
+            if show_timings and trace:
+                with st.expander("⏱️ Timing breakdown", expanded=True):
+                    st.table(telemetry.timing_table(trace.breakdown()))
+                    input_tokens, output_tokens = trace.tokens()
+                    cache_read, _ = trace.cache_tokens()
+                    st.caption(
+                        f"Tokens: {input_tokens} in ({cache_read} from the prompt cache), {output_tokens} out"
+                    )
+    
+    # Download and per-slide changes for the last generated deck
+    if st.session_state.get('deck'):
+        saved = st.session_state.deck
+        slides = saved['structure']['slides']
         
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=3000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        if saved['message']:
+            st.success(f"✅ {saved['message']}")
+        if describe_overflow(saved['overflow']):
+            st.warning(f"📏 {describe_overflow(saved['overflow'])}")
         
-        response_text = message.content[0].text
+        filename = f"{saved['topic'].replace(' ', '_')}_{saved['id']}.pptx"
         
-        # Parse JSON
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
-        if json_match:
-            return json.loads(json_match.group())
-        else:
-            return json.loads(response_text)
-    except Exception as e:
-        st.error(f"Claude API Error: {str(e)}")
-        raise
-
-
-def call_gemini(api_key, prompt):
-    """Call Google Gemini API"""
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=api_key)
+        st.download_button(
+            label="📥 Download Presentation",
+            data=saved['pptx'],
+            file_name=filename,
+            mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+            use_container_width=True
+        )
         
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(prompt)
+        st.markdown("### ✏️ Refine Slides")
+        st.caption("Each change touches one slide: the rest of the deck is kept as is and only that slide is re-rendered")
         
-        response_text = response.text
+        # Changes go to the provider that wrote the deck, with that provider's key
+        call = call_claude if saved['provider'] == 'anthropic' else call_gemini
+        deck_key = provider_key(saved['provider'])
+        deck_provider = next(name for name, provider in PROVIDERS.items() if provider == saved['provider'])
         
-        # Parse JSON
-        import re
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
-        if json_match:
-            return json.loads(json_match.group())
-        else:
-            return json.loads(response_text)
-    except Exception as e:
-        st.error(f"Gemini API Error: {str(e)}")
-        raise
-
-
-def generate_presentation_code(slide_structure, brand_config):
-    """Generate JavaScript code (same as before)"""
-    
-    js_code = f"""const pptxgen = require("pptxgenjs");
-
-let pres = new pptxgen();
-pres.layout = 'LAYOUT_16x9';
-pres.author = '{brand_config['company_name']}';
-
-const colors = {{
-  primary1: "{brand_config['colors']['yellow']}",
-  primary2: "{brand_config['colors']['green']}",
-  primary3: "{brand_config['colors']['teal']}",
-  primary4: "{brand_config['colors']['blue']}",
-  accent1: "{brand_config['colors']['coral']}",
-  accent2: "{brand_config['colors']['purple']}",
-  background: "{brand_config['colors']['cream']}",
-  textDark: "{brand_config['colors']['darkText']}",
-  textLight: "{brand_config['colors']['lightText']}",
-  white: "{brand_config['colors']['white']}"
-}};
-
-const brandConfig = {{
-  companyName: {json.dumps(brand_config['company_name'])},
-  tagline1: {json.dumps(brand_config['tagline_1'])},
-  tagline2: {json.dumps(brand_config['tagline_2'])},
-  hashtag: {json.dumps(brand_config['hashtag'])},
-  footerText: {json.dumps(brand_config['footer_text'])},
-  font: "{brand_config['font']}"
-}};
-
-function addBrandHeader(slide) {{
-  slide.addText(brandConfig.companyName, {{
-    x: 0.5, y: 0.3, w: 2, h: 0.4,
-    fontSize: 16, bold: true, color: colors.textDark, fontFace: brandConfig.font
-  }});
-  slide.addText(brandConfig.tagline1, {{
-    x: 2.6, y: 0.3, w: 5, h: 0.4,
-    fontSize: 9, color: colors.textLight, fontFace: brandConfig.font
-  }});
-  slide.addText(brandConfig.tagline2, {{
-    x: 2.6, y: 0.55, w: 5, h: 0.3,
-    fontSize: 8, color: colors.textLight, fontFace: brandConfig.font
-  }});
-  slide.addText(brandConfig.hashtag, {{
-    x: 8.5, y: 0.3, w: 1, h: 0.4,
-    fontSize: 9, color: colors.textLight, fontFace: brandConfig.font, align: "right"
-  }});
-}}
-
-function addBrandFooter(slide) {{
-  slide.addText(brandConfig.footerText, {{
-    x: 0.5, y: 5.2, w: 9, h: 0.2,
-    fontSize: 8, color: colors.textLight, fontFace: brandConfig.font, align: "center"
-  }});
-}}
-
-// [Layout functions - same as previous implementation]
-// Including: definition_boxes, split_layout, icon_grid, numbered_boxes, 
-// comparison_table, flow_diagram, three_boxes
-
-"""
-    
-    # Add all layout functions (keeping code concise here)
-    js_code += get_layout_functions_compact()
-    
-    # Generate slides
-    js_code += "\n// Generate Slides\n"
-    
-    for slide in slide_structure['slides']:
-        if slide.get('isTitle'):
-            js_code += f"""
-let slide{slide['slideNumber']} = pres.addSlide();
-slide{slide['slideNumber']}.background = {{ color: colors.background }};
-addBrandHeader(slide{slide['slideNumber']});
-slide{slide['slideNumber']}.addText({json.dumps(slide['title'])}, {{
-  x: 0.5, y: 2, w: 9, h: 1, fontSize: 48, bold: true, 
-  color: colors.textDark, fontFace: brandConfig.font, align: "center", valign: "middle"
-}});
-"""
-            if 'subtitle' in slide:
-                js_code += f"""
-slide{slide['slideNumber']}.addText({json.dumps(slide['subtitle'])}, {{
-  x: 0.5, y: 3.2, w: 9, h: 0.5, fontSize: 20, 
-  color: colors.textLight, fontFace: brandConfig.font, align: "center", italic: true
-}});
-"""
-            js_code += f"addBrandFooter(slide{slide['slideNumber']});\n"
-        else:
-            layout_type = slide.get('layout', 'numbered_boxes')
-            js_code += f"\ncreate_{layout_type}(pres, {json.dumps(slide['title'])}, {json.dumps(slide['content'])});\n"
-    
-    js_code += """
-pres.writeFile({ fileName: "output.pptx" });
-console.log("Success!");
-"""
-    
-    return js_code
-
-
-def get_layout_functions_compact():
-    """Compact version of layout functions"""
-    # This would include all the layout functions from the previous version
-    # Keeping compact for brevity - same implementation as edubridge_ppt_generator.py
-    return """
-function create_numbered_boxes(p,t,c){let s=p.addSlide();s.background={color:colors.background};addBrandHeader(s);s.addText(t,{x:.5,y:1.1,w:9,h:.5,fontSize:32,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"});const cols=[colors.primary1,colors.primary2,colors.primary3,colors.primary4];(c.boxes||[]).slice(0,4).forEach((b,i)=>{const x=.5+i*2.3;s.addShape(p.shapes.RECTANGLE,{x,y:2.2,w:2.1,h:2.4,fill:{color:cols[i]}});s.addText(String(i+1).padStart(2,'0'),{x,y:2.3,w:2.1,h:.8,fontSize:72,bold:true,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"top"});s.addText(b,{x:x+.15,y:3.3,w:1.8,h:1.1,fontSize:16,bold:true,color:colors.white,fontFace:brandConfig.font,align:"left",valign:"top"})});addBrandFooter(s)}
-function create_definition_boxes(p,t,c){let s=p.addSlide();s.background={color:colors.background};addBrandHeader(s);s.addText(t,{x:.5,y:1.1,w:9,h:.5,fontSize:32,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"});s.addShape(p.shapes.RECTANGLE,{x:1,y:1.9,w:8,h:1.2,fill:{color:colors.white}});s.addShape(p.shapes.RECTANGLE,{x:1,y:1.9,w:.08,h:1.2,fill:{color:colors.primary3}});s.addText(c.definition||"",{x:1.3,y:2.05,w:7.4,h:1,fontSize:14,color:colors.textDark,fontFace:brandConfig.font,valign:"middle"});const cols=[colors.primary1,colors.primary2,colors.primary4];(c.boxes||[]).slice(0,3).forEach((b,i)=>{const x=1+i*2.7;s.addShape(p.shapes.RECTANGLE,{x,y:3.4,w:2.4,h:1,fill:{color:cols[i]}});s.addText(b,{x:x+.15,y:3.5,w:2.1,h:.8,fontSize:13,bold:true,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"middle"})});addBrandFooter(s)}
-function create_split_layout(p,t,c){let s=p.addSlide();s.background={color:colors.background};addBrandHeader(s);s.addText(t,{x:.5,y:1.1,w:9,h:.5,fontSize:28,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"});(c.bullets||[]).slice(0,5).forEach((b,i)=>{s.addShape(p.shapes.OVAL,{x:.7,y:2+i*.6,w:.15,h:.15,fill:{color:colors.primary3}});s.addText(b,{x:1,y:1.95+i*.6,w:4.5,h:.5,fontSize:11,color:colors.textDark,fontFace:brandConfig.font})});const hcols=[colors.primary2,colors.primary4,colors.accent1];(c.highlights||[]).slice(0,3).forEach((h,i)=>{const y=2+i*1;s.addShape(p.shapes.RECTANGLE,{x:5.8,y,w:3.5,h:.8,fill:{color:hcols[i]}});s.addText(h,{x:6,y:y+.1,w:3.3,h:.6,fontSize:14,bold:true,color:colors.white,fontFace:brandConfig.font,valign:"middle"})});addBrandFooter(s)}
-function create_icon_grid(p,t,c){let s=p.addSlide();s.background={color:colors.background};addBrandHeader(s);s.addText(t,{x:.5,y:1.1,w:9,h:.5,fontSize:32,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"});const cols=[colors.primary1,colors.primary2,colors.primary3,colors.primary4,colors.accent1,colors.accent2];(c.items||[]).slice(0,6).forEach((item,i)=>{const col=i%3,row=Math.floor(i/3),x=1.2+col*2.7,y=2.3+row*1.5;s.addShape(p.shapes.RECTANGLE,{x,y,w:2.4,h:1.2,fill:{color:colors.white},line:{color:cols[i%6],width:3}});s.addShape(p.shapes.OVAL,{x:x+.85,y:y+.15,w:.7,h:.7,fill:{color:cols[i%6]}});s.addText(item.icon||"✓",{x:x+.85,y:y+.15,w:.7,h:.7,fontSize:24,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"middle"});s.addText(item.text||item,{x:x+.1,y:y+.7,w:2.2,h:.4,fontSize:11,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"})});addBrandFooter(s)}
-function create_comparison_table(p,t,c){let s=p.addSlide();s.background={color:colors.background};addBrandHeader(s);s.addText(t,{x:.5,y:1.1,w:9,h:.5,fontSize:32,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"});s.addShape(p.shapes.OVAL,{x:4.6,y:2.3,w:.8,h:.8,fill:{color:colors.accent1}});s.addText("VS",{x:4.6,y:2.3,w:.8,h:.8,fontSize:18,bold:true,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"middle"});s.addShape(p.shapes.RECTANGLE,{x:.7,y:1.9,w:3.7,h:.5,fill:{color:colors.primary4}});s.addText(c.left_title||"A",{x:.7,y:1.9,w:3.7,h:.5,fontSize:18,bold:true,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"middle"});(c.left_points||[]).slice(0,3).forEach((pt,i)=>{s.addShape(p.shapes.RECTANGLE,{x:.7,y:2.5+i*.5,w:3.7,h:.4,fill:{color:colors.white},line:{color:colors.primary4,width:2}});s.addText(pt,{x:.85,y:2.55+i*.5,w:3.4,h:.3,fontSize:11,color:colors.textDark,fontFace:brandConfig.font,valign:"middle"})});s.addShape(p.shapes.RECTANGLE,{x:5.6,y:1.9,w:3.7,h:.5,fill:{color:colors.primary2}});s.addText(c.right_title||"B",{x:5.6,y:1.9,w:3.7,h:.5,fontSize:18,bold:true,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"middle"});(c.right_points||[]).slice(0,3).forEach((pt,i)=>{s.addShape(p.shapes.RECTANGLE,{x:5.6,y:2.5+i*.5,w:3.7,h:.4,fill:{color:colors.white},line:{color:colors.primary2,width:2}});s.addText(pt,{x:5.75,y:2.55+i*.5,w:3.4,h:.3,fontSize:11,color:colors.textDark,fontFace:brandConfig.font,valign:"middle"})});addBrandFooter(s)}
-function create_flow_diagram(p,t,c){let s=p.addSlide();s.background={color:colors.background};addBrandHeader(s);s.addText(t,{x:.5,y:1.1,w:9,h:.5,fontSize:32,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"});const cols=[colors.primary1,colors.primary2,colors.primary3,colors.primary4];(c.steps||[]).slice(0,4).forEach((step,i)=>{const x=.8+i*2.3;s.addShape(p.shapes.RECTANGLE,{x,y:2.5,w:2,h:.8,fill:{color:cols[i]}});s.addText(step,{x:x+.1,y:2.6,w:1.8,h:.6,fontSize:12,bold:true,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"middle"});if(i<3)s.addShape(p.shapes.RIGHT_ARROW,{x:x+2.1,y:2.7,w:.7,h:.4,fill:{color:colors.textLight}})});if(c.outcome){s.addShape(p.shapes.RECTANGLE,{x:1,y:4,w:8,h:.6,fill:{color:colors.accent1}});s.addText("🎯 "+c.outcome,{x:1.2,y:4.1,w:7.6,h:.4,fontSize:13,bold:true,color:colors.white,fontFace:brandConfig.font,valign:"middle"})}addBrandFooter(s)}
-function create_three_boxes(p,t,c){let s=p.addSlide();s.background={color:colors.background};addBrandHeader(s);s.addText(t,{x:.5,y:1.1,w:9,h:.5,fontSize:32,bold:true,color:colors.textDark,fontFace:brandConfig.font,align:"center"});const cols=[colors.primary1,colors.primary2,colors.primary4];(c.boxes||[]).slice(0,3).forEach((b,i)=>{const x=1+i*2.7;s.addShape(p.shapes.RECTANGLE,{x,y:2.5,w:2.4,h:1.5,fill:{color:cols[i]}});s.addText(b,{x:x+.2,y:2.7,w:2,h:1.1,fontSize:14,bold:true,color:colors.white,fontFace:brandConfig.font,align:"center",valign:"middle"})});addBrandFooter(s)}
-"""
+        for index, slide in enumerate(slides):
+            number = slide.get('slideNumber', index + 1)
+            # Widget keys change with every update so the inputs show the new text
+            key = f"{saved['id']}_{index}_{saved['versions'][index]}"
+            
+            with st.expander(f"Slide {number}: {slide.get('title', '')}"):
+                title = st.text_input("Title", value=slide.get('title', ''), key=f"title_{key}")
+                
+                if slide.get('isTitle'):
+                    subtitle = st.text_input("Subtitle", value=slide.get('subtitle', ''), key=f"subtitle_{key}")
+                    if st.button("💾 Save text", key=f"save_{key}"):
+                        update_slide(index, dict(slide, title=title, subtitle=subtitle), f"Slide {number} updated")
+                        st.rerun()
+                    continue
+                
+                layout = slide.get('layout', 'numbered_boxes')
+                st.caption(f"Layout: `{layout}` · {slide.get('reasoning', 'N/A')}")
+                
+                content = dict(slide.get('content') or {})
+                edits = {}
+                for field, value in content.items():
+                    if isinstance(value, list):
+                        edits[field] = st.text_area(
+                            f"{field} (one per line)",
+                            value='\n'.join(extract_text(item) for item in value),
+                            key=f"{field}_{key}"
+                        )
+                    else:
+                        edits[field] = st.text_input(field, value=extract_text(value), key=f"{field}_{key}")
+                
+                col_save, col_regen, col_layout = st.columns(3)
+                
+                with col_save:
+                    if st.button("💾 Save text", key=f"save_{key}", use_container_width=True):
+                        for field, text in edits.items():
+                            content[field] = edited_entries(content[field], text) if isinstance(content[field], list) else text
+                        edited = dict(slide, title=title, content=content)
+                        hard, soft = validate_slide(edited, number)
+                        if hard:
+                            st.error(f"❌ {hard[0]}")
+                        else:
+                            update_slide(index, edited, f"Slide {number} updated")
+                            if soft:
+                                saved['message'] += f" (note: {'; '.join(soft)})"
+                            st.rerun()
+                
+                with col_regen:
+                    if st.button("🔁 Regenerate content", key=f"regen_{key}", use_container_width=True):
+                        if not deck_key:
+                            st.error(f"⚠️ Please enter your {deck_provider} API key in the sidebar")
+                        else:
+                            started = time.time()
+                            try:
+                                with st.spinner(f"✍️ Rewriting slide {number}..."):
+                                    new_slide = regenerate_slide(
+                                        lambda p, schema: call(deck_key, p, False, schema=schema),
+                                        saved['topic'],
+                                        saved['structure'],
+                                        index,
+                                        instructions=saved['instructions']
+                                    )
+                                    update_slide(index, new_slide, f"Slide {number} regenerated in {time.time() - started:.1f}s")
+                            except Exception as e:
+                                st.error(f"❌ Error: {str(e)}")
+                            else:
+                                st.rerun()
+                
+                with col_layout:
+                    new_layout = st.selectbox(
+                        "Layout",
+                        [name for name in LAYOUT_FIELDS if name != layout],
+                        key=f"layout_{key}",
+                        label_visibility="collapsed"
+                    )
+                    if st.button("🔀 Switch layout", key=f"switch_{key}", use_container_width=True):
+                        if not deck_key:
+                            st.error(f"⚠️ Please enter your {deck_provider} API key in the sidebar")
+                        else:
+                            started = time.time()
+                            try:
+                                with st.spinner(f"🎨 Moving slide {number} to {new_layout}..."):
+                                    new_slide = regenerate_slide(
+                                        lambda p, schema: call(deck_key, p, use_cache, schema=schema),
+                                        saved['topic'],
+                                        saved['structure'],
+                                        index,
+                                        new_layout,
+                                        saved['instructions']
+                                    )
+                                    update_slide(index, new_slide, f"Slide {number} switched to {new_layout} in {time.time() - started:.1f}s")
+                            except Exception as e:
+                                st.error(f"❌ Error: {str(e)}")
+                            else:
+                                st.rerun()
 
 
 # Footer
@@ -0,0 +1,492 @@
+"""Local stand-in for the Anthropic and Gemini APIs, for offline load and latency tests.
+
+Usage:
+    python fake_llm_server.py [--port 8765] [--ttft lognormal:800:0.5] [--chunk-delay fixed:20]
+                              [--rate-429 0.05] [--overload-rate 0.01] [--down anthropic]
+                              [--truncate-rate 0.02] [--malformed-rate 0.02]
+                              [--canned fixtures/all_layouts.json] [--seed 1]
+
+then start the app or the batch CLI with LLM_BASE_URL=http://127.0.0.1:8765
+and any API key. It speaks enough of both HTTP APIs for call_llm to run
+unchanged:
+
+- POST /v1/messages                              Anthropic Messages, plain or
+                                                 streamed (SSE), text or forced tool_use
+- POST /v1beta/models/<model>:generateContent    Gemini, REST transport
+- POST /v1beta/models/<model>:streamGenerateContent  streamed as a JSON array, or
+                                                 SSE with ?alt=sse
+- POST /v1beta/cachedContents                    Gemini context caching
+- GET  /stats                                    request and fault counters
+
+Replies are slide JSON built from the prompt: the slide count, topic and (for
+per-slide requests) layout are read from the prompt text, and content follows
+the layout limits the real prompts ask for, so validation passes. Large-deck
+section plans and chunks (large_deck.py) get the sections and slide numbers
+they ask for. Prompt caching is simulated for usage reporting: an Anthropic
+system prompt with cache_control is written on first use and read for five
+minutes after each use, and Gemini cached contents are kept for their TTL.
+--canned takes titles and content from a fixture instead.
+
+Latency specs are in milliseconds: fixed:MS, uniform:LOW:HIGH, normal:MEAN:SD or
+lognormal:MEDIAN:SIGMA. --ttft is the wait before the first token and
+--chunk-delay the wait between streamed chunks. Faults are drawn per request:
+429s with a retry-after header, overload errors (Anthropic's 529, Gemini's
+503; every request to the providers listed in --down), replies cut off part way (stop reason
+max_tokens, as when max_tokens is too small, which is also simulated for real
+at ~4 characters per token), and malformed replies (broken JSON for plain
+prompts, the wrong shape for structured output).
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from deck_planner import LAYOUT_FIELDS, STYLE_GUIDE
+from slide_repair import CHARS_PER_TOKEN, LIMITS
+
+GEMINI_PATH = re.compile(r'^/v1(?:beta)?/models/([^/:]+):(generateContent|streamGenerateContent)$')
+GEMINI_CACHE_PATH = re.compile(r'^/v1(?:beta)?/cachedContents$')
+# Seconds an Anthropic cache_control prefix stays cached after its last use
+ANTHROPIC_CACHE_TTL = 300
+SLIDE_COUNT = re.compile(r'(\d+) (?:total )?slides')
+TOPIC = re.compile(r'(?:on|for:) "([^"]+)"')
+LAYOUT = re.compile(r'\(layout: (\w+)\)')
+SECTIONS = re.compile(r'Plan the sections of .* with (\d+) content slides')
+CHUNK = re.compile(r'Write slides (\d+)-(\d+) \(')
+WORDS = ('learners', 'practice', 'skills', 'projects', 'feedback', 'teams', 'data', 'tools', 'growth', 'careers',
+         'mentors', 'goals', 'examples', 'habits', 'review', 'results')
+
+
+def parse_distribution(spec):
+    """Sampler returning seconds for a latency spec like lognormal:800:0.5 (milliseconds)"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(':') if v]
+    samplers = {
+        'fixed': (1, lambda rng, ms: ms),
+        'uniform': (2, lambda rng, low, high: rng.uniform(low, high)),
+        'normal': (2, lambda rng, mean, sd: rng.gauss(mean, sd)),
+        'lognormal': (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(f"Bad latency spec {spec!r}: use fixed:MS, uniform:LOW:HIGH, normal:MEAN:SD "
+                         f"or lognormal:MEDIAN:SIGMA")
+    sample = samplers[kind][1]
+    return lambda rng: max(0.0, sample(rng, *values)) / 1000
+
+
+class FakeLLM:
+    """Builds replies and decides, per request, which fault (if any) it gets"""
+
+    def __init__(self, ttft='fixed:0', chunk_delay='fixed:0', chunk_chars=40, rate_429=0.0, retry_after=1,
+                 truncate_rate=0.0, malformed_rate=0.0, canned=None, seed=None, overload_rate=0.0, down=()):
+        self.ttft = parse_distribution(ttft)
+        self.chunk_delay = parse_distribution(chunk_delay)
+        self.chunk_chars = max(1, chunk_chars)
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.malformed_rate = malformed_rate
+        self.overload_rate = overload_rate
+        self.down = set(down)
+        self.canned = self._load_canned(canned) if canned else None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'streamed': 0, 'rate_limited': 0, 'overloaded': 0, 'truncated': 0,
+                      'malformed': 0, 'anthropic': 0, 'gemini': 0, 'cache_reads': 0, 'cache_writes': 0}
+        self._cached = {}   # Anthropic prefix digest or Gemini cached content name -> (text, expires)
+
+    @staticmethod
+    def _load_canned(path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        slides = data.get('slides', data)
+        slides = slides.get('slides', slides) if isinstance(slides, dict) else slides
+        return {s.get('layout'): s for s in slides if not s.get('isTitle')}
+
+    def cache_prefix(self, text):
+        """(read, written) tokens for an Anthropic cache_control prefix, refreshing its five minutes"""
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with self._lock:
+            hit = self._cached.get(key, ('', 0))[1] > time.time()
+            self._cached[key] = (text, time.time() + ANTHROPIC_CACHE_TTL)
+            self.stats['cache_reads' if hit else 'cache_writes'] += 1
+        return (_tokens(text), 0) if hit else (0, _tokens(text))
+
+    def create_content(self, text, ttl):
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._cached[name] = (text, time.time() + ttl)
+            self.stats['cache_writes'] += 1
+        return name
+
+    def cached_content(self, name):
+        """Text of a live Gemini cached content, or None"""
+        with self._lock:
+            text, expires = self._cached.get(name, (None, 0))
+            if text is not None and expires > time.time():
+                self.stats['cache_reads'] += 1
+                return text
+        return None
+
+    def count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self.stats[key] += 1
+
+    def draw(self, provider=None):
+        """(fault, ttft_s): fault is None, 'rate_limited', 'overloaded', 'truncated' or 'malformed'"""
+        with self._lock:
+            roll = self._rng.random()
+            ttft = self.ttft(self._rng)
+        if provider in self.down:
+            return 'overloaded', ttft
+        for fault, rate in (('rate_limited', self.rate_429), ('overloaded', self.overload_rate),
+                            ('truncated', self.truncate_rate), ('malformed', self.malformed_rate)):
+            if roll < rate:
+                return fault, ttft
+            roll -= rate
+        return None, ttft
+
+    def delay(self):
+        with self._lock:
+            return self.chunk_delay(self._rng)
+
+    def _phrase(self, words, salt):
+        return ' '.join(WORDS[(salt * 7 + i * 3) % len(WORDS)] for i in range(words)).capitalize()
+
+    def content(self, layout, salt=0):
+        if self.canned and layout in self.canned:
+            return self.canned[layout].get('content', {})
+        content = {}
+        for field in LAYOUT_FIELDS[layout][1]:
+            count, max_words = LIMITS[layout].get(field, (3, 10))
+            words = max(2, min(max_words or 10, 12 if count is None else 6) - 1)
+            if count is None:
+                content[field] = self._phrase(words, salt + len(field))
+            else:
+                content[field] = [self._phrase(words, salt + i) for i in range(count)]
+        return content
+
+    def reply(self, prompt):
+        """Slide JSON for a prompt: {"content": ...} for per-slide and repair prompts, a section plan or a
+        chunk of slides for large decks, else a deck or outline"""
+        # The rules and example every prompt starts with (prompt_cache.py) would match the patterns below
+        if prompt.startswith(STYLE_GUIDE):
+            prompt = prompt[len(STYLE_GUIDE):]
+        topic = (TOPIC.search(prompt) or [None, 'Presentation'])[1]
+        layout = LAYOUT.search(prompt)
+        if layout and layout[1] in LAYOUT_FIELDS:
+            return {'content': self.content(layout[1], len(prompt))}
+        # Different topics get different text, so rendered slides aren't all slide cache hits
+        salt = zlib.crc32(topic.encode('utf-8'))
+        sections = SECTIONS.search(prompt)
+        if sections:
+            total = max(1, int(sections[1]))
+            n = max(1, min(total, round(total / 12)))
+            return {'title': topic, 'subtitle': 'An overview',
+                    'sections': [{'title': self._phrase(2, salt + i), 'summary': self._phrase(6, salt + i),
+                                  'slides': total // n + (i < total % n)} for i in range(n)]}
+        chunk = CHUNK.search(prompt)
+        if chunk:
+            return {'slides': [self._slide(number, salt) for number in range(int(chunk[1]), int(chunk[2]) + 1)]}
+        match = SLIDE_COUNT.search(prompt)
+        total = max(1, int(match[1])) if match else 6
+        outline = prompt.lstrip().startswith('Plan a presentation')
+        slides = [{'slideNumber': 1, 'title': topic, 'subtitle': 'An overview', 'isTitle': True}]
+        slides += [self._slide(number, salt, outline) for number in range(2, total + 1)]
+        return {'slides': slides}
+
+    def _slide(self, number, salt, outline=False):
+        layouts = list(LAYOUT_FIELDS)
+        layout = layouts[(number - 2) % len(layouts)]
+        title = (self.canned or {}).get(layout, {}).get('title') or f"{self._phrase(3, salt + number)} {number - 1}"
+        slide = {'slideNumber': number, 'title': title, 'layout': layout, 'reasoning': f"Fits the {layout} layout"}
+        if not outline:
+            slide['content'] = self.content(layout, salt + number)
+        return slide
+
+    def render(self, prompt, structured, fault, max_tokens=None):
+        """(text, stop) for a reply; stop is 'end' or 'max_tokens'"""
+        data = self.reply(prompt)
+        if fault == 'malformed' and structured:
+            # Structured output can't be broken JSON, but it can be the wrong shape
+            data = {'content': {}} if 'content' in data else {'slide': data['slides']}
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        if not structured:
+            text = f"Here is the presentation.\n```json\n{text}\n```"
+        if fault == 'malformed' and not structured:
+            commas = [m.start() for m in re.finditer(r',\n', text)]
+            if commas:
+                cut = commas[len(commas) // 2]
+                text = text[:cut] + text[cut + 1:]
+        stop = 'end'
+        if fault == 'truncated':
+            with self._lock:
+                text = text[:int(len(text) * self._rng.uniform(0.2, 0.9))]
+            stop = 'max_tokens'
+        if max_tokens and len(text) > max_tokens * CHARS_PER_TOKEN:
+            text, stop = text[:max_tokens * CHARS_PER_TOKEN], 'max_tokens'
+        return text, stop
+
+    def chunks(self, text):
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or ['']
+
+
+def _tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _anthropic_prompt(body):
+    message = (body.get('messages') or [{}])[-1]
+    content = message.get('content', '')
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') for block in content if block.get('type') == 'text')
+    return content
+
+
+def _gemini_prompt(body):
+    contents = body.get('contents') or [{}]
+    return ''.join(part.get('text', '') for part in contents[-1].get('parts', []))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None   # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    # Plumbing
+
+    def _json(self, status, data, headers=()):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+
+    # Routes
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/stats':
+            with self.fake._lock:
+                return self._json(200, dict(self.fake.stats))
+        self._json(404, {'error': {'message': f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        path = urlparse(self.path)
+        body = self._body()
+        if body is None:
+            return self._json(400, {'error': {'message': 'Body is not JSON'}})
+        if path.path == '/v1/messages':
+            return self._anthropic(body)
+        if GEMINI_CACHE_PATH.match(path.path):
+            return self._gemini_cache(body)
+        match = GEMINI_PATH.match(path.path)
+        if match:
+            sse = parse_qs(path.query).get('alt') == ['sse']
+            return self._gemini(body, match[1], match[2] == 'streamGenerateContent', sse)
+        self._json(404, {'error': {'message': f"Unknown path {self.path}"}})
+
+    def _anthropic(self, body):
+        fake = self.fake
+        fault, ttft = fake.draw('anthropic')
+        fake.count('requests', 'anthropic', *([fault] if fault else []), *(['streamed'] if body.get('stream') else []))
+        if fault == 'rate_limited':
+            return self._json(429, {'type': 'error', 'error': {'type': 'rate_limit_error',
+                                                               'message': 'Fake rate limit, retry later'}},
+                              [('retry-after', str(fake.retry_after))])
+        if fault == 'overloaded':
+            return self._json(529, {'type': 'error', 'error': {'type': 'overloaded_error',
+                                                               'message': 'Fake overload'}})
+        prompt = _anthropic_prompt(body)
+        choice = body.get('tool_choice') or {}
+        tool = choice.get('name') if choice.get('type') == 'tool' else None
+        text, stop = fake.render(prompt, bool(tool), fault, body.get('max_tokens'))
+        stop_reason = 'max_tokens' if stop == 'max_tokens' else ('tool_use' if tool else 'end_turn')
+        system = body.get('system') or ''
+        usage = {'input_tokens': _tokens(prompt), 'output_tokens': 1}
+        if isinstance(system, list) and any(block.get('cache_control') for block in system):
+            read, written = fake.cache_prefix(''.join(block.get('text', '') for block in system))
+            usage.update(cache_read_input_tokens=read, cache_creation_input_tokens=written)
+        elif system:
+            usage['input_tokens'] += _tokens(system if isinstance(system, str)
+                                             else ''.join(block.get('text', '') for block in system))
+        message = {'id': f"msg_{uuid.uuid4().hex[:24]}", 'type': 'message', 'role': 'assistant',
+                   'model': body.get('model', 'fake'), 'stop_reason': None, 'stop_sequence': None,
+                   'usage': usage}
+        block = ({'type': 'tool_use', 'id': f"toolu_{uuid.uuid4().hex[:24]}", 'name': tool, 'input': {}}
+                 if tool else {'type': 'text', 'text': ''})
+
+        if not body.get('stream'):
+            time.sleep(ttft + sum(fake.delay() for _ in fake.chunks(text)))
+            if tool:
+                try:
+                    block['input'] = json.loads(text)
+                except ValueError:
+                    block['input'] = {}
+            else:
+                block['text'] = text
+            message.update(content=[block], stop_reason=stop_reason)
+            message['usage']['output_tokens'] = _tokens(text)
+            return self._json(200, message)
+
+        def event(name, data):
+            self._write(f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n")
+
+        self._start_stream('text/event-stream')
+        time.sleep(ttft)
+        event('message_start', {'message': dict(message, content=[])})
+        event('content_block_start', {'index': 0, 'content_block': block})
+        for i, chunk in enumerate(fake.chunks(text)):
+            if i:
+                time.sleep(fake.delay())
+            delta = {'type': 'input_json_delta', 'partial_json': chunk} if tool else {'type': 'text_delta', 'text': chunk}
+            event('content_block_delta', {'index': 0, 'delta': delta})
+        event('content_block_stop', {'index': 0})
+        event('message_delta', {'delta': {'stop_reason': stop_reason, 'stop_sequence': None},
+                                'usage': {'output_tokens': _tokens(text)}})
+        event('message_stop', {})
+        self._end_stream()
+
+    def _gemini_cache(self, body):
+        instruction = body.get('systemInstruction') or body.get('system_instruction') or {}
+        text = ''.join(part.get('text', '') for part in instruction.get('parts', []))
+        ttl = float(str(body.get('ttl') or '3600s').rstrip('s'))
+        name = self.fake.create_content(text, ttl)
+        now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        self._json(200, {'name': name, 'model': body.get('model', ''), 'createTime': now, 'updateTime': now,
+                         'expireTime': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + ttl)),
+                         'usageMetadata': {'totalTokenCount': _tokens(text)}})
+
+    def _gemini(self, body, model, stream, sse):
+        fake = self.fake
+        fault, ttft = fake.draw('gemini')
+        fake.count('requests', 'gemini', *([fault] if fault else []), *(['streamed'] if stream else []))
+        if fault == 'rate_limited':
+            return self._json(429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                                              'message': 'Fake quota exceeded, retry later'}},
+                              [('retry-after', str(fake.retry_after))])
+        if fault == 'overloaded':
+            return self._json(503, {'error': {'code': 503, 'status': 'UNAVAILABLE', 'message': 'Fake overload'}})
+        prompt = _gemini_prompt(body)
+        cached_tokens = 0
+        if body.get('cachedContent'):
+            cached = fake.cached_content(body['cachedContent'])
+            if cached is None:
+                return self._json(404, {'error': {'code': 404, 'status': 'NOT_FOUND',
+                                                  'message': f"CachedContent {body['cachedContent']} not found"}})
+            cached_tokens = _tokens(cached)
+        config = body.get('generationConfig') or body.get('generation_config') or {}
+        structured = bool(config.get('responseSchema') or config.get('response_schema'))
+        max_tokens = config.get('maxOutputTokens') or config.get('max_output_tokens')
+        text, stop = fake.render(prompt, structured, fault, max_tokens)
+        prompt_tokens = _tokens(prompt) + cached_tokens
+
+        def response(part, sent, last):
+            candidate = {'content': {'parts': [{'text': part}], 'role': 'model'}, 'index': 0}
+            if last:
+                candidate['finishReason'] = 'MAX_TOKENS' if stop == 'max_tokens' else 'STOP'
+            return {'candidates': [candidate], 'modelVersion': model,
+                    'usageMetadata': {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': _tokens(sent),
+                                      'totalTokenCount': prompt_tokens + _tokens(sent),
+                                      **({'cachedContentTokenCount': cached_tokens} if cached_tokens else {})}}
+
+        if not stream:
+            time.sleep(ttft + sum(fake.delay() for _ in fake.chunks(text)))
+            return self._json(200, response(text, text, True))
+
+        self._start_stream('text/event-stream' if sse else 'application/json')
+        time.sleep(ttft)
+        chunks = fake.chunks(text)
+        sent = ''
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(fake.delay())
+            sent += chunk
+            data = json.dumps(response(chunk, sent, i == len(chunks) - 1))
+            if sse:
+                self._write(f"data: {data}\r\n\r\n")
+            else:
+                self._write(('[' if i == 0 else ',\r\n') + data)
+        if not sse:
+            self._write(']')
+        self._end_stream()
+
+
+def make_server(fake, host='127.0.0.1', port=8765):
+    """HTTP server for fake; call serve_forever() on it, or run it in a thread for tests"""
+    handler = type('FakeHandler', (Handler,), {'fake': fake})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Anthropic/Gemini server for offline testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ttft', default='fixed:0', help="Time to first token, e.g. lognormal:800:0.5 (ms)")
+    parser.add_argument('--chunk-delay', default='fixed:0', help="Delay between streamed chunks (ms)")
+    parser.add_argument('--chunk-chars', type=int, default=40, help="Characters per streamed chunk")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry-after seconds sent with 429s")
+    parser.add_argument('--overload-rate', type=float, default=0.0, help="Share of requests answered 529/503")
+    parser.add_argument('--down', default='', help="Comma-separated providers whose every request is overloaded")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="Share of replies cut off part way")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Share of malformed replies")
+    parser.add_argument('--canned', help="Fixture JSON to take slide titles and content from")
+    parser.add_argument('--seed', type=int, help="Seed for latency and fault draws")
+    args = parser.parse_args(argv)
+    try:
+        fake = FakeLLM(args.ttft, args.chunk_delay, args.chunk_chars, args.rate_429, args.retry_after,
+                       args.truncate_rate, args.malformed_rate, args.canned, args.seed, args.overload_rate,
+                       [p for p in args.down.split(',') if p])
+    except ValueError as e:
+        parser.error(str(e))
+    server = make_server(fake, args.host, args.port)
+    print(f"Fake LLM server on http://{args.host}:{args.port} - set LLM_BASE_URL to this URL", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
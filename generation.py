@@ -0,0 +1,81 @@
+"""Headless deck generation shared by the apps, the batch CLI and the job queue.
+
+deck_prompt is the single-shot prompt app.py and edubridge_final.py send: the
+shared rules, layout contracts and example (deck_planner.STYLE_GUIDE) as a
+prefix the providers cache, then the topic and slide count;
+generate_slides runs it (or the two-phase planner) against a provider without
+touching Streamlit; generate_large runs large-deck mode (large_deck.py), writing
+the deck out as it goes.
+"""
+import time
+
+import telemetry
+from deck_planner import STYLE_GUIDE, generate_deck, slide_prompt
+from large_deck import generate_large_deck
+from llm_providers import DEFAULT_MODELS, call_llm
+from prompt_cache import split_prompt
+from slide_repair import repair_deck
+
+DEFAULT_BRAND = {
+    'company_name': 'EduBridge',
+    'tagline_1': "India's leading Workforce Development Platform that helps learners in building careers",
+    'tagline_2': "with leading corporates through training & other career building services.",
+    'hashtag': '#letslearntoearn',
+    'footer_text': 'All rights reserved.',
+    'colors': {'yellow': 'F9D54A', 'green': '4EDA3B', 'teal': '2DD4BF', 'blue': '5B9FD8',
+               'coral': 'F96167', 'purple': '9D4EDD', 'cream': 'F5E6D3',
+               'darkText': '2D3748', 'lightText': '718096', 'white': 'FFFFFF'},
+    'font': 'Calibri'
+}
+
+
+def deck_prompt(topic, slide_count, instructions=''):
+    return split_prompt(STYLE_GUIDE, f"""Generate a presentation on "{topic}" with {slide_count + 1} total slides.
+{f'Special instructions: {instructions}' if instructions else ''}
+
+Generate {slide_count + 1} slides total (1 title + {slide_count} content). Use varied layouts. Keep all text SHORT and plain!""")
+
+
+def generate_slides(provider, api_key, topic, slide_count, instructions='', model=None, use_cache=True,
+                    two_phase=False, on_slide=None, repair=True):
+    """Slide structure for one deck.
+
+    Returns (slide_structure, failed, repair_report): failed lists (slideNumber, error)
+    for slides left out of the deck. Slides that break their layout contract are
+    repaired individually (see slide_repair); when the report shows repairs, slides
+    already passed to on_slide may have changed.
+    """
+    model = model or DEFAULT_MODELS[provider]
+
+    def call(prompt, schema):
+        return call_llm(provider, api_key, prompt, model, use_cache, schema=schema)
+
+    started = time.perf_counter()
+    if two_phase:
+        slide_structure, failed = generate_deck(call, topic, slide_count, instructions, on_slide=on_slide)
+        # A bad slide is regenerated from its outline entry, like every other slide of the deck
+        prompt, per_slide = '', lambda slide, issues: slide_prompt(topic, slide, slide_structure, instructions, issues)
+    else:
+        with telemetry.span('prompt', two_phase=False):
+            prompt, per_slide = deck_prompt(topic, slide_count, instructions), None
+        slide_structure, failed = call_llm(provider, api_key, prompt, model, use_cache, on_slide, schema='deck'), []
+    if not repair:
+        return slide_structure, failed, None
+    slide_structure, repair_failed, report = repair_deck(call, topic, slide_structure, prompt,
+                                                         time.perf_counter() - started, slide_prompt=per_slide)
+    return slide_structure, sorted(failed + repair_failed), report
+
+
+def generate_large(provider, api_key, topic, slide_count, writer, instructions='', model=None, use_cache=True,
+                   on_slide=None):
+    """Large-deck mode: sections, then chunks of slides rendered into writer (a renderers.DeckWriter).
+
+    Returns (plan, failed, repair_report) like generate_slides, with the section
+    plan in place of the slide structure; the caller finishes the writer.
+    """
+    model = model or DEFAULT_MODELS[provider]
+
+    def call(prompt, schema):
+        return call_llm(provider, api_key, prompt, model, use_cache, schema=schema)
+
+    return generate_large_deck(call, topic, slide_count, writer, instructions, on_slide=on_slide)
@@ -0,0 +1,301 @@
+"""Hedged provider calls: ask the other provider when the chosen one is slow.
+
+A provider that is slow to start answering used to stall the whole session.
+In "fastest" mode call_fastest() sends the prompt to the primary provider and,
+if no chunk of the reply has arrived by the hedge deadline, sends the same
+prompt to the other provider too. It also fires at once if the primary fails
+before streaming any slide. The first reply that parses and validates (as in
+call_llm) wins; the loser is cancelled at its next chunk, which closes its
+stream.
+
+The deadline is the HEDGE_PERCENTILE of the primary's recent times to first
+chunk (the last HEDGE_WINDOW calls), or HEDGE_DEADLINE_S until HEDGE_MIN_SAMPLES
+have been seen.
+
+Slides reach on_slide live from the primary until the hedge fires. After that
+both replies are buffered and the winner's slides are replayed when it wins,
+so a deck never mixes slides from two providers. on_slide is always called
+from the caller's thread (Streamlit needs that).
+
+Both sides go through the gateway under their own provider and key, so a
+hedge is counted against that key's rate limits like any other request. The
+gateway's failover is off for them: hedging already is the failover, and a
+side that failed over would send a third request, to the provider the other
+side is already using, on the key from the environment.
+
+A cancelled loser's call still ends at its first chunk, so its time to first
+chunk is recorded too. When a hedge wins, the seconds saved are estimated as
+when the primary's first chunk came minus when the hedge's did, assuming both
+stream at the same pace; a primary that fails or times out instead counts the
+time until then. Per primary provider get_hedger().summary() counts requests,
+hedges (by reason), which side won and the seconds saved. The same numbers,
+the current deadlines and the first-chunk percentiles are exported as metrics.
+"""
+import contextvars
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import telemetry
+from llm_providers import DEFAULT_MODELS, MAX_TOKENS, call_llm
+
+HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', 95))
+HEDGE_DEADLINE_S = float(os.environ.get('LLM_HEDGE_DEADLINE_S', 10))
+HEDGE_MIN_SAMPLES = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', 20))
+HEDGE_WINDOW = 200
+
+
+class Cancelled(Exception):
+    """The other provider's reply won"""
+
+
+def other_provider(provider):
+    return next(p for p in DEFAULT_MODELS if p != provider)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class _Attempt:
+    """One provider's side of a hedged call"""
+
+    def __init__(self, provider, events):
+        self.provider = provider
+        self.events = events
+        self.started = time.perf_counter()
+        self.first_chunk = None   # seconds from started
+        self.fired = 0.0          # seconds after the primary started
+        self.beaten_at = None     # for a primary the hedge beat: when the hedge's reply started, from started
+        self.cancel = threading.Event()
+        self.slides = []          # buffered once the hedge fired
+
+    def watch(self, chunks):
+        try:
+            for chunk in chunks:
+                if self.first_chunk is None:
+                    self.first_chunk = time.perf_counter() - self.started
+                    self.events.put(('chunk', self, None))
+                if self.cancel.is_set():
+                    raise Cancelled(f"{self.provider} reply no longer needed")
+                yield chunk
+        finally:
+            # Closes the provider's stream, and with it the HTTP response
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+
+
+class Hedger:
+    """Per-provider first-chunk latencies plus hedge counters"""
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, deadline_s=HEDGE_DEADLINE_S, min_samples=HEDGE_MIN_SAMPLES):
+        self.percentile = percentile
+        self.deadline_s = deadline_s
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._first_chunk = {p: deque(maxlen=HEDGE_WINDOW) for p in DEFAULT_MODELS}
+        self.stats = {p: {'requests': 0, 'hedged': 0, 'hedged_slow': 0, 'hedged_error': 0, 'hedge_wins': 0,
+                          'primary_wins': 0, 'failed': 0, 'saved_s': 0.0} for p in DEFAULT_MODELS}
+
+    def deadline(self, provider):
+        """Seconds to wait for the provider's first chunk before hedging"""
+        with self._lock:
+            samples = list(self._first_chunk[provider])
+        if len(samples) < self.min_samples:
+            return self.deadline_s
+        return percentile(samples, self.percentile)
+
+    def _observe(self, attempt):
+        if attempt.first_chunk is not None:
+            with self._lock:
+                self._first_chunk[attempt.provider].append(attempt.first_chunk)
+
+    def _loser_done(self, primary, attempt):
+        """A cancelled call ends at its first chunk (or error): only then is its latency known"""
+        if attempt.first_chunk is None:
+            # Failed or timed out without a chunk; it would have taken at least this long
+            attempt.first_chunk = time.perf_counter() - attempt.started
+        self._observe(attempt)
+        if attempt.beaten_at is not None:
+            self._count(primary, 'saved_s', max(0.0, attempt.first_chunk - attempt.beaten_at))
+
+    def _count(self, provider, key, amount=1):
+        with self._lock:
+            self.stats[provider][key] += amount
+
+    def _start(self, primary, provider, api_key, prompt, model, use_cache, max_tokens, schema, events):
+        attempt = _Attempt(provider, events)
+
+        def run():
+            try:
+                result = call_llm(provider, api_key, prompt, model, use_cache,
+                                  lambda slide: events.put(('slide', attempt, slide)), max_tokens, schema,
+                                  watch=attempt.watch, failover=False)
+            except Exception as e:
+                events.put(('error', attempt, e))
+            else:
+                events.put(('done', attempt, result))
+            finally:
+                if attempt.cancel.is_set():
+                    self._loser_done(primary, attempt)
+
+        # Spans opened by the call join the caller's trace
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), name=f'hedge-{provider}',
+                         daemon=True).start()
+        return attempt
+
+    def call(self, primary, api_keys, prompt, models=None, use_cache=True, on_slide=None, max_tokens=MAX_TOKENS,
+             schema=None):
+        """call_llm on primary, hedged with the other provider when api_keys has a key for it"""
+        models = models or {}
+        secondary = other_provider(primary)
+        if not api_keys.get(secondary):
+            return call_llm(primary, api_keys[primary], prompt, models.get(primary), use_cache, on_slide,
+                            max_tokens, schema)
+        self._count(primary, 'requests')
+        deadline = self.deadline(primary)
+        events = queue.Queue()
+        with telemetry.span('hedge', provider=primary, deadline=round(deadline, 3), hedged=False) as span:
+            first = self._start(primary, primary, api_keys[primary], prompt, models.get(primary), use_cache, max_tokens,
+                                schema, events)
+            attempts = [first]
+            hedge = None
+            forwarded = 0
+            errors = []
+            while True:
+                wait = None
+                if hedge is None and first.first_chunk is None:
+                    wait = max(0.0, first.started + deadline - time.perf_counter())
+                try:
+                    kind, attempt, value = events.get(timeout=wait)
+                except queue.Empty:
+                    kind, attempt, value = 'slow', first, None
+                if kind == 'slide':
+                    if hedge is None:
+                        forwarded += 1
+                        if on_slide:
+                            on_slide(value)
+                    else:
+                        attempt.slides.append(value)
+                elif (kind == 'slow' and first.first_chunk is None
+                      or kind == 'error' and hedge is None and not forwarded):
+                    # Slow to start, or failed before any slide reached on_slide: ask the other provider
+                    if kind == 'error':
+                        errors.append(value)
+                        attempts.remove(first)
+                    hedge = self._start(primary, secondary, api_keys[secondary], prompt, models.get(secondary),
+                                        use_cache, max_tokens, schema, events)
+                    hedge.fired = hedge.started - first.started
+                    attempts.append(hedge)
+                    self._count(primary, 'hedged')
+                    self._count(primary, f'hedged_{kind}')
+                    span.set(hedged=True, reason=kind)
+                elif kind == 'error':
+                    errors.append(value)
+                    if attempt in attempts:
+                        attempts.remove(attempt)
+                    if not attempts:
+                        self._count(primary, 'failed')
+                        # Not left in this frame's locals, which the raised error's traceback holds
+                        error, errors, value = errors[0], None, None
+                        try:
+                            raise error
+                        finally:
+                            del error
+                elif kind == 'done':
+                    return self._won(primary, attempt, value, first, hedge, attempts, on_slide, span)
+
+    def _won(self, primary, winner, result, first, hedge, attempts, on_slide, span):
+        self._observe(winner)
+        if winner is hedge:
+            self._count(primary, 'hedge_wins')
+            # The saving, when the primary's reply started against when the hedge's did, is counted once the
+            # cancelled primary gets its first chunk
+            first.beaten_at = hedge.fired + (hedge.first_chunk if hedge.first_chunk is not None
+                                             else time.perf_counter() - hedge.started)
+        elif hedge:
+            self._count(primary, 'primary_wins')
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel.set()
+        span.set(winner=winner.provider)
+        if hedge and on_slide:
+            for slide in winner.slides:
+                on_slide(slide)
+        return result
+
+    def summary(self):
+        """Per primary provider: counters, hedge_rate, hedge_win_rate, deadline and first-chunk p50/p95"""
+        with self._lock:
+            providers = {p: dict(s) for p, s in self.stats.items()}
+            samples = {p: list(s) for p, s in self._first_chunk.items()}
+        for provider, stats in providers.items():
+            stats['hedge_rate'] = stats['hedged'] / stats['requests'] if stats['requests'] else 0.0
+            stats['hedge_win_rate'] = stats['hedge_wins'] / stats['hedged'] if stats['hedged'] else 0.0
+            stats['deadline_s'] = self.deadline(provider)
+            stats['first_chunk_samples'] = len(samples[provider])
+            stats['first_chunk_p50_s'] = percentile(samples[provider], 50) if samples[provider] else None
+            stats['first_chunk_p95_s'] = percentile(samples[provider], 95) if samples[provider] else None
+        total = {k: sum(s[k] for s in providers.values())
+                 for k in ('requests', 'hedged', 'hedge_wins', 'primary_wins', 'failed', 'saved_s')}
+        total['hedge_rate'] = total['hedged'] / total['requests'] if total['requests'] else 0.0
+        return dict(total, providers=providers)
+
+    def openmetrics(self):
+        """OpenMetrics families for telemetry.add_collector"""
+        summary = self.summary()['providers']
+        lines = []
+        for name, kind, help_text, rows in (
+                ('hedge_requests', 'counter', 'Hedged-mode calls by primary provider.',
+                 [({'provider': p}, s['requests']) for p, s in summary.items()]),
+                ('hedge_fired', 'counter', 'Calls where the other provider was asked too, by why.',
+                 [({'provider': p, 'reason': r}, s[f'hedged_{r}']) for p, s in summary.items()
+                  for r in ('slow', 'error')]),
+                ('hedge_winner', 'counter', 'Hedged calls by which side answered first.',
+                 [({'provider': p, 'winner': w}, s[f'{w}_wins']) for p, s in summary.items()
+                  for w in ('primary', 'hedge')]),
+                ('hedge_saved_seconds', 'counter', 'Estimated seconds saved by hedges that won.',
+                 [({'provider': p}, round(s['saved_s'], 6)) for p, s in summary.items()]),
+                ('hedge_deadline_seconds', 'gauge', 'Current wait for the first chunk before hedging.',
+                 [({'provider': p}, round(s['deadline_s'], 6)) for p, s in summary.items()]),
+                ('first_chunk_seconds', 'gauge', 'Recent time to first chunk by percentile.',
+                 [({'provider': p, 'quantile': q}, round(s[f'first_chunk_p{q}_s'], 6))
+                  for p, s in summary.items() for q in (50, 95) if s[f'first_chunk_p{q}_s'] is not None])):
+            metric = f'{telemetry.PREFIX}_{name}'
+            lines += [f'# TYPE {metric} {kind}', f'# HELP {metric} {help_text}']
+            suffix = '_total' if kind == 'counter' else ''
+            lines += [f'{metric}{suffix}{telemetry._labels(**labels)} {value}' for labels, value in rows]
+        return lines
+
+
+def describe(summary):
+    """One line for the UI, or '' before the first hedged-mode call"""
+    if not summary['requests']:
+        return ''
+    return (f"Hedged: {summary['hedged']}/{summary['requests']} ({summary['hedge_rate']:.0%}) | "
+            f"other AI won {summary['hedge_wins']} | ~{summary['saved_s']:.1f} s saved")
+
+
+_hedger = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger():
+    """Process-wide hedger, shared by every Streamlit session"""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger()
+            telemetry.add_collector(_hedger.openmetrics)
+        return _hedger
+
+
+def call_fastest(primary, api_keys, prompt, models=None, use_cache=True, on_slide=None, max_tokens=MAX_TOKENS,
+                 schema=None):
+    """call_llm on primary, asking the other provider too if primary is slow; api_keys maps provider -> key"""
+    return get_hedger().call(primary, api_keys, prompt, models, use_cache, on_slide, max_tokens, schema)
@@ -0,0 +1,254 @@
+"""Background jobs for deck generation.
+
+A Generate click used to hold the Streamlit script thread for the whole LLM call
+and render, so any widget interaction restarted or blocked it. Now the app
+submits a job, gets an id back straight away and polls job status on each rerun.
+Worker threads run the LLM -> render pipeline; threads are enough because the
+LLM call is network-bound and node rendering already happens in the worker
+pool's processes. Finished decks are kept for JOB_TTL seconds and then dropped.
+Large decks (large_deck.py) are written to a temporary file as they are
+generated instead of being held in memory, and the file goes when the job does.
+
+Tune with JOB_WORKERS (concurrent jobs), JOB_QUEUE_DEPTH (jobs waiting before
+submit() refuses more) and JOB_TTL.
+"""
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+
+import telemetry
+from generation import generate_large, generate_slides
+from renderers import DeckBuilder, DeckWriter
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_QUEUE_DEPTH = int(os.environ.get('JOB_QUEUE_DEPTH', 32))
+JOB_TTL = int(os.environ.get('JOB_TTL', 30 * 60))
+
+# Share of the progress bar each stage covers
+STAGES = {'queued': (0.0, 0.0), 'llm': (0.05, 0.8), 'render': (0.8, 1.0), 'done': (1.0, 1.0)}
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit() when JOB_QUEUE_DEPTH jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.slides_total = request['slide_count'] + 1
+        self.slides = []
+        self.failed = []
+        self.repair = None
+        self.overflow = []
+        self.error = None
+        self.result = None
+        self.result_path = None   # large decks: the PPTX file instead of result bytes
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.timings = {}
+        self.trace = None
+
+    @property
+    def progress(self):
+        low, high = STAGES[self.stage]
+        if self.stage == 'llm':
+            return low + (high - low) * min(len(self.slides) / self.slides_total, 1.0)
+        return low
+
+    def snapshot(self):
+        """Plain dict for the UI; the PPTX bytes are fetched separately with JobQueue.result()"""
+        return {
+            'id': self.id, 'status': self.status, 'stage': self.stage, 'progress': self.progress,
+            'slides': [(s.get('title', ''), 'title' if s.get('isTitle') else s.get('layout', 'numbered_boxes'))
+                       for s in self.slides],
+            'slides_total': self.slides_total, 'failed': list(self.failed), 'repair': self.repair,
+            'overflow': list(self.overflow), 'error': self.error,
+            'has_result': self.result is not None or self.result_path is not None, 'timings': dict(self.timings),
+            'stages': self.trace.breakdown() if self.trace else [],
+            'tokens': self.trace.tokens() if self.trace else (0, 0),
+            'cache_tokens': self.trace.cache_tokens() if self.trace else (0, 0),
+            'created': self.created, 'started': self.started, 'finished': self.finished,
+        }
+
+
+class JobQueue:
+    """Bounded queue of generation jobs served by a fixed set of worker threads"""
+
+    def __init__(self, workers=JOB_WORKERS, max_depth=JOB_QUEUE_DEPTH, ttl=JOB_TTL):
+        self.ttl = ttl
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self.stats = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0, 'expired': 0}
+        self._workers = [threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+        threading.Thread(target=self._reap, name='job-reaper', daemon=True).start()
+
+    def submit(self, provider, api_key, topic, slide_count, brand_config, instructions='', model=None,
+               use_cache=True, two_phase=False, renderer=None, large_deck=False):
+        """Queue a deck and return its job id"""
+        job = Job({'provider': provider, 'api_key': api_key, 'topic': topic, 'slide_count': slide_count,
+                   'instructions': instructions, 'brand_config': brand_config, 'model': model,
+                   'use_cache': use_cache, 'two_phase': two_phase, 'renderer': renderer, 'large_deck': large_deck})
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.stats['rejected'] += 1
+                raise QueueFull(f"{self._queue.maxsize} jobs already waiting, try again shortly")
+            self._jobs[job.id] = job
+            self.stats['submitted'] += 1
+        return job.id
+
+    def status(self, job_id):
+        """Snapshot of a job, or None if it is unknown or has expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job else None
+
+    def result(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.status != 'done':
+                return None
+            if job.result_path is None:
+                return job.result
+            path = job.result_path
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _work(self):
+        while not self._closed.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        req = job.request
+        job.status = 'running'
+        job.started = time.time()
+        deck = result_file = None
+
+        def on_slide(slide):
+            if req['large_deck']:
+                # Already in the file; keep what the progress list shows
+                slide = {k: slide[k] for k in ('title', 'layout', 'isTitle') if k in slide}
+            else:
+                deck.stream_slide(slide)
+            job.slides.append(slide)
+            job.timings.setdefault('first_slide_s', time.time() - job.started)
+
+        try:
+            # Setup failures (disk full, a bad renderer, the Node pool not starting) fail the job, not the worker
+            if req['large_deck']:
+                fd, job.result_path = tempfile.mkstemp(prefix='deck-', suffix='.pptx')
+                result_file = os.fdopen(fd, 'wb')
+                deck = DeckWriter(req['brand_config'], result_file, req['renderer'])
+            else:
+                deck = DeckBuilder(req['brand_config'], req['renderer'])
+            with telemetry.trace('generate', job=job.id, provider=req['provider'], renderer=deck.renderer,
+                                 slides=job.slides_total, two_phase=req['two_phase'],
+                                 large_deck=req['large_deck']) as job.trace:
+                job.stage = 'llm'
+                if req['large_deck']:
+                    self._run_large(job, deck, result_file, on_slide)
+                    return
+                slide_structure, job.failed, job.repair = generate_slides(
+                    req['provider'], req['api_key'], req['topic'], req['slide_count'], req['instructions'],
+                    req['model'], req['use_cache'], req['two_phase'], on_slide)
+                job.timings['llm_s'] = time.time() - job.started
+                job.stage = 'render'
+                render_started = time.time()
+                if job.repair and (job.repair['repaired'] or job.repair['fixed_locally'] or job.failed):
+                    # Some streamed slides were replaced or dropped; build from the final structure
+                    deck = DeckBuilder(req['brand_config'], req['renderer'])
+                job.result = deck.finish(slide_structure)
+                job.overflow = deck.overflow
+                job.timings['render_s'] = time.time() - render_started
+            job.stage = 'done'
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            if result_file:
+                # The zip's central directory would otherwise be written to the closed file when it is collected
+                if deck:
+                    deck.close()
+                result_file.close()
+            self._remove_result(job)
+        finally:
+            job.finished = time.time()
+            job.timings['total_s'] = job.finished - job.created
+            # The key is only needed while the job runs
+            req['api_key'] = None
+            with self._lock:
+                self.stats[job.status] += 1
+
+    def _run_large(self, job, deck, result_file, on_slide):
+        req = job.request
+        _, job.failed, job.repair = generate_large(
+            req['provider'], req['api_key'], req['topic'], req['slide_count'], deck, req['instructions'],
+            req['model'], req['use_cache'], on_slide)
+        job.timings['llm_s'] = time.time() - job.started
+        job.stage = 'render'
+        render_started = time.time()
+        deck.finish()
+        result_file.close()
+        job.overflow = deck.overflow
+        job.timings['render_s'] = time.time() - render_started
+        job.stage = 'done'
+        job.status = 'done'
+
+    @staticmethod
+    def _remove_result(job):
+        if job.result_path:
+            try:
+                os.remove(job.result_path)
+            except OSError:
+                pass
+            job.result_path = None
+
+    def _reap(self):
+        while not self._closed.wait(min(60, max(1, self.ttl / 4))):
+            cutoff = time.time() - self.ttl
+            with self._lock:
+                expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+                for job_id in expired:
+                    self._remove_result(self._jobs.pop(job_id))
+                self.stats['expired'] += len(expired)
+
+    def summary(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == 'running')
+            return dict(self.stats, queued=self._queue.qsize(), running=running, workers=len(self._workers))
+
+    def close(self):
+        self._closed.set()
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide job queue, shared by every Streamlit session"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
@@ -0,0 +1,228 @@
+"""Large-deck mode: 100-300 slide decks generated in sections and written out chunk by chunk.
+
+One deck prompt can't return hundreds of slides within the providers'
+max_tokens, and the single-shot path holds the whole slide structure, the
+render job and the PPTX bytes at once. Here the model first plans the deck as
+sections (a title, a one-line summary and a slide count each), then every
+section's slides are requested in chunks of at most CHUNK_SLIDES, with at most
+`concurrency` chunks requested ahead of the one being written. Each chunk is
+validated and repaired on its own (slide_repair), then fitted, rendered and
+appended to the PPTX zip (renderers.DeckWriter) as soon as the chunks before it
+are written, and dropped. Memory depends on the chunk size and concurrency, not
+on the slide count.
+
+call(prompt, schema) is expected to return parsed JSON, as in deck_planner;
+schema is 'sections' for the plan and 'deck' for each chunk.
+
+Tune with LARGE_DECK_CHUNK (slides per request), LARGE_DECK_CONCURRENCY and
+LARGE_DECK_FROM (content slides from which the batch CLI switches to this mode).
+"""
+import asyncio
+import os
+import threading
+import time
+
+import telemetry
+from deck_planner import LAYOUT_FIELDS, STYLE_GUIDE, PlanError
+from prompt_cache import split_prompt
+from slide_repair import repair_deck
+
+MAX_SLIDES = 300
+LARGE_DECK_FROM = int(os.environ.get('LARGE_DECK_FROM', 30))
+CHUNK_SLIDES = int(os.environ.get('LARGE_DECK_CHUNK', 10))
+CHUNK_CONCURRENCY = int(os.environ.get('LARGE_DECK_CONCURRENCY', 4))
+# Roughly how many slides the plan should give each section
+SECTION_SLIDES = 12
+
+
+class Cancelled(Exception):
+    """The deck was abandoned while this chunk was still being requested"""
+
+
+def sections_prompt(topic, slide_count, instructions=''):
+    sections = max(2, round(slide_count / SECTION_SLIDES))
+    return split_prompt(STYLE_GUIDE, f"""Plan the sections of a presentation on "{topic}" with {slide_count} content slides.
+{f'Special instructions: {instructions}' if instructions else ''}
+
+Do NOT write slides yet. Split the deck into about {sections} sections that build on each other. For each section
+give a short title, a one-line summary of what it covers and how many slides it gets. The slide counts MUST add up
+to {slide_count}.
+
+Return ONLY pure JSON:
+{{
+  "title": "{topic}",
+  "subtitle": "Overview",
+  "sections": [
+    {{"title": "Foundations", "summary": "Core terms and why they matter", "slides": 12}},
+    {{"title": "Hands-on practice", "summary": "Worked examples and exercises", "slides": 15}}
+  ]
+}}""")
+
+
+def chunk_prompt(topic, chunk, plan, instructions=''):
+    section = plan['sections'][chunk['section']]
+    last = chunk['start'] + chunk['count'] - 1
+    agenda = '\n'.join(f"{i}. {s['title']}" + (f" - {s['summary']}" if s.get('summary') else '')
+                       for i, s in enumerate(plan['sections'], 1))
+    part = (f" (part {chunk['part']} of {chunk['parts']}: cover only this part of the section)"
+            if chunk['parts'] > 1 else '')
+    return split_prompt(STYLE_GUIDE, f"""Write slides {chunk['start']}-{last} ({chunk['count']} slides) of a presentation on "{topic}".
+{f'Special instructions: {instructions}' if instructions else ''}
+
+The deck's sections:
+{agenda}
+
+These slides belong to section {chunk['section'] + 1}, "{section['title']}"{part}.
+No title slide: every slide is a content slide with a layout and its content.
+
+Return: {{"slides": [{{"slideNumber": {chunk['start']}, "title": "...", "layout": "...", "content": {{...}}}}]}}
+
+Write exactly {chunk['count']} slides. Use varied layouts.""")
+
+
+def _count(value):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def check_sections(plan, topic, slide_count):
+    """Plan with every section's slide count scaled so they add up to slide_count"""
+    sections = plan.get('sections') if isinstance(plan, dict) else None
+    sections = [s for s in sections or [] if isinstance(s, dict) and s.get('title')][:slide_count]
+    if not sections:
+        raise PlanError("Plan has no sections")
+    counts = [_count(s.get('slides')) for s in sections]
+    total = sum(counts)
+    counts = [max(1, c * slide_count // total) for c in counts]
+    # Hand out (or take back) what the rounding left over, one slide per section at a time
+    i = 0
+    while sum(counts) != slide_count:
+        if sum(counts) < slide_count:
+            counts[i % len(counts)] += 1
+        elif counts[i % len(counts)] > 1:
+            counts[i % len(counts)] -= 1
+        i += 1
+    return {
+        'title': plan.get('title') or topic,
+        'subtitle': plan.get('subtitle') or 'Overview',
+        'sections': [{'title': s['title'], 'summary': s.get('summary', ''), 'slides': n}
+                     for s, n in zip(sections, counts)],
+    }
+
+
+def plan_chunks(plan, chunk_slides=CHUNK_SLIDES):
+    """One request per chunk, in deck order; slide 1 is the title slide"""
+    chunks, number = [], 2
+    for index, section in enumerate(plan['sections']):
+        parts = -(-section['slides'] // max(1, chunk_slides))
+        for part in range(parts):
+            # Even chunks within a section: 23 slides go out as 8, 8, 7 rather than 10, 10, 3
+            count = section['slides'] // parts + (part < section['slides'] % parts)
+            chunks.append({'section': index, 'part': part + 1, 'parts': parts, 'start': number, 'count': count})
+            number += count
+    return chunks
+
+
+def check_chunk(response, chunk):
+    """The chunk's content slides, numbered from chunk['start']"""
+    slides = response.get('slides') if isinstance(response, dict) else None
+    slides = [s for s in slides or [] if isinstance(s, dict) and not s.get('isTitle')][:chunk['count']]
+    if not slides:
+        raise PlanError(f"No slides came back for slides {chunk['start']}-{chunk['start'] + chunk['count'] - 1}")
+    for number, slide in enumerate(slides, chunk['start']):
+        slide['slideNumber'] = number
+        if slide.get('layout') not in LAYOUT_FIELDS:
+            slide['layout'] = 'numbered_boxes'
+    return slides
+
+
+def _fill_chunk(call, topic, chunk, plan, instructions, retries, cancel):
+    """(slides, failed, repair report) for one chunk"""
+    def checked(prompt, schema):
+        # Cancelling the task doesn't stop its thread, so every LLM call, retries and repairs included, checks first
+        if cancel.is_set():
+            raise Cancelled(f"Slides {chunk['start']}-{chunk['start'] + chunk['count'] - 1} cancelled")
+        return call(prompt, schema)
+
+    prompt = chunk_prompt(topic, chunk, plan, instructions)
+    started = time.perf_counter()
+    with telemetry.span('chunk', start=chunk['start'], slides=chunk['count']):
+        for attempt in range(retries + 1):
+            try:
+                slides = check_chunk(checked(prompt, 'deck'), chunk)
+                break
+            except Cancelled:
+                raise
+            except Exception:
+                if attempt == retries:
+                    raise
+        structure, failed, report = repair_deck(checked, topic, {'slides': slides}, prompt,
+                                                time.perf_counter() - started)
+    missing = range(chunk['start'] + len(slides), chunk['start'] + chunk['count'])
+    return structure['slides'], failed + [(n, "Slide missing from the model's reply") for n in missing], report
+
+
+def merge_reports(reports):
+    """One repair report for the deck, summed over the chunks' reports"""
+    merged = {}
+    for report in reports:
+        for key, value in report.items():
+            merged[key] = round(merged.get(key, 0) + value, 2)
+    return merged or None
+
+
+async def _write_chunks(call, topic, plan, chunks, writer, instructions, concurrency, retries, on_slide):
+    failed, reports = [], []
+    pending = {}
+    requested = 0
+    cancel = threading.Event()
+    try:
+        for index, chunk in enumerate(chunks):
+            # Chunks are only requested `concurrency` ahead of the one being written, so
+            # finished chunks waiting for an earlier one stay bounded too
+            while requested < len(chunks) and requested < index + max(1, concurrency):
+                pending[requested] = asyncio.ensure_future(asyncio.to_thread(
+                    _fill_chunk, call, topic, chunks[requested], plan, instructions, retries, cancel))
+                requested += 1
+            try:
+                slides, chunk_failed, report = await pending.pop(index)
+            except Exception as e:
+                failed.extend((n, str(e)) for n in range(chunk['start'], chunk['start'] + chunk['count']))
+                continue
+            failed.extend(chunk_failed)
+            reports.append(report)
+            await asyncio.to_thread(writer.add_slides, slides)
+            if on_slide:
+                for slide in slides:
+                    on_slide(slide)
+    finally:
+        cancel.set()
+        for task in pending.values():
+            task.cancel()
+    return sorted(failed), reports
+
+
+def generate_large_deck(call, topic, slide_count, writer, instructions='', chunk_slides=CHUNK_SLIDES,
+                        concurrency=CHUNK_CONCURRENCY, retries=1, on_plan=None, on_slide=None):
+    """Plan sections, then generate the deck chunk by chunk into writer (a renderers.DeckWriter).
+
+    Returns (plan, failed, repair_report) where failed lists (slideNumber, error)
+    for slides left out of the deck. on_slide sees every written slide in deck
+    order; the caller finishes the writer.
+    """
+    if not 1 <= slide_count <= MAX_SLIDES:
+        raise PlanError(f"Large decks have 1 to {MAX_SLIDES} content slides, not {slide_count}")
+    with telemetry.span('prompt', large=True):
+        prompt = sections_prompt(topic, slide_count, instructions)
+    plan = check_sections(call(prompt, 'sections'), topic, slide_count)
+    if on_plan:
+        on_plan(plan)
+    title = {'slideNumber': 1, 'title': plan['title'], 'subtitle': plan['subtitle'], 'isTitle': True}
+    writer.add_slides([title])
+    if on_slide:
+        on_slide(title)
+    failed, reports = asyncio.run(_write_chunks(call, topic, plan, plan_chunks(plan, chunk_slides), writer,
+                                                instructions, concurrency, retries, on_slide))
+    return plan, failed, merge_reports(reports)
@@ -0,0 +1,142 @@
+"""On-disk cache of parsed LLM responses.
+
+Trainers often regenerate the same topic, slide count and instructions a few
+minutes apart, and every one of those used to be a full API round trip. Parsed
+slide structures are stored in SQLite keyed by provider, model and a hash of the
+whitespace-normalized prompt. Entries expire after LLM_CACHE_TTL seconds and the
+least recently used ones are evicted once the cache grows past LLM_CACHE_MAX_MB.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.environ.get('LLM_CACHE_PATH') or os.path.join(BASE_DIR, '.cache', 'llm_cache.sqlite3')
+CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 3600))
+CACHE_MAX_BYTES = int(float(os.environ.get('LLM_CACHE_MAX_MB', 64)) * 1024 * 1024)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so cosmetic differences in the prompt don't miss the cache"""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def cache_key(provider, model, prompt):
+    digest = hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+    return f"{provider}:{model}:{digest}"
+
+
+class LLMCache:
+    """SQLite-backed response cache with TTL expiry and size-based LRU eviction"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'writes': 0, 'evictions': 0}
+
+    def get(self, provider, model, prompt):
+        """Cached slide structure for this request, or None"""
+        key = cache_key(provider, model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._db.execute('UPDATE responses SET accessed = ?, hits = hits + 1 WHERE key = ?', (now, key))
+            self.stats['hits'] += 1
+        return json.loads(value)
+
+    def put(self, provider, model, prompt, value):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        if self.max_bytes and size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, provider, model, value, size, created, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (cache_key(provider, model, prompt), provider, model, data, size, now, now))
+            self.stats['writes'] += 1
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        if self.ttl:
+            cur = self._db.execute('DELETE FROM responses WHERE created < ?', (time.time() - self.ttl,))
+            self.stats['expired'] += cur.rowcount
+        if not self.max_bytes:
+            return
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM responses WHERE key = ?', stale)
+        self.stats['evictions'] += len(stale)
+
+    def summary(self):
+        """Counters plus current entry count and size, for the UI"""
+        with self._lock:
+            entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update(entries=entries, bytes=size, hit_rate=stats['hits'] / lookups if lookups else 0.0)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide cache, opened on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
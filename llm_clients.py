@@ -0,0 +1,168 @@
+"""Process-wide registry of provider SDK clients, keyed by API key.
+
+call_claude used to build a new anthropic.Anthropic client per generation and
+call_gemini reconfigured genai and built a new GenerativeModel each time, so every
+deck paid for client setup and a fresh TLS handshake. Streamlit reruns the script
+but keeps imported modules, so clients kept here survive reruns and their
+keep-alive connection pools stay warm. Clients are closed on interpreter exit;
+one evicted to make room for another key is only dropped from the registry,
+since a generation may still be streaming through it, and is closed when its
+last user lets go of it.
+
+Gemini requests go through the generativelanguage GenerativeServiceClient
+directly rather than genai.GenerativeModel, which can only use the client set up
+by the process-global genai.configure(): with one API key per Streamlit session
+that would send one session's requests with another's key.
+
+LLM_BASE_URL points both providers at another server speaking their HTTP APIs,
+e.g. fake_llm_server.py for offline load and latency tests, through each SDK's
+base URL / client_options. Gemini then uses the REST transport instead of gRPC.
+"""
+import atexit
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Distinct API keys kept per provider before the least recently used client is dropped
+MAX_CLIENTS = int(os.environ.get('LLM_MAX_CLIENTS', 16))
+MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))
+KEEPALIVE_EXPIRY = float(os.environ.get('LLM_KEEPALIVE_EXPIRY', 60))
+BASE_URL = os.environ.get('LLM_BASE_URL', '').rstrip('/') or None
+
+
+def key_fingerprint(api_key):
+    """Short stable label for an API key that is safe to show in stats"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:8]
+
+
+def gemini_options(api_key):
+    """Keyword arguments for the generativelanguage service clients honouring LLM_BASE_URL"""
+    if not BASE_URL:
+        return {'client_options': {'api_key': api_key}}
+    return {'client_options': {'api_key': api_key, 'api_endpoint': BASE_URL}, 'transport': 'rest'}
+
+
+def _close_anthropic(client):
+    client.close()
+
+
+def _close_gemini(service_client):
+    service_client.transport.close()
+
+
+def _anthropic_connections(client):
+    """(open, idle) HTTP connections in an Anthropic client's httpx pool"""
+    pool = getattr(getattr(client._client, '_transport', None), '_pool', None)
+    connections = list(getattr(pool, 'connections', []))
+    return len(connections), sum(conn.is_idle() for conn in connections)
+
+
+def _gemini_connections(service_client):
+    """(open, idle) connections behind a Gemini client: the urllib3 pools of the REST transport, or the one
+    HTTP/2 channel of the gRPC transport (counted as open, never idle)"""
+    session = getattr(service_client.transport, '_session', None)
+    if session is None:
+        return 1, 0
+    connections = idle = 0
+    for adapter in session.adapters.values():
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            waiting = [conn for conn in list(pool.pool.queue) if conn is not None and conn.sock is not None]
+            idle += len(waiting)
+            # The queue starts full of None slots; whatever is missing from it is checked out
+            connections += len(waiting) + pool.pool.maxsize - pool.pool.qsize()
+    return connections, idle
+
+
+class ClientRegistry:
+    """Hands out one warm client per provider and API key"""
+
+    def __init__(self, max_clients=MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = {'anthropic': OrderedDict(), 'gemini': OrderedDict(), 'gemini_cache': OrderedDict()}
+        self.stats = {'created': 0, 'reused': 0, 'evicted': 0}
+
+    def _get(self, provider, api_key, factory):
+        fingerprint = key_fingerprint(api_key)
+        clients = self._clients[provider]
+        with self._lock:
+            if fingerprint in clients:
+                clients.move_to_end(fingerprint)
+                self.stats['reused'] += 1
+                return clients[fingerprint]
+            client = factory(api_key)
+            clients[fingerprint] = client
+            self.stats['created'] += 1
+            while len(clients) > self.max_clients:
+                # Not closed here: another thread may be streaming through it
+                clients.popitem(last=False)
+                self.stats['evicted'] += 1
+            return client
+
+    def anthropic(self, api_key):
+        """anthropic.Anthropic with a keep-alive httpx pool, one per API key"""
+        def create(key):
+            import anthropic
+            import httpx
+            limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS,
+                                  keepalive_expiry=KEEPALIVE_EXPIRY)
+            # Retries and backoff happen in provider_gateway, not in the SDK as well
+            return anthropic.Anthropic(api_key=key, base_url=BASE_URL, max_retries=0,
+                                       http_client=anthropic.DefaultHttpxClient(limits=limits))
+        return self._get('anthropic', api_key, create)
+
+    def gemini(self, api_key):
+        """GenerativeServiceClient for Gemini generation, one per API key"""
+        def create(key):
+            from google.ai import generativelanguage as glm
+            return glm.GenerativeServiceClient(**gemini_options(key))
+        return self._get('gemini', api_key, create)
+
+    def gemini_cache(self, api_key):
+        """CacheServiceClient for Gemini context caching, one per API key"""
+        def create(key):
+            from google.ai import generativelanguage as glm
+            return glm.CacheServiceClient(**gemini_options(key))
+        return self._get('gemini_cache', api_key, create)
+
+    def pool_stats(self):
+        """Client counts plus open/idle connections, per provider and in total (http_connections, http_idle)"""
+        with self._lock:
+            stats = dict(self.stats, anthropic_clients=len(self._clients['anthropic']),
+                         gemini_clients=len(self._clients['gemini']))
+            counts = {'anthropic': [_anthropic_connections(c) for c in self._clients['anthropic'].values()],
+                      'gemini': [_gemini_connections(c) for c in
+                                 [*self._clients['gemini'].values(), *self._clients['gemini_cache'].values()]]}
+        for provider, pairs in counts.items():
+            stats[f'{provider}_connections'] = sum(connections for connections, _ in pairs)
+            stats[f'{provider}_idle'] = sum(idle for _, idle in pairs)
+        stats['http_connections'] = stats['anthropic_connections'] + stats['gemini_connections']
+        stats['http_idle'] = stats['anthropic_idle'] + stats['gemini_idle']
+        return stats
+
+    def close(self):
+        with self._lock:
+            for client in self._clients['anthropic'].values():
+                _close_anthropic(client)
+            for client in [*self._clients['gemini'].values(), *self._clients['gemini_cache'].values()]:
+                _close_gemini(client)
+            for clients in self._clients.values():
+                clients.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_clients():
+    """Process-wide client registry, closed at exit"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+            atexit.register(_registry.close)
+        return _registry
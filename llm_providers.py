@@ -0,0 +1,111 @@
+"""Provider calls shared by the Streamlit apps and the batch CLI.
+
+call_llm runs one prompt against Anthropic or Gemini through the response
+cache, the client registry and the streaming slide parser, and returns the
+parsed JSON. The apps wrap it to report errors with st.error.
+
+Passing schema='deck' | 'outline' | 'content:<layout>' | 'sections' switches to structured output:
+a forced tool call with a JSON schema on Anthropic and response_schema on
+Gemini, so the reply is JSON by construction instead of being scraped out of
+prose. A deck reply is checked against the slide contract (slide_schema.parse_deck);
+one that breaks it is still returned, for slide_repair to fix slide by slide,
+but never cached, so asking again reaches the provider. A reply to a
+'content:<layout>' request that doesn't fill the layout raises SchemaError.
+Set LLM_STRUCTURED_OUTPUT=0 to fall back to plain prompting everywhere.
+
+Prompts built with prompt_cache.split_prompt() have their static prefix cached
+by the provider (see prompt_cache.py).
+
+Every provider request goes through the gateway (provider_gateway.py): rate
+limits per API key, retries with backoff, adaptive concurrency, and failover
+to the other provider, if its key is in the environment, while one is failing.
+"""
+import os
+
+import slide_schema
+import telemetry
+from llm_cache import get_llm_cache
+from llm_clients import get_clients
+from llm_stream import anthropic_text_stream, anthropic_tool_stream, gemini_text_stream, replay_slides, stream_slides
+from prompt_cache import cacheable, get_prompt_cache
+from provider_gateway import estimate_tokens, get_gateway
+
+DEFAULT_MODELS = {
+    'anthropic': 'claude-sonnet-4-20250514',
+    'gemini': 'gemini-2.5-flash',
+}
+API_KEY_ENV = {
+    'anthropic': 'ANTHROPIC_API_KEY',
+    'gemini': 'GOOGLE_API_KEY',
+}
+MAX_TOKENS = 3000
+STRUCTURED_OUTPUT = os.environ.get('LLM_STRUCTURED_OUTPUT', '1') != '0'
+
+
+def text_stream(provider, api_key, model, prompt, max_tokens=MAX_TOKENS, schema=None):
+    """Raw JSON/text chunks from the provider's streaming API"""
+    if provider == 'anthropic':
+        client = get_clients().anthropic(api_key)
+        if schema:
+            return anthropic_tool_stream(client, model, prompt, slide_schema.anthropic_tool(schema), max_tokens)
+        return anthropic_text_stream(client, model, prompt, max_tokens)
+    if provider == 'gemini':
+        static = cacheable(prompt)
+        cached = get_prompt_cache().gemini_content(api_key, model, static) if static else None
+        return gemini_text_stream(get_clients().gemini(api_key), model, prompt.dynamic if cached else prompt,
+                                  slide_schema.gemini_schema(schema) if schema else None, cached)
+    raise ValueError(f"Unknown provider {provider!r}, expected one of {', '.join(DEFAULT_MODELS)}")
+
+
+def _failover(provider):
+    """(provider, api_key, model) to fail over to, when the other provider's key is in the environment"""
+    other = next(p for p in DEFAULT_MODELS if p != provider)
+    api_key = os.environ.get(API_KEY_ENV[other])
+    return (other, api_key, DEFAULT_MODELS[other]) if api_key else None
+
+
+def call_llm(provider, api_key, prompt, model=None, use_cache=True, on_slide=None, max_tokens=MAX_TOKENS,
+             schema=None, watch=None, failover=True):
+    """Run a prompt and return the parsed JSON, calling on_slide for each slide as it streams in.
+
+    watch(chunks), if given, wraps the provider's chunk iterator, e.g. to time
+    the first chunk or stop a stream that is no longer needed (see hedging.py).
+    failover=False keeps the request on this provider and key even while its circuit is open.
+    """
+    model = model or DEFAULT_MODELS[provider]
+    # Replies are checked against what was asked for even when it isn't sent as a schema
+    kind, schema = schema, schema if STRUCTURED_OUTPUT else None
+    # Structured and free-form answers to the same prompt are cached separately
+    cache_model = f"{model}+{schema}" if schema else model
+    cache = get_llm_cache()
+    with telemetry.span('llm', provider=provider, model=model, schema=schema, cached=False) as span:
+        if use_cache:
+            cached = cache.get(provider, cache_model, prompt)
+            if cached is not None:
+                span.set(cached=True)
+                replay_slides(cached, on_slide)
+                return cached
+
+        def attempt(provider, api_key, model, gateway_watch):
+            chunks = gateway_watch(text_stream(provider, api_key, model, prompt, max_tokens, schema))
+            result = stream_slides(watch(chunks) if watch else chunks, on_slide)
+            key = 'sections' if kind == 'sections' else 'slides'
+            if kind in ('deck', 'outline', 'sections') and not isinstance(result.get(key) if isinstance(result, dict) else None, list):
+                raise slide_schema.SchemaError(f"Response has no {key}")
+            if kind and kind.startswith('content:'):
+                # Raised rather than cached, so a retry of the same prompt asks the provider again
+                slide_schema.check_content(kind, result)
+            return result
+
+        result, provider, model = get_gateway().call(provider, api_key, model, attempt,
+                                                     estimate_tokens(prompt, max_tokens),
+                                                     _failover(provider) if failover else None)
+        if kind == 'deck':
+            try:
+                slide_schema.parse_deck(result)
+            except slide_schema.SchemaError as e:
+                span.set(invalid=str(e))
+                return result
+        # Under the provider that answered, which differs after a failover
+        cache.put(provider, f"{model}+{schema}" if schema else model, prompt, result)
+        return result
@@ -0,0 +1,203 @@
+"""Streaming LLM calls with slides handed out as soon as each one is complete.
+
+The apps used to wait for the whole response and then scrape it with
+re.search(r'\\{[\\s\\S]*\\}', ...). SlideStreamParser watches the text as it
+arrives and emits every element of the top-level "slides" array the moment its
+closing brace comes in, so the UI can preview and render early slides while the
+model is still writing later ones. The final structure is still parsed from the
+full text the same way as before. A reply the provider cut off at max_tokens, or
+whose JSON doesn't parse, raises IncompleteReply rather than passing for a
+shorter deck, so call_llm never caches it.
+"""
+import json
+import re
+import time
+
+import telemetry
+from prompt_cache import cacheable, get_prompt_cache
+
+
+class IncompleteReply(ValueError):
+    """The reply was cut off, or its JSON is broken; slides already handed to on_slide may be all there is"""
+
+
+class SlideStreamParser:
+    """Incremental scanner for {"slides": [{...}, {...}]} that tolerates prose and code fences around it"""
+
+    def __init__(self):
+        self.text = ''
+        self.slides = []
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._slides_depth = None
+        self._slide_start = None
+
+    def feed(self, chunk):
+        """Add a chunk of model output; returns the slides completed by it"""
+        self.text += chunk
+        text = self.text
+        completed = []
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i]
+                continue
+            if c == '"':
+                # Quotes outside the JSON body belong to surrounding prose
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i + 1
+            elif c == '{' or c == '[':
+                if c == '[' and self._stack == ['{'] and self._last_string == 'slides':
+                    self._slides_depth = 2
+                elif c == '{' and self._slides_depth and len(self._stack) == self._slides_depth:
+                    self._slide_start = i
+                self._stack.append(c)
+            elif c == '}' or c == ']':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if self._slides_depth and len(self._stack) == self._slides_depth:
+                    if c == '}' and self._slide_start is not None:
+                        slide = self._load(text[self._slide_start:i + 1])
+                        self._slide_start = None
+                        if slide is not None:
+                            self.slides.append(slide)
+                            completed.append(slide)
+                elif self._slides_depth and len(self._stack) < self._slides_depth:
+                    self._slides_depth = None
+        self._pos = len(text)
+        return completed
+
+    @staticmethod
+    def _load(fragment):
+        try:
+            slide = json.loads(fragment)
+        except ValueError:
+            return None
+        return slide if isinstance(slide, dict) else None
+
+    def result(self):
+        """Parse the full response; IncompleteReply if it is broken after some slides came through"""
+        json_match = re.search(r'\{[\s\S]*\}', self.text)
+        try:
+            return json.loads(json_match.group()) if json_match else json.loads(self.text)
+        except ValueError as e:
+            if self.slides:
+                raise IncompleteReply(f"Reply is broken after {len(self.slides)} complete slide(s): {e}") from e
+            raise
+
+
+def _anthropic_messages(prompt):
+    """messages for a prompt, with its static prefix as a cached system prompt when it has one"""
+    static = cacheable(prompt)
+    if not static:
+        return {'messages': [{"role": "user", "content": prompt}]}
+    return {'system': [{"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}],
+            'messages': [{"role": "user", "content": prompt.dynamic}]}
+
+
+def anthropic_text_stream(client, model, prompt, max_tokens=3000):
+    """Yield text chunks from a streaming Messages API call"""
+    with client.messages.stream(model=model, max_tokens=max_tokens, **_anthropic_messages(prompt)) as stream:
+        for text in stream.text_stream:
+            yield text
+        _anthropic_finish(stream)
+
+
+def anthropic_tool_stream(client, model, prompt, tool, max_tokens=3000):
+    """Yield the forced tool call's input JSON as it streams; it has the same shape as a text answer"""
+    with client.messages.stream(model=model, max_tokens=max_tokens, tools=[tool],
+                                tool_choice={"type": "tool", "name": tool["name"]},
+                                **_anthropic_messages(prompt)) as stream:
+        for event in stream:
+            if event.type == "input_json":
+                yield event.partial_json
+        _anthropic_finish(stream)
+
+
+def _anthropic_finish(stream):
+    """Record the usage; IncompleteReply if the reply stopped at max_tokens"""
+    message = stream.get_final_message()
+    usage = message.usage
+    # input_tokens leaves out the tokens read from or written to the prompt cache
+    read = getattr(usage, 'cache_read_input_tokens', None) or 0
+    write = getattr(usage, 'cache_creation_input_tokens', None) or 0
+    get_prompt_cache().record('anthropic', usage.input_tokens + read + write, read, write)
+    telemetry.annotate(input_tokens=usage.input_tokens + read + write, output_tokens=usage.output_tokens,
+                       cache_read_tokens=read, cache_write_tokens=write)
+    if message.stop_reason == 'max_tokens':
+        raise IncompleteReply(f"Reply was cut off at max_tokens ({usage.output_tokens} output tokens)")
+
+
+def gemini_text_stream(client, model_name, prompt, response_schema=None, cached_content=None):
+    """Yield text chunks from a streaming generateContent call, constrained to JSON when a schema is given.
+
+    cached_content names a CachedContent (prompt_cache.py) holding the prompt's static prefix.
+    """
+    from google.ai import generativelanguage as glm
+    request = glm.GenerateContentRequest(
+        model=model_name if model_name.startswith('models/') else f'models/{model_name}',
+        contents=[glm.Content(role='user', parts=[glm.Part(text=prompt)])],
+        generation_config=(glm.GenerationConfig(response_mime_type='application/json', response_schema=response_schema)
+                           if response_schema else None),
+        cached_content=cached_content)
+    usage = finish_reason = None
+    # retry=None: 503s are retried in provider_gateway, not by the SDK as well
+    for chunk in client.stream_generate_content(request, retry=None):
+        if 'usage_metadata' in chunk:
+            usage = chunk.usage_metadata
+        if chunk.candidates and chunk.candidates[0].finish_reason:
+            finish_reason = chunk.candidates[0].finish_reason
+        text = ''.join(part.text for candidate in chunk.candidates[:1] for part in candidate.content.parts)
+        if text:
+            yield text
+    # Every chunk carries the running totals; the last one has the final counts. prompt_token_count
+    # includes the cached tokens, explicit (prompt_cache.py) or implicit
+    if usage:
+        read = getattr(usage, 'cached_content_token_count', 0) or 0
+        get_prompt_cache().record('gemini', usage.prompt_token_count, read)
+        telemetry.annotate(input_tokens=usage.prompt_token_count, output_tokens=usage.candidates_token_count,
+                           cache_read_tokens=read)
+    if finish_reason == glm.Candidate.FinishReason.MAX_TOKENS:
+        raise IncompleteReply("Reply was cut off at max_tokens")
+
+
+def stream_slides(chunks, on_slide=None):
+    """Consume text chunks, call on_slide(slide) for each finished slide, return the parsed structure"""
+    parser = SlideStreamParser()
+    parse_s = 0.0
+    for chunk in chunks:
+        started = time.perf_counter()
+        completed = parser.feed(chunk)
+        parse_s += time.perf_counter() - started
+        for slide in completed:
+            if on_slide:
+                on_slide(slide)
+    started = time.perf_counter()
+    try:
+        slide_structure = parser.result()
+    finally:
+        telemetry.record('parse', parse_s + time.perf_counter() - started, chars=len(parser.text),
+                         slides=len(parser.slides))
+    # A response the scanner couldn't follow still gets its slides announced
+    if on_slide and not parser.slides:
+        replay_slides(slide_structure, on_slide)
+    return slide_structure
+
+
+def replay_slides(slide_structure, on_slide):
+    """Announce every slide of an already complete structure, e.g. a cache hit"""
+    if on_slide:
+        for slide in slide_structure.get('slides', []):
+            on_slide(slide)
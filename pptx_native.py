@@ -0,0 +1,493 @@
+"""Pure-Python PPTX engine for EduBridge decks.
+
+Writes the OOXML parts straight into an in-memory zip, with no Node process,
+temp files or pptxgenjs. Geometry, colors and fonts mirror deck_renderer.js
+shape for shape, so both engines produce the same shape trees for the same
+slide JSON (see renderer_parity.py).
+
+The brand header, footer and background are compiled once into the slide
+layout every slide references, rather than repeated in each slide; compiled
+layouts are cached per brand config.
+"""
+import io
+import json
+import math
+import re
+import zipfile
+from datetime import datetime, timezone
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# Bump whenever the rendered output changes
+NATIVE_RENDERER_VERSION = '2.0.0'
+
+EMU_PER_INCH = 914400
+EMU_PER_POINT = 12700
+SLIDE_WIDTH = 9144000   # LAYOUT_16x9, 10in
+SLIDE_HEIGHT = 5143500  # 5.625in
+
+NS = ('xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+      'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+      'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"')
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+ALIGN = {'left': 'l', 'center': 'ctr', 'right': 'r', 'justify': 'just'}
+VALIGN = {'top': 't', 'middle': 'ctr', 'bottom': 'b'}
+GEOMETRY = {'rect': 'rect', 'ellipse': 'ellipse', 'rightArrow': 'rightArrow'}
+
+
+def emu(inches):
+    # pptxgenjs rounds with Math.round, i.e. halves go up
+    return int(math.floor(inches * EMU_PER_INCH + 0.5))
+
+
+def _js_string(value):
+    # String(value) in JS: no ".0" on whole numbers, and exponents written like 1e-7 / 1e+21
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e21:
+        return str(int(value))
+    mantissa, e, exponent = repr(value).partition('e')
+    return f'{mantissa}e{int(exponent):+d}' if e else mantissa
+
+
+def extract_text(obj):
+    """Python twin of deck_renderer.js extractText()"""
+    if isinstance(obj, str):
+        text = obj
+    elif isinstance(obj, dict):
+        text = (obj.get('text') or obj.get('title') or obj.get('name') or obj.get('description')
+                or obj.get('content') or json.dumps(obj, ensure_ascii=False, separators=(',', ':')))
+    elif isinstance(obj, list):
+        text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    elif obj is None or isinstance(obj, bool):
+        text = json.dumps(obj)
+    else:
+        text = _js_string(obj)
+    if not isinstance(text, str):
+        text = _js_string(text)
+    # Remove markdown formatting
+    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
+    text = re.sub(r'\*(.+?)\*', r'\1', text)
+    text = re.sub(r'`(.+?)`', r'\1', text)
+    text = text.replace('**', '').replace('*', '')
+    return text.strip()
+
+
+def make_theme(brand):
+    c = brand['colors']
+    return {
+        'colors': {
+            'primary1': c['yellow'], 'primary2': c['green'], 'primary3': c['teal'], 'primary4': c['blue'],
+            'accent1': c['coral'], 'accent2': c['purple'], 'background': c['cream'],
+            'textDark': c['darkText'], 'textLight': c['lightText'], 'white': c['white'],
+        },
+        'companyName': brand['company_name'],
+        'tagline1': brand['tagline_1'],
+        'tagline2': brand['tagline_2'],
+        'hashtag': brand['hashtag'],
+        'footerText': brand['footer_text'],
+        'font': brand['font'],
+    }
+
+
+class Slide:
+    """Collects shapes with the same addText/addShape options the JS layouts use"""
+
+    def __init__(self, background=None):
+        self.background = background
+        self.shapes = []
+
+    def add_text(self, text, x, y, w, h, font_size, color, font, bold=False, italic=False, align=None, valign=None):
+        self.shapes.append(('text', text, x, y, w, h, dict(
+            font_size=font_size, color=color, font=font, bold=bold, italic=italic, align=align, valign=valign)))
+
+    def add_shape(self, geom, x, y, w, h, fill, line=None):
+        self.shapes.append(('shape', geom, x, y, w, h, dict(fill=fill, line=line)))
+
+    def sp_tree_xml(self):
+        parts = []
+        for idx, (kind, value, x, y, w, h, opts) in enumerate(self.shapes):
+            if kind == 'text':
+                parts.append(_text_xml(idx, value, x, y, w, h, **opts))
+            else:
+                parts.append(_shape_xml(idx, value, x, y, w, h, **opts))
+        return ('<p:spTree><p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+                '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/>'
+                f'<a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/></a:xfrm></p:grpSpPr>{"".join(parts)}</p:spTree>')
+
+    def bg_xml(self):
+        if not self.background:
+            return ''
+        return (f'<p:bg><p:bgPr><a:solidFill><a:srgbClr val="{self.background}"/></a:solidFill>'
+                '<a:effectLst/></p:bgPr></p:bg>')
+
+    def to_xml(self, number):
+        return (f'{XML_HEADER}<p:sld {NS}><p:cSld name="Slide {number}">{self.bg_xml()}{self.sp_tree_xml()}</p:cSld>'
+                '<p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>')
+
+
+def _xfrm(x, y, w, h):
+    return f'<a:xfrm><a:off x="{emu(x)}" y="{emu(y)}"/><a:ext cx="{emu(w)}" cy="{emu(h)}"/></a:xfrm>'
+
+
+def _shape_xml(idx, geom, x, y, w, h, fill, line=None):
+    ln = '<a:ln></a:ln>'
+    if line:
+        ln = (f'<a:ln w="{int(line["width"] * EMU_PER_POINT)}"><a:solidFill><a:srgbClr val="{line["color"]}"/>'
+              '</a:solidFill><a:prstDash val="solid"/></a:ln>')
+    return (f'<p:sp><p:nvSpPr><p:cNvPr id="{idx + 2}" name="Shape {idx}"></p:cNvPr><p:cNvSpPr/><p:nvPr></p:nvPr>'
+            f'</p:nvSpPr><p:spPr>{_xfrm(x, y, w, h)}<a:prstGeom prst="{GEOMETRY[geom]}"><a:avLst></a:avLst></a:prstGeom>'
+            f'<a:solidFill><a:srgbClr val="{fill}"/></a:solidFill>{ln}</p:spPr></p:sp>')
+
+
+def _text_xml(idx, text, x, y, w, h, font_size, color, font, bold=False, italic=False, align=None, valign=None):
+    sz = int(font_size * 100)
+    algn = f' algn="{ALIGN[align]}"' if align else ''
+    anchor = VALIGN.get(valign, 'ctr')
+    attrs = f'lang="en-US" sz="{sz}"' + (' b="1"' if bold else '') + (' i="1"' if italic else '') + ' dirty="0"'
+    face = _xml_text(str(font))
+    rpr = (f'<a:rPr {attrs}><a:solidFill><a:srgbClr val="{color}"/></a:solidFill>'
+           f'<a:latin typeface="{face}" pitchFamily="34" charset="0"/>'
+           f'<a:ea typeface="{face}" pitchFamily="34" charset="-122"/>'
+           f'<a:cs typeface="{face}" pitchFamily="34" charset="-120"/></a:rPr>')
+    paras = ''.join(
+        f'<a:p><a:pPr{algn} indent="0" marL="0"><a:buNone/></a:pPr><a:r>{rpr}<a:t>{_xml_text(line)}</a:t></a:r>'
+        f'<a:endParaRPr lang="en-US" sz="{sz}" dirty="0"/></a:p>'
+        for line in str(text).replace('\r\n', '\n').split('\n')
+    )
+    return (f'<p:sp><p:nvSpPr><p:cNvPr id="{idx + 2}" name="Text {idx}"></p:cNvPr><p:cNvSpPr/><p:nvPr></p:nvPr>'
+            f'</p:nvSpPr><p:spPr>{_xfrm(x, y, w, h)}<a:prstGeom prst="rect"><a:avLst></a:avLst></a:prstGeom>'
+            f'<a:noFill/><a:ln></a:ln></p:spPr><p:txBody><a:bodyPr wrap="square" rtlCol="0" anchor="{anchor}">'
+            f'</a:bodyPr><a:lstStyle/>{paras}</p:txBody></p:sp>')
+
+
+def _xml_text(text):
+    # Strip characters XML 1.0 can't carry, then escape
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f]', '', text)
+    return escape(text, {'"': '&quot;', "'": '&apos;'})
+
+
+# ---- Brand chrome and layouts (keep in step with deck_renderer.js) ----
+
+def brand_master(th):
+    """The brand chrome every slide shows, drawn once on the slide layout"""
+    c = th['colors']
+    s = Slide(c['background'])
+    s.add_text(th['companyName'], 0.5, 0.3, 2, 0.4, 16, c['textDark'], th['font'], bold=True)
+    s.add_text(th['tagline1'], 2.6, 0.3, 5, 0.4, 9, c['textLight'], th['font'])
+    s.add_text(th['tagline2'], 2.6, 0.55, 5, 0.3, 8, c['textLight'], th['font'])
+    s.add_text(th['hashtag'], 8.5, 0.3, 1, 0.4, 9, c['textLight'], th['font'], align='right')
+    s.add_text(th['footerText'], 0.5, 5.2, 9, 0.2, 8, c['textLight'], th['font'], align='center')
+    return s
+
+
+def new_slide():
+    return Slide()
+
+
+def add_title(s, th, t, font_size=32):
+    s.add_text(t, 0.5, 1.1, 9, 0.5, font_size, th['colors']['textDark'], th['font'], bold=True, align='center')
+
+
+def title_slide(th, slide):
+    c = th['colors']
+    s = new_slide()
+    s.add_text(slide.get('title', ''), 0.5, 2, 9, 1, 48, c['textDark'], th['font'], bold=True, align='center', valign='middle')
+    if 'subtitle' in slide:
+        s.add_text(slide['subtitle'], 0.5, 3.2, 9, 0.5, 20, c['textLight'], th['font'], italic=True, align='center')
+    return s
+
+
+def numbered_boxes(th, t, c):
+    col = th['colors']
+    s = new_slide()
+    add_title(s, th, t)
+    cols = [col['primary1'], col['primary2'], col['primary3'], col['primary4']]
+    for i, b in enumerate((c.get('boxes') or [])[:4]):
+        x = 0.5 + i * 2.3
+        s.add_shape('rect', x, 2.2, 2.1, 2.4, cols[i])
+        s.add_text(str(i + 1).zfill(2), x, 2.3, 2.1, 0.8, 72, col['white'], th['font'], bold=True, align='center', valign='top')
+        s.add_text(extract_text(b), x + 0.15, 3.3, 1.8, 1.1, 16, col['white'], th['font'], bold=True, align='left', valign='top')
+    return s
+
+
+def definition_boxes(th, t, c):
+    col = th['colors']
+    s = new_slide()
+    add_title(s, th, t)
+    s.add_shape('rect', 1, 1.9, 8, 1.2, col['white'])
+    s.add_shape('rect', 1, 1.9, 0.08, 1.2, col['primary3'])
+    s.add_text(extract_text(c.get('definition') or ''), 1.3, 2.05, 7.4, 1, 14, col['textDark'], th['font'], valign='middle')
+    cols = [col['primary1'], col['primary2'], col['primary4']]
+    for i, b in enumerate((c.get('boxes') or [])[:3]):
+        x = 1 + i * 2.7
+        s.add_shape('rect', x, 3.4, 2.4, 1, cols[i])
+        s.add_text(extract_text(b), x + 0.15, 3.5, 2.1, 0.8, 13, col['white'], th['font'], bold=True, align='center', valign='middle')
+    return s
+
+
+def split_layout(th, t, c):
+    col = th['colors']
+    s = new_slide()
+    add_title(s, th, t, 28)
+    for i, b in enumerate((c.get('bullets') or [])[:5]):
+        s.add_shape('ellipse', 0.7, 2 + i * 0.6, 0.15, 0.15, col['primary3'])
+        s.add_text(extract_text(b), 1, 1.95 + i * 0.6, 4.5, 0.5, 11, col['textDark'], th['font'])
+    hcols = [col['primary2'], col['primary4'], col['accent1']]
+    for i, h in enumerate((c.get('highlights') or [])[:3]):
+        y = 2 + i * 1
+        s.add_shape('rect', 5.8, y, 3.5, 0.8, hcols[i])
+        s.add_text(extract_text(h), 6, y + 0.1, 3.3, 0.6, 14, col['white'], th['font'], bold=True, valign='middle')
+    return s
+
+
+def icon_grid(th, t, c):
+    col = th['colors']
+    s = new_slide()
+    add_title(s, th, t)
+    cols = [col['primary1'], col['primary2'], col['primary3'], col['primary4'], col['accent1'], col['accent2']]
+    for i, item in enumerate((c.get('items') or [])[:6]):
+        x = 1.2 + (i % 3) * 2.7
+        y = 2.3 + (i // 3) * 1.5
+        s.add_shape('rect', x, y, 2.4, 1.2, col['white'], line={'color': cols[i % 6], 'width': 3})
+        s.add_shape('ellipse', x + 0.85, y + 0.15, 0.7, 0.7, cols[i % 6])
+        icon = (item.get('icon') or '✓') if isinstance(item, dict) else '✓'
+        s.add_text(str(icon), x + 0.85, y + 0.15, 0.7, 0.7, 24, col['white'], th['font'], align='center', valign='middle')
+        s.add_text(extract_text(item), x + 0.1, y + 0.7, 2.2, 0.4, 11, col['textDark'], th['font'], bold=True, align='center')
+    return s
+
+
+def comparison_table(th, t, c):
+    col = th['colors']
+    s = new_slide()
+    add_title(s, th, t)
+    s.add_shape('ellipse', 4.6, 2.3, 0.8, 0.8, col['accent1'])
+    s.add_text('VS', 4.6, 2.3, 0.8, 0.8, 18, col['white'], th['font'], bold=True, align='center', valign='middle')
+    sides = [
+        (0.7, col['primary4'], c.get('left_title') or 'A', c.get('left_points') or []),
+        (5.6, col['primary2'], c.get('right_title') or 'B', c.get('right_points') or []),
+    ]
+    for x, color, title, points in sides:
+        s.add_shape('rect', x, 1.9, 3.7, 0.5, color)
+        s.add_text(extract_text(title), x, 1.9, 3.7, 0.5, 18, col['white'], th['font'], bold=True, align='center', valign='middle')
+        for i, pt in enumerate(points[:3]):
+            s.add_shape('rect', x, 2.5 + i * 0.5, 3.7, 0.4, col['white'], line={'color': color, 'width': 2})
+            s.add_text(extract_text(pt), x + 0.15, 2.55 + i * 0.5, 3.4, 0.3, 11, col['textDark'], th['font'], valign='middle')
+    return s
+
+
+def flow_diagram(th, t, c):
+    col = th['colors']
+    s = new_slide()
+    add_title(s, th, t)
+    cols = [col['primary1'], col['primary2'], col['primary3'], col['primary4']]
+    for i, step in enumerate((c.get('steps') or [])[:4]):
+        x = 0.8 + i * 2.3
+        s.add_shape('rect', x, 2.5, 2, 0.8, cols[i])
+        s.add_text(extract_text(step), x + 0.1, 2.6, 1.8, 0.6, 12, col['white'], th['font'], bold=True, align='center', valign='middle')
+        if i < 3:
+            s.add_shape('rightArrow', x + 2.1, 2.7, 0.7, 0.4, col['textLight'])
+    if c.get('outcome'):
+        s.add_shape('rect', 1, 4, 8, 0.6, col['accent1'])
+        s.add_text('🎯 ' + extract_text(c['outcome']), 1.2, 4.1, 7.6, 0.4, 13, col['white'], th['font'], bold=True, valign='middle')
+    return s
+
+
+def three_boxes(th, t, c):
+    col = th['colors']
+    s = new_slide()
+    add_title(s, th, t)
+    cols = [col['primary1'], col['primary2'], col['primary4']]
+    for i, b in enumerate((c.get('boxes') or [])[:3]):
+        x = 1 + i * 2.7
+        s.add_shape('rect', x, 2.5, 2.4, 1.5, cols[i])
+        s.add_text(extract_text(b), x + 0.2, 2.7, 2, 1.1, 14, col['white'], th['font'], bold=True, align='center', valign='middle')
+    return s
+
+
+LAYOUTS = {
+    'numbered_boxes': numbered_boxes,
+    'definition_boxes': definition_boxes,
+    'split_layout': split_layout,
+    'icon_grid': icon_grid,
+    'comparison_table': comparison_table,
+    'flow_diagram': flow_diagram,
+    'three_boxes': three_boxes,
+}
+
+
+def build_slide(slide, th):
+    """Slide structure entry -> Slide"""
+    if slide.get('isTitle'):
+        s = title_slide(th, slide)
+    else:
+        layout = slide.get('layout') or 'numbered_boxes'
+        if layout not in LAYOUTS:
+            raise ValueError(f'Unknown layout "{layout}" on slide {slide.get("slideNumber")}')
+        s = LAYOUTS[layout](th, slide.get('title', ''), slide.get('content') or {})
+    # Text frames the fitter shrank, keyed by shape index (see text_fit.py)
+    for idx, size in (slide.get('fontSizes') or {}).items():
+        kind, value, x, y, w, h, opts = s.shapes[int(idx)]
+        if kind == 'text':
+            s.shapes[int(idx)] = (kind, value, x, y, w, h, dict(opts, font_size=size))
+    return s
+
+
+# ---- Package parts ----
+
+THEME_XML = (
+    f'{XML_HEADER}<a:theme xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" name="Office Theme">'
+    '<a:themeElements><a:clrScheme name="Office">'
+    '<a:dk1><a:sysClr val="windowText" lastClr="000000"/></a:dk1><a:lt1><a:sysClr val="window" lastClr="FFFFFF"/></a:lt1>'
+    '<a:dk2><a:srgbClr val="44546A"/></a:dk2><a:lt2><a:srgbClr val="E7E6E6"/></a:lt2>'
+    '<a:accent1><a:srgbClr val="4472C4"/></a:accent1><a:accent2><a:srgbClr val="ED7D31"/></a:accent2>'
+    '<a:accent3><a:srgbClr val="A5A5A5"/></a:accent3><a:accent4><a:srgbClr val="FFC000"/></a:accent4>'
+    '<a:accent5><a:srgbClr val="5B9BD5"/></a:accent5><a:accent6><a:srgbClr val="70AD47"/></a:accent6>'
+    '<a:hlink><a:srgbClr val="0563C1"/></a:hlink><a:folHlink><a:srgbClr val="954F72"/></a:folHlink></a:clrScheme>'
+    '<a:fontScheme name="Office"><a:majorFont><a:latin typeface="Calibri Light"/><a:ea typeface=""/><a:cs typeface=""/>'
+    '</a:majorFont><a:minorFont><a:latin typeface="Calibri"/><a:ea typeface=""/><a:cs typeface=""/></a:minorFont>'
+    '</a:fontScheme><a:fmtScheme name="Office"><a:fillStyleLst>'
+    + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 +
+    '</a:fillStyleLst><a:lnStyleLst>'
+    + ''.join(f'<a:ln w="{w}"><a:solidFill><a:schemeClr val="phClr"/></a:solidFill></a:ln>' for w in (6350, 12700, 19050)) +
+    '</a:lnStyleLst><a:effectStyleLst>'
+    + '<a:effectStyle><a:effectLst/></a:effectStyle>' * 3 +
+    '</a:effectStyleLst><a:bgFillStyleLst>'
+    + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 +
+    '</a:bgFillStyleLst></a:fmtScheme></a:themeElements></a:theme>'
+)
+
+EMPTY_SP_TREE = (
+    '<p:spTree><p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+    '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/><a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/>'
+    '</a:xfrm></p:grpSpPr></p:spTree>'
+)
+
+MASTER_XML = (
+    f'{XML_HEADER}<p:sldMaster {NS}><p:cSld>{EMPTY_SP_TREE}</p:cSld>'
+    '<p:clrMap bg1="lt1" tx1="dk1" bg2="lt2" tx2="dk2" accent1="accent1" accent2="accent2" accent3="accent3" '
+    'accent4="accent4" accent5="accent5" accent6="accent6" hlink="hlink" folHlink="folHlink"/>'
+    '<p:sldLayoutIdLst><p:sldLayoutId id="2147483649" r:id="rId1"/></p:sldLayoutIdLst></p:sldMaster>'
+)
+
+
+@lru_cache(maxsize=32)
+def _compile_layout(brand_json):
+    master = brand_master(make_theme(json.loads(brand_json)))
+    return (f'{XML_HEADER}<p:sldLayout {NS} preserve="1"><p:cSld name="BRAND">{master.bg_xml()}{master.sp_tree_xml()}'
+            '</p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sldLayout>')
+
+
+def compile_layout(brand_config):
+    """slideLayout1.xml with the brand background, header and footer; cached per brand config"""
+    return _compile_layout(json.dumps(brand_config, sort_keys=True))
+
+
+def _rels(*rels):
+    body = ''.join(f'<Relationship Id="{rid}" Type="{typ}" Target="{target}"/>' for rid, typ, target in rels)
+    return f'{XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{body}</Relationships>'
+
+
+SLIDE_RELS = _rels(('rId1', f'{REL_NS}/slideLayout', '../slideLayouts/slideLayout1.xml'))
+
+
+class PptxBuilder:
+    """Streams slides into a PPTX zip as they are added; finish() writes the package parts"""
+
+    def __init__(self, brand_config, fileobj=None):
+        self.brand_config = brand_config
+        self.theme = make_theme(brand_config)
+        self._buffer = fileobj if fileobj is not None else io.BytesIO()
+        self._zip = zipfile.ZipFile(self._buffer, 'w', zipfile.ZIP_DEFLATED)
+        self.slide_count = 0
+
+    def add_slide(self, slide):
+        self.add_slide_xml(build_slide(slide, self.theme).to_xml(self.slide_count + 1))
+
+    def add_slide_xml(self, xml):
+        self.slide_count += 1
+        n = self.slide_count
+        self._zip.writestr(f'ppt/slides/slide{n}.xml', xml)
+        self._zip.writestr(f'ppt/slides/_rels/slide{n}.xml.rels', SLIDE_RELS)
+
+    def finish(self):
+        """Write the remaining package parts; returns the bytes when building in memory"""
+        n = self.slide_count
+        z = self._zip
+        overrides = [
+            ('/ppt/presentation.xml', 'presentationml.presentation.main+xml'),
+            ('/ppt/slideMasters/slideMaster1.xml', 'presentationml.slideMaster+xml'),
+            ('/ppt/slideLayouts/slideLayout1.xml', 'presentationml.slideLayout+xml'),
+            ('/ppt/theme/theme1.xml', 'theme+xml'),
+            ('/ppt/presProps.xml', 'presentationml.presProps+xml'),
+            ('/ppt/viewProps.xml', 'presentationml.viewProps+xml'),
+            ('/ppt/tableStyles.xml', 'presentationml.tableStyles+xml'),
+            ('/docProps/app.xml', 'extended-properties+xml'),
+        ] + [(f'/ppt/slides/slide{i}.xml', 'presentationml.slide+xml') for i in range(1, n + 1)]
+        z.writestr('[Content_Types].xml', (
+            f'{XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            + ''.join(f'<Override PartName="{part}" ContentType="application/vnd.openxmlformats-officedocument.{ct}"/>'
+                      for part, ct in overrides)
+            + '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+            '</Types>'))
+        z.writestr('_rels/.rels', _rels(
+            ('rId1', f'{REL_NS}/extended-properties', 'docProps/app.xml'),
+            ('rId2', 'http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties', 'docProps/core.xml'),
+            ('rId3', f'{REL_NS}/officeDocument', 'ppt/presentation.xml')))
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        author = escape(str(self.theme['companyName']))
+        z.writestr('docProps/core.xml', (
+            f'{XML_HEADER}<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+            f'<dc:creator>{author}</dc:creator><cp:lastModifiedBy>{author}</cp:lastModifiedBy><cp:revision>1</cp:revision>'
+            f'<dcterms:created xsi:type="dcterms:W3CDTF">{now}</dcterms:created>'
+            f'<dcterms:modified xsi:type="dcterms:W3CDTF">{now}</dcterms:modified></cp:coreProperties>'))
+        z.writestr('docProps/app.xml', (
+            f'{XML_HEADER}<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+            f'<Application>Microsoft Office PowerPoint</Application><PresentationFormat>On-screen Show (16:9)</PresentationFormat>'
+            f'<Slides>{n}</Slides></Properties>'))
+        z.writestr('ppt/presentation.xml', (
+            f'{XML_HEADER}<p:presentation {NS} saveSubsetFonts="1"><p:sldMasterIdLst>'
+            '<p:sldMasterId id="2147483648" r:id="rId1"/></p:sldMasterIdLst><p:sldIdLst>'
+            + ''.join(f'<p:sldId id="{255 + i}" r:id="rId{i + 1}"/>' for i in range(1, n + 1))
+            + f'</p:sldIdLst><p:sldSz cx="{SLIDE_WIDTH}" cy="{SLIDE_HEIGHT}"/><p:notesSz cx="{SLIDE_HEIGHT}" cy="{SLIDE_WIDTH}"/>'
+            '</p:presentation>'))
+        z.writestr('ppt/_rels/presentation.xml.rels', _rels(
+            ('rId1', f'{REL_NS}/slideMaster', 'slideMasters/slideMaster1.xml'),
+            *[(f'rId{i + 1}', f'{REL_NS}/slide', f'slides/slide{i}.xml') for i in range(1, n + 1)],
+            (f'rId{n + 2}', f'{REL_NS}/presProps', 'presProps.xml'),
+            (f'rId{n + 3}', f'{REL_NS}/viewProps', 'viewProps.xml'),
+            (f'rId{n + 4}', f'{REL_NS}/theme', 'theme/theme1.xml'),
+            (f'rId{n + 5}', f'{REL_NS}/tableStyles', 'tableStyles.xml')))
+        z.writestr('ppt/presProps.xml', f'{XML_HEADER}<p:presentationPr {NS}/>')
+        z.writestr('ppt/viewProps.xml', f'{XML_HEADER}<p:viewPr {NS}><p:gridSpacing cx="76200" cy="76200"/></p:viewPr>')
+        z.writestr('ppt/tableStyles.xml', (
+            f'{XML_HEADER}<a:tblStyleLst xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+            'def="{5C22544A-7EE6-4342-B048-85BDC9FD1C3A}"/>'))
+        z.writestr('ppt/theme/theme1.xml', THEME_XML)
+        z.writestr('ppt/slideMasters/slideMaster1.xml', MASTER_XML)
+        z.writestr('ppt/slideMasters/_rels/slideMaster1.xml.rels', _rels(
+            ('rId1', f'{REL_NS}/slideLayout', '../slideLayouts/slideLayout1.xml'),
+            ('rId2', f'{REL_NS}/theme', '../theme/theme1.xml')))
+        z.writestr('ppt/slideLayouts/slideLayout1.xml', compile_layout(self.brand_config))
+        z.writestr('ppt/slideLayouts/_rels/slideLayout1.xml.rels', _rels(
+            ('rId1', f'{REL_NS}/slideMaster', '../slideMasters/slideMaster1.xml')))
+        z.close()
+        if isinstance(self._buffer, io.BytesIO):
+            return self._buffer.getvalue()
+        return None
+
+    def close(self):
+        """Give up on the package: closes the zip without the remaining parts"""
+        self._zip.close()
+
+
+def render_deck(slide_structure, brand_config):
+    """Render a slide structure to PPTX bytes without Node"""
+    builder = PptxBuilder(brand_config)
+    for slide in slide_structure['slides']:
+        builder.add_slide(slide)
+    return builder.finish()
@@ -0,0 +1,169 @@
+"""Provider-side caching of the static part of the prompts.
+
+Every prompt used to start with the topic and then resend the same long block:
+the rules, the seven layout contracts and the example JSON. Prompts now start
+with that block (deck_planner.STYLE_GUIDE) as a static prefix, followed by a
+short dynamic suffix with the topic, slide count and instructions.
+split_prompt() returns the text as a Prompt: a str, so the response cache,
+logging and the fake server see the whole text as before, that also knows where
+the prefix ends.
+
+- Anthropic: the prefix is sent as the system prompt with cache_control, so
+  the tool schema and the prefix are cached for five minutes after each use
+- Gemini: the prefix becomes a CachedContent (context caching) per API key,
+  model and prefix, reused until PROMPT_CACHE_TTL runs out and then created
+  again; only the dynamic suffix is sent with each request
+
+Providers only cache prefixes above a minimum length (PROMPT_CACHE_MIN_TOKENS,
+1024 for the default models); shorter prefixes, and Gemini models where the
+cache can't be created, get the whole prompt as before. Cache reads and writes
+come from the usage the providers report. They are annotated on the llm span
+(cache_read_tokens, cache_write_tokens), exported as token metrics and summed
+per provider in get_prompt_cache().summary(), with the input tokens they saved
+at the providers' cached-token prices. Gemini also bills cache storage per
+hour, which is not counted. PROMPT_CACHE=0 turns it off.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import telemetry
+from llm_clients import get_clients, key_fingerprint
+
+PROMPT_CACHE = os.environ.get('PROMPT_CACHE', '1') != '0'
+PROMPT_CACHE_TTL = int(os.environ.get('PROMPT_CACHE_TTL', 3600))
+MIN_CACHE_TOKENS = int(os.environ.get('PROMPT_CACHE_MIN_TOKENS', 1024))
+CHARS_PER_TOKEN = 4
+# Seconds before creating a Gemini cached content is tried again after it failed
+FAILED_RETRY_S = 300
+
+# As a share of a normal input token: the price of reading a cached token, and the extra paid to write
+# one (Anthropic charges 25% more for the request that writes; Gemini bills creating the cache in full)
+READ_PRICE = {'anthropic': 0.1, 'gemini': 0.25}
+WRITE_EXTRA = {'anthropic': 0.25, 'gemini': 1.0}
+
+
+class Prompt(str):
+    """Prompt text that remembers where its static, cacheable prefix ends"""
+    static = ''
+
+    @property
+    def dynamic(self):
+        return self[len(self.static):]
+
+
+def split_prompt(static, dynamic):
+    prompt = Prompt(static + dynamic)
+    prompt.static = static
+    return prompt
+
+
+def cacheable(prompt):
+    """The prompt's static prefix if it is worth caching, else ''"""
+    static = getattr(prompt, 'static', '')
+    if not PROMPT_CACHE or len(static) // CHARS_PER_TOKEN < MIN_CACHE_TOKENS:
+        return ''
+    return static
+
+
+class PromptCache:
+    """Gemini cached contents plus per-provider hit and token counters"""
+
+    def __init__(self, ttl=PROMPT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._contents = {}   # (key fingerprint, model, prefix digest) -> (cached content name or None, expires)
+        self._creating = {}   # same key -> lock held while that cached content is being created
+        self.stats = {provider: {'requests': 0, 'hits': 0, 'input_tokens': 0, 'read_tokens': 0, 'write_tokens': 0}
+                      for provider in READ_PRICE}
+        self.stats['gemini'].update(created=0, create_failed=0)
+
+    def gemini_content(self, api_key, model_name, static):
+        """Name of a CachedContent holding static for this key and model, or None to send the whole prompt"""
+        key = (key_fingerprint(api_key), model_name, hashlib.sha256(static.encode('utf-8')).hexdigest())
+        with self._lock:
+            name, expires = self._contents.get(key, (None, 0))
+            if expires > time.time():
+                return name
+            creating = self._creating.setdefault(key, threading.Lock())
+        # One create per key at a time, so concurrent calls don't each create a copy; other keys and
+        # the counters aren't held up by the network call
+        with creating:
+            with self._lock:
+                name, expires = self._contents.get(key, (None, 0))
+                if expires > time.time():
+                    return name
+            write_tokens = 0
+            try:
+                with telemetry.span('prompt_cache_create', provider='gemini', model=model_name):
+                    cached = get_clients().gemini_cache(api_key).create_cached_content(request={'cached_content': {
+                        'model': model_name if model_name.startswith('models/') else f'models/{model_name}',
+                        'system_instruction': {'parts': [{'text': static}]},
+                        'ttl': {'seconds': self.ttl}}})
+                name = cached.name
+                write_tokens = getattr(cached.usage_metadata, 'total_token_count', 0)
+                # Renewed a minute early so a request never names a content that just expired
+                expires = time.time() + max(1, self.ttl - 60)
+            except Exception:
+                # Too short for this model, no caching on it, or a network error: send whole prompts for a while
+                name = None
+                expires = time.time() + min(self.ttl, FAILED_RETRY_S)
+            with self._lock:
+                if name:
+                    self.stats['gemini']['created'] += 1
+                    self.stats['gemini']['write_tokens'] += write_tokens
+                else:
+                    self.stats['gemini']['create_failed'] += 1
+                self._contents[key] = (name, expires)
+                self._creating.pop(key, None)
+            return name
+
+    def record(self, provider, input_tokens, read_tokens=0, write_tokens=0):
+        """Count one request's usage; input_tokens includes the cached ones. Gemini's writes are counted
+        when its cached content is created."""
+        with self._lock:
+            stats = self.stats[provider]
+            stats['requests'] += 1
+            stats['hits'] += bool(read_tokens)
+            stats['input_tokens'] += input_tokens
+            stats['read_tokens'] += read_tokens
+            stats['write_tokens'] += write_tokens
+
+    def summary(self):
+        """Per provider counters plus hit_rate and saved_tokens (input-token equivalents), and totals"""
+        with self._lock:
+            providers = {p: dict(s) for p, s in self.stats.items()}
+        for provider, stats in providers.items():
+            stats['hit_rate'] = stats['hits'] / stats['requests'] if stats['requests'] else 0.0
+            stats['saved_tokens'] = round(stats['read_tokens'] * (1 - READ_PRICE[provider])
+                                          - stats['write_tokens'] * WRITE_EXTRA[provider])
+        total = {k: sum(s[k] for s in providers.values())
+                 for k in ('requests', 'hits', 'input_tokens', 'read_tokens', 'write_tokens', 'saved_tokens')}
+        total['hit_rate'] = total['hits'] / total['requests'] if total['requests'] else 0.0
+        return dict(total, providers=providers)
+
+    def clear(self):
+        with self._lock:
+            self._contents.clear()
+
+
+def describe(summary):
+    """One line for the UI, or '' before the first request"""
+    if not summary['requests']:
+        return ''
+    return (f"Prompt cache hits: {summary['hits']}/{summary['requests']} | "
+            f"~{summary['saved_tokens']:,} input tokens saved")
+
+
+_prompt_cache = None
+_prompt_cache_lock = threading.Lock()
+
+
+def get_prompt_cache():
+    """Process-wide prompt cache state, shared by every Streamlit session"""
+    global _prompt_cache
+    with _prompt_cache_lock:
+        if _prompt_cache is None:
+            _prompt_cache = PromptCache()
+        return _prompt_cache
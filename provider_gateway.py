@@ -0,0 +1,497 @@
+"""Rate limiting, retries, adaptive concurrency and circuit breaking for provider calls.
+
+Under batch load the providers answered with 429s and timeouts, and a failed
+call surfaced as one st.error. call_llm now runs every provider request
+through get_gateway(), which keeps one lane per provider and API key:
+
+- token buckets for requests per minute (LLM_RPM_<PROVIDER>) and tokens per
+  minute (LLM_TPM_<PROVIDER>, input plus output). A request reserves its
+  prompt's estimated tokens plus max_tokens before it is sent, and the
+  reservation is settled against the usage the provider reports afterwards.
+  0 turns a bucket off
+- retries of 429s, overload (5xx, 529) and timeouts, up to LLM_MAX_RETRIES,
+  with exponential backoff and full jitter (LLM_BACKOFF_BASE_S up to
+  LLM_BACKOFF_MAX_S). A retry-after from the provider is waited out in full
+  and pauses the lane's request bucket, so concurrent callers hold off too.
+  A request is only retried if no chunk of its reply arrived; after that its
+  slides may already have gone to on_slide
+- AIMD concurrency: at most `limit` requests in flight per lane, starting at
+  LLM_CONCURRENCY_INITIAL. Each reply whose time to first chunk stays within
+  LLM_LATENCY_TOLERANCE times the lane's recent best (10th percentile) adds
+  1/limit while the lane is busy; a slower one multiplies it by 0.9, an
+  overload error by 0.5, at most once per round of requests. The limit stays
+  between LLM_CONCURRENCY_MIN and LLM_CONCURRENCY_MAX
+- a circuit breaker that opens after LLM_BREAKER_FAILURES provider failures
+  (overload, any other 5xx, timeouts) in a row and lets one probe through
+  after LLM_BREAKER_COOLDOWN_S. Only a complete reply that parsed and passed
+  the schema check closes it again; other errors (a 400, a malformed or
+  truncated reply, a hedge cancelled) count neither way. While it is open, calls go to the other provider when its API key is set in the
+  environment (LLM_FAILOVER=0 turns that off), or fail at once
+
+The SDKs' own retries are off (llm_clients) so that backoff happens here only.
+get_gateway().summary() has each lane's buckets, limit, in-flight count,
+retries, throttled and backoff seconds and breaker state, and they are
+exported as metrics through telemetry.add_collector.
+"""
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import telemetry
+from llm_clients import key_fingerprint
+
+RATE_LIMITS = {
+    # Requests and tokens per minute; Anthropic's and Gemini's first paid tiers
+    'anthropic': (int(os.environ.get('LLM_RPM_ANTHROPIC', 50)), int(os.environ.get('LLM_TPM_ANTHROPIC', 40000))),
+    'gemini': (int(os.environ.get('LLM_RPM_GEMINI', 1000)), int(os.environ.get('LLM_TPM_GEMINI', 1000000))),
+}
+MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 3))
+BACKOFF_BASE_S = float(os.environ.get('LLM_BACKOFF_BASE_S', 1))
+BACKOFF_MAX_S = float(os.environ.get('LLM_BACKOFF_MAX_S', 30))
+CONCURRENCY_INITIAL = int(os.environ.get('LLM_CONCURRENCY_INITIAL', 4))
+CONCURRENCY_MIN = int(os.environ.get('LLM_CONCURRENCY_MIN', 1))
+CONCURRENCY_MAX = int(os.environ.get('LLM_CONCURRENCY_MAX', 16))
+LATENCY_TOLERANCE = float(os.environ.get('LLM_LATENCY_TOLERANCE', 2.0))
+BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN_S = float(os.environ.get('LLM_BREAKER_COOLDOWN_S', 30))
+FAILOVER = os.environ.get('LLM_FAILOVER', '1') != '0'
+
+CHARS_PER_TOKEN = 4
+OVERLOAD_DECREASE = 0.5
+LATENCY_DECREASE = 0.9
+# First-chunk times kept per lane for its latency baseline, and how many before it is trusted
+LATENCY_WINDOW = 50
+LATENCY_MIN_SAMPLES = 5
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+class ProviderUnavailable(RuntimeError):
+    """The provider's circuit is open and there is no other provider to fail over to"""
+
+
+class _Retry(Exception):
+    """A request that failed before any of its reply arrived and may be sent again"""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+def status_of(error):
+    """HTTP status of a provider SDK error, or None"""
+    for value in (getattr(error, 'status_code', None), getattr(error, 'code', None),
+                  getattr(getattr(error, 'response', None), 'status_code', None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_overload(error):
+    """429, 5xx, 529 and timeouts: worth retrying, and a sign the provider is struggling"""
+    if status_of(error) in RETRY_STATUS:
+        return True
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or 'Timeout' in name or 'Connection' in name
+
+
+def is_failure(error):
+    """Overload or any other server error: counts against the circuit breaker"""
+    return is_overload(error) or (status_of(error) or 0) >= 500
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait (retry-after-ms / retry-after header), or None"""
+    if getattr(error, 'retry_after', None) is not None:
+        return float(error.retry_after)
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def backoff_delay(attempt, wait=None):
+    """Full-jitter exponential backoff, never shorter than the provider's retry-after"""
+    if wait is not None:
+        # Spread out the callers that were all told the same retry-after
+        return max(wait, 0.0) + random.uniform(0, BACKOFF_BASE_S)
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+
+
+class TokenBucket:
+    """Refills per_minute tokens a minute, holding at most a minute's worth; per_minute=0 never limits"""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.per_minute, self.level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def reserve(self, amount):
+        """Take amount now, going into debt if there isn't enough; seconds to wait until the debt is repaid"""
+        if not self.per_minute:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self.level -= amount
+            return max(0.0, -self.level * 60 / self.per_minute)
+
+    def refund(self, amount):
+        """Give back (or, negative, take more than) what was reserved"""
+        if self.per_minute:
+            with self._lock:
+                self._refill()
+                self.level = min(self.per_minute, self.level + amount)
+
+    def pause(self, seconds):
+        """Let the next request through no sooner than seconds from now, e.g. for a retry-after"""
+        if self.per_minute:
+            with self._lock:
+                self._refill()
+                self.level = min(self.level, 1 - seconds * self.per_minute / 60)
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self.level
+
+
+class AdaptiveLimit:
+    """AIMD limit on requests in flight, driven by time to first chunk and overload errors"""
+
+    def __init__(self, initial=CONCURRENCY_INITIAL, minimum=CONCURRENCY_MIN, maximum=CONCURRENCY_MAX,
+                 tolerance=LATENCY_TOLERANCE):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self.increases = self.decreases = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def baseline(self):
+        """Recent best time to first chunk (10th percentile), or None until there are enough samples"""
+        if len(self._latencies) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[max(0, math.ceil(len(ordered) / 10) - 1)]
+
+    def acquire(self):
+        """Wait for a free slot; returns when the request started, for release()"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, first_chunk=None, overloaded=False):
+        with self._cond:
+            busy = self.in_flight * 2 >= self.limit
+            self.in_flight -= 1
+            baseline = self.baseline()
+            slow = first_chunk is not None and baseline is not None and first_chunk > baseline * self.tolerance
+            if first_chunk is not None:
+                self._latencies.append(first_chunk)
+            # Requests already in flight when the limit last dropped saw the old load; one decrease per round
+            if (overloaded or slow) and started >= self._last_decrease:
+                self.limit = max(self.minimum, self.limit * (OVERLOAD_DECREASE if overloaded else LATENCY_DECREASE))
+                self._last_decrease = time.monotonic()
+                self.decreases += 1
+            elif first_chunk is not None and not slow and busy and self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.increases += 1
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Opens after `failures` provider failures in a row; one probe is let through after `cooldown` seconds"""
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN_S):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.consecutive = 0
+        self.opens = 0
+        self._opened = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self._opened >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._probing:
+                    return False
+                self._probing = True
+            return self.state != 'open'
+
+    def record(self, ok):
+        """ok=True for a valid reply, False for a provider failure, None for an outcome that says neither"""
+        with self._lock:
+            probe, self._probing = self._probing, False
+            if ok is None:
+                # A half-open circuit lets the next call probe instead
+                return
+            if ok:
+                self.state = 'closed'
+                self.consecutive = 0
+                return
+            self.consecutive += 1
+            if probe or self.state == 'closed' and self.consecutive >= self.failures:
+                if self.state != 'open':
+                    self.opens += 1
+                self.state = 'open'
+                self._opened = time.monotonic()
+
+    def retry_in(self):
+        """Seconds until an open circuit lets a probe through"""
+        with self._lock:
+            return max(0.0, self._opened + self.cooldown - time.monotonic()) if self.state == 'open' else 0.0
+
+
+class Lane:
+    """Everything the gateway tracks for one provider and API key"""
+
+    def __init__(self, provider, fingerprint):
+        self.provider = provider
+        self.key = fingerprint
+        rpm, tpm = RATE_LIMITS.get(provider, (0, 0))
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = AdaptiveLimit()
+        self.breaker = CircuitBreaker()
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0, 'overloaded': 0,
+                      'failovers': 0, 'rejected': 0, 'throttled_s': 0.0, 'backoff_s': 0.0}
+        self._lock = threading.Lock()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+
+class Gateway:
+    """Lanes per (provider, API key) and the retry / failover loop around each provider request"""
+
+    def __init__(self, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def lane(self, provider, api_key):
+        key = (provider, key_fingerprint(api_key))
+        with self._lock:
+            if key not in self._lanes:
+                self._lanes[key] = Lane(*key)
+            return self._lanes[key]
+
+    def call(self, provider, api_key, model, attempt, estimate, failover=None):
+        """Run attempt(provider, api_key, model, watch) under the lane's limits and return
+        (result, provider, model); failover is (provider, api_key, model) to use while the circuit is open.
+
+        watch(chunks) must wrap the provider's chunk iterator, so the gateway sees the first chunk.
+        """
+        lane = self.lane(provider, api_key)
+        failover = failover if FAILOVER else None
+        error = None
+        try:
+            for retry in range(self.max_retries + 1):
+                if not lane.breaker.allow():
+                    lane.count('rejected')
+                    if not failover:
+                        raise error or ProviderUnavailable(
+                            f"{lane.provider} is failing (circuit open, next try in {lane.breaker.retry_in():.0f}s)")
+                    lane.count('failovers')
+                    provider, api_key, model = failover
+                    failover = None
+                    telemetry.annotate(failover=True, provider=provider, model=model)
+                    lane = self.lane(provider, api_key)
+                    if not lane.breaker.allow():
+                        lane.count('rejected')
+                        raise error or ProviderUnavailable("Both providers are failing (circuits open)")
+                try:
+                    return self._send(lane, api_key, model, attempt, estimate), provider, model
+                except _Retry as r:
+                    error = r.error
+                if retry == self.max_retries:
+                    break
+                if failover and lane.breaker.state == 'open':
+                    # Straight to the other provider rather than backing off first
+                    continue
+                wait = retry_after(error)
+                delay = backoff_delay(retry, wait)
+                if wait is not None:
+                    lane.requests.pause(delay)
+                lane.count('retries')
+                lane.count('backoff_s', delay)
+                telemetry.record('backoff', delay, provider=lane.provider, status=status_of(error))
+                time.sleep(delay)
+            raise error
+        finally:
+            # The raised error's traceback holds this frame; without this the two form a cycle that keeps
+            # the caller's half-built deck around until the garbage collector runs
+            error = None
+
+    def _send(self, lane, api_key, model, attempt, estimate):
+        lane.count('requests')
+        started = time.perf_counter()
+        wait = max(lane.requests.reserve(1), lane.tokens.reserve(estimate))
+        if wait:
+            time.sleep(wait)
+        ticket = lane.limit.acquire()
+        throttled = time.perf_counter() - started
+        if throttled > 0.001:
+            lane.count('throttled_s', throttled)
+            telemetry.record('throttle', throttled, provider=lane.provider)
+        first = []
+        sent = time.perf_counter()
+
+        def watch(chunks):
+            try:
+                for chunk in chunks:
+                    if not first:
+                        first.append(time.perf_counter() - sent)
+                    yield chunk
+            finally:
+                close = getattr(chunks, 'close', None)
+                if close:
+                    close()
+
+        try:
+            result = attempt(lane.provider, api_key, model, watch)
+        except Exception as e:
+            overloaded = is_overload(e)
+            lane.limit.release(ticket, first[0] if first else None, overloaded)
+            # A reply that failed to parse or validate is no sign of health either way
+            lane.breaker.record(False if is_failure(e) else None)
+            lane.count('errors')
+            if overloaded:
+                lane.count('rate_limited' if status_of(e) == 429 else 'overloaded')
+            if not first:
+                # Nothing was generated, so nothing counts against tokens per minute
+                lane.tokens.refund(estimate)
+            if overloaded and not first:
+                raise _Retry(e)
+            raise
+        lane.limit.release(ticket, first[0] if first else None)
+        # attempt returns only once the reply is complete, parsed and checked against the schema
+        lane.breaker.record(True)
+        lane.count('ok')
+        span = telemetry.current_span()
+        if span and 'output_tokens' in span.attrs:
+            used = (span.attrs.get('input_tokens', 0) - span.attrs.get('cache_read_tokens', 0)
+                    + span.attrs.get('output_tokens', 0))
+            lane.tokens.refund(estimate - used)
+        return result
+
+    def summary(self):
+        """Per lane ("provider:key fingerprint"): counters, bucket levels, concurrency and breaker state"""
+        with self._lock:
+            lanes = list(self._lanes.values())
+        result = {}
+        for lane in lanes:
+            with lane._lock:
+                stats = dict(lane.stats)
+            stats.update(provider=lane.provider, key=lane.key,
+                         requests_available=round(lane.requests.available(), 2),
+                         requests_per_minute=lane.requests.per_minute,
+                         tokens_available=round(lane.tokens.available(), 2), tokens_per_minute=lane.tokens.per_minute,
+                         limit=round(lane.limit.limit, 2), in_flight=lane.limit.in_flight,
+                         limit_increases=lane.limit.increases, limit_decreases=lane.limit.decreases,
+                         latency_baseline_s=lane.limit.baseline(), circuit=lane.breaker.state,
+                         circuit_opens=lane.breaker.opens, circuit_retry_in_s=round(lane.breaker.retry_in(), 2))
+            result[f"{lane.provider}:{lane.key}"] = stats
+        return result
+
+    def openmetrics(self):
+        """OpenMetrics families for telemetry.add_collector"""
+        lanes = self.summary().values()
+        families = (
+            ('gateway_requests', 'counter', 'Provider requests sent through the gateway, by outcome.',
+             [({'outcome': o}, o) for o in ('ok', 'errors', 'rate_limited', 'overloaded')]),
+            ('gateway_retries', 'counter', 'Requests retried after backoff.', [({}, 'retries')]),
+            ('gateway_failovers', 'counter', 'Calls sent to the other provider while this circuit was open.',
+             [({}, 'failovers')]),
+            ('gateway_rejected', 'counter', 'Calls turned away by an open circuit.', [({}, 'rejected')]),
+            ('gateway_throttled_seconds', 'counter', 'Time spent waiting for rate limit buckets and a free slot.',
+             [({}, 'throttled_s')]),
+            ('gateway_backoff_seconds', 'counter', 'Time spent backing off before retries.', [({}, 'backoff_s')]),
+            ('gateway_bucket_available', 'gauge', 'Tokens left in each rate limit bucket (negative while in debt).',
+             [({'bucket': 'requests'}, 'requests_available'), ({'bucket': 'tokens'}, 'tokens_available')]),
+            ('gateway_concurrency_limit', 'gauge', 'Current AIMD limit on requests in flight.', [({}, 'limit')]),
+            ('gateway_in_flight', 'gauge', 'Requests in flight.', [({}, 'in_flight')]),
+            ('gateway_limit_changes', 'counter', 'AIMD limit increases and decreases.',
+             [({'direction': 'increase'}, 'limit_increases'), ({'direction': 'decrease'}, 'limit_decreases')]),
+            ('gateway_latency_baseline_seconds', 'gauge', 'Recent best time to first chunk the limit is judged by.',
+             [({}, 'latency_baseline_s')]),
+            ('gateway_circuit_state', 'gauge', 'Circuit breaker state: 0 closed, 1 half open, 2 open.',
+             [({}, 'circuit')]),
+            ('gateway_circuit_opens', 'counter', 'Times the circuit opened.', [({}, 'circuit_opens')]),
+        )
+        lines = []
+        for name, kind, help_text, series in families:
+            metric = f'{telemetry.PREFIX}_{name}'
+            suffix = '_total' if kind == 'counter' else ''
+            lines += [f'# TYPE {metric} {kind}', f'# HELP {metric} {help_text}']
+            for lane in lanes:
+                for labels, field in series:
+                    value = lane[field]
+                    if field == 'circuit':
+                        value = CIRCUIT_STATES[value]
+                    if value is None:
+                        continue
+                    labels = dict(provider=lane['provider'], key=lane['key'], **labels)
+                    lines.append(f'{metric}{suffix}{telemetry._labels(**labels)} {round(value, 6)}')
+        return lines
+
+
+def estimate_tokens(prompt, max_tokens):
+    """What a request may use against tokens per minute before its usage is known"""
+    return len(prompt) // CHARS_PER_TOKEN + max_tokens
+
+
+def describe(summary):
+    """One line for the UI, or '' before the first request"""
+    parts = []
+    for lane in summary.values():
+        part = f"{lane['provider']}: {lane['in_flight']}/{lane['limit']:.0f} in flight"
+        if lane['retries']:
+            part += f", {lane['retries']} retries"
+        if lane['circuit'] != 'closed':
+            part += f", circuit {lane['circuit'].replace('_', ' ')}"
+        parts.append(part)
+    return ' | '.join(parts)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway, shared by every Streamlit session and batch thread"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = Gateway()
+            telemetry.add_collector(_gateway.openmetrics)
+        return _gateway
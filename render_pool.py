@@ -0,0 +1,269 @@
+"""Pool of long-lived Node workers that render slide structures to PPTX bytes.
+
+Spawning `node gen.js` per deck cold-starts V8 and re-requires pptxgenjs every
+time. The pool keeps `render_worker.js` processes warm (with `deck_renderer.js`
+already loaded) and talks to them over stdin/stdout with one JSON message per line.
+"""
+import atexit
+import base64
+import collections
+import itertools
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import telemetry
+from render_workspace import RENDER_TIMEOUT, RenderError, get_workspace
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(BASE_DIR, 'render_worker.js')
+
+PING_TIMEOUT = 5
+HEALTH_CHECK_INTERVAL = 30
+# Recycle a worker after this many decks to keep its heap from growing forever
+MAX_JOBS_PER_WORKER = 500
+
+
+class RenderTimeout(RenderError):
+    """Raised when a worker did not answer within the job timeout"""
+
+
+class RenderWorker:
+    """One `node render_worker.js` process plus the threads draining its pipes"""
+
+    def __init__(self, workspace, script=WORKER_SCRIPT):
+        self.proc = subprocess.Popen(
+            ['node', script],
+            cwd=BASE_DIR,
+            env=workspace.node_env(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+        )
+        self.jobs = 0
+        self.renderer_version = None
+        self.max_rss = None   # peak resident set size in bytes, as of the last ping
+        self.started_at = time.time()
+        self._ids = itertools.count(1)
+        self._replies = queue.Queue()
+        self._stderr = collections.deque(maxlen=50)
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stdout(self):
+        for line in self.proc.stdout:
+            self._replies.put(line)
+        self._replies.put(None)  # EOF: the process is gone
+
+    def _read_stderr(self):
+        for line in self.proc.stderr:
+            self._stderr.append(line.rstrip())
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def stderr_tail(self):
+        return '\n'.join(self._stderr)
+
+    def request(self, payload, timeout):
+        """Send one message and wait for the reply with the same id"""
+        msg_id = next(self._ids)
+        try:
+            self.proc.stdin.write(json.dumps(dict(payload, id=msg_id)) + '\n')
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            raise RenderError(f"Render worker exited: {self.stderr_tail()}")
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RenderTimeout(f"Render timed out after {timeout}s")
+            try:
+                line = self._replies.get(timeout=remaining)
+            except queue.Empty:
+                raise RenderTimeout(f"Render timed out after {timeout}s")
+            if line is None:
+                raise RenderError(f"Render worker crashed: {self.stderr_tail()}")
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                continue  # stray output, not a protocol message
+            if reply.get('id') == msg_id:
+                return reply
+
+    def ping(self, timeout=PING_TIMEOUT):
+        try:
+            reply = self.alive and self.request({'op': 'ping'}, timeout)
+        except RenderError:
+            return False
+        if reply and reply.get('ok'):
+            self.renderer_version = reply.get('version')
+            self.max_rss = reply.get('maxRss')
+            return True
+        return False
+
+    def kill(self):
+        if self.alive:
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for stream in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class RenderPool:
+    """Fixed-size pool of warm render workers with health checks and restart-on-crash"""
+
+    def __init__(self, size=None, timeout=RENDER_TIMEOUT, health_interval=HEALTH_CHECK_INTERVAL, workspace=None):
+        self.workspace = workspace or get_workspace()
+        self.size = size or os.cpu_count() or 1
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {'jobs': 0, 'failures': 0, 'timeouts': 0, 'restarts': 0}
+        for _ in range(self.size):
+            self._idle.put(RenderWorker(self.workspace))
+
+        self._stop = threading.Event()
+        if health_interval:
+            threading.Thread(target=self._health_loop, args=(health_interval,), daemon=True).start()
+
+    def _replace(self, worker):
+        worker.kill()
+        with self._lock:
+            self.stats['restarts'] += 1
+        return RenderWorker(self.workspace)
+
+    def _checkout(self):
+        worker = self._idle.get()
+        if not worker.alive or worker.jobs >= MAX_JOBS_PER_WORKER:
+            worker = self._replace(worker)
+        return worker
+
+    def _checkin(self, worker):
+        if self._closed:
+            worker.kill()
+        else:
+            self._idle.put(worker)
+
+    def render_deck(self, slide_structure, brand_config, timeout=None):
+        """Render a slide structure with the given brand and return the PPTX bytes"""
+        if self._closed:
+            raise RenderError("Render pool is closed")
+        timeout = timeout or self.timeout
+        with telemetry.span('worker_wait') as span:
+            worker = self._checkout()
+            span.set(first_job=worker.jobs == 0)
+        try:
+            with telemetry.span('node_render', slides=len(slide_structure.get('slides', []))):
+                reply = worker.request({'op': 'render', 'slides': slide_structure, 'brand': brand_config}, timeout)
+            worker.jobs += 1
+        except RenderTimeout:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            worker = self._replace(worker)
+            raise
+        except RenderError:
+            with self._lock:
+                self.stats['failures'] += 1
+            worker = self._replace(worker)
+            raise
+        finally:
+            self._checkin(worker)
+
+        with self._lock:
+            self.stats['jobs'] += 1
+        if not reply.get('ok'):
+            with self._lock:
+                self.stats['failures'] += 1
+            self.workspace.save_debug(slide_structure, brand_config, None)
+            raise RenderError(reply.get('error', 'Unknown render error'))
+        with telemetry.span('read_back', chars=len(reply['pptx'])):
+            pptx_data = base64.b64decode(reply['pptx'])
+            self.workspace.save_debug(slide_structure, brand_config, pptx_data)
+        return pptx_data
+
+    @property
+    def renderer_version(self):
+        """deck_renderer.js RENDERER_VERSION as reported by a live worker"""
+        worker = self._checkout()
+        try:
+            if worker.renderer_version is None and not worker.ping():
+                worker = self._replace(worker)
+                worker.ping()
+            return worker.renderer_version
+        finally:
+            self._checkin(worker)
+
+    def health_check(self):
+        """Ping every idle worker and restart the ones that don't answer"""
+        checked = []
+        for _ in range(self.size):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break  # the rest are busy rendering, which proves they're alive
+            if not worker.ping():
+                worker = self._replace(worker)
+            checked.append(worker)
+        for worker in checked:
+            self._checkin(worker)
+        return len(checked)
+
+    def peak_rss(self):
+        """Peak RSS in bytes of each idle worker since it started"""
+        checked = []
+        for _ in range(self.size):
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        peaks = [worker.max_rss for worker in checked if worker.ping() and worker.max_rss]
+        for worker in checked:
+            self._checkin(worker)
+        return peaks
+
+    def _health_loop(self, interval):
+        while not self._stop.wait(interval):
+            if self._closed:
+                break
+            self.health_check()
+
+    def close(self):
+        self._closed = True
+        self._stop.set()
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool(size=None):
+    """Process-wide pool, shared across Streamlit reruns and sessions"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            with telemetry.span('worker_start') as span:
+                _pool = RenderPool(size=size or int(os.environ.get('PPTX_RENDER_WORKERS', 0)) or None)
+                span.set(workers=_pool.size)
+            atexit.register(_pool.close)
+        return _pool
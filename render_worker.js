@@ -0,0 +1,49 @@
+// Long-lived pptxgenjs render worker used by render_pool.py
+// Protocol: one JSON object per line on stdin, one JSON reply per line on stdout.
+//   {"id": 1, "op": "ping"} -> {"id": 1, "ok": true, "jobs": <n>, "version": "<renderer version>", "maxRss": <bytes>}
+//   {"id": 2, "op": "render", "slides": {...}, "brand": {...}} -> {"id": 2, "ok": true, "pptx": "<base64>"}
+// stdout carries protocol messages only; pptxgenjs warnings go to stderr.
+const readline = require("readline");
+const { RENDERER_VERSION, renderDeck } = require("./deck_renderer");
+
+let jobsDone = 0;
+
+function reply(msg) {
+  process.stdout.write(JSON.stringify(msg) + "\n");
+}
+
+// The zip is built in memory and shipped back in the reply; nothing is written to disk
+async function renderJob(slides, brand) {
+  const data = await renderDeck(slides, brand).write({ outputType: "nodebuffer" });
+  return data.toString("base64");
+}
+
+async function handle(line) {
+  let msg;
+  try {
+    msg = JSON.parse(line);
+  } catch (e) {
+    reply({ id: null, ok: false, error: "Bad request: " + e.message });
+    return;
+  }
+  try {
+    if (msg.op === "ping") {
+      reply({ id: msg.id, ok: true, jobs: jobsDone, version: RENDERER_VERSION, maxRss: process.resourceUsage().maxRSS * 1024 });
+    } else if (msg.op === "render") {
+      const pptx = await renderJob(msg.slides, msg.brand);
+      jobsDone += 1;
+      reply({ id: msg.id, ok: true, pptx });
+    } else {
+      reply({ id: msg.id, ok: false, error: "Unknown op: " + msg.op });
+    }
+  } catch (e) {
+    reply({ id: msg.id, ok: false, error: String((e && e.message) || e) });
+  }
+}
+
+// Jobs are handled one at a time; the pool never sends a second job before the reply
+let queue = Promise.resolve();
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  if (line.trim()) queue = queue.then(() => handle(line));
+});
+process.stdin.on("end", () => queue.then(() => process.exit(0)));
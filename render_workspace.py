@@ -0,0 +1,91 @@
+"""Render workspace: one shared node_modules, no per-job files.
+
+Every render used to `shutil.copytree` the whole node_modules tree into a fresh
+temp dir just so `require("pptxgenjs")` would resolve. Instead we resolve the
+shared install once and point Node at it with NODE_PATH. Slide JSON goes in
+over stdin and the PPTX bytes come back over stdout, so nothing touches disk
+unless PPTX_DEBUG_DIR is set, in which case each job's input and output are
+kept there for inspection.
+"""
+import json
+import os
+import subprocess
+import tempfile
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DECK_RENDERER = os.path.join(BASE_DIR, 'deck_renderer.js')
+# Same limit the old subprocess.run(['node', ...], timeout=90) call used
+RENDER_TIMEOUT = 90
+
+
+class RenderError(RuntimeError):
+    """Raised when a deck could not be rendered"""
+
+
+class WorkspaceError(RenderError):
+    """Raised when the shared pptxgenjs install can't be found"""
+
+
+class RenderWorkspace:
+    """Resolves the shared node_modules and keeps debug copies of jobs when asked to"""
+
+    def __init__(self, node_modules=None, debug_dir=None):
+        self.node_modules = self._resolve_node_modules(node_modules)
+        self.debug_dir = debug_dir or os.environ.get('PPTX_DEBUG_DIR') or None
+        if self.debug_dir:
+            os.makedirs(self.debug_dir, exist_ok=True)
+
+    @staticmethod
+    def _resolve_node_modules(node_modules):
+        candidates = [node_modules, os.environ.get('PPTX_NODE_MODULES'),
+                      os.path.join(BASE_DIR, 'node_modules'), os.path.join(os.getcwd(), 'node_modules')]
+        for path in candidates:
+            if path and os.path.isfile(os.path.join(path, 'pptxgenjs', 'package.json')):
+                return os.path.abspath(path)
+        raise WorkspaceError("pptxgenjs not found. Run `npm install pptxgenjs` or set PPTX_NODE_MODULES.")
+
+    def node_env(self):
+        """Environment for Node processes so require() resolves from the shared install"""
+        env = os.environ.copy()
+        env['NODE_PATH'] = os.pathsep.join(filter(None, [self.node_modules, env.get('NODE_PATH')]))
+        return env
+
+    def save_debug(self, slide_structure, brand_config, pptx_data):
+        """Keep a job's input and output under PPTX_DEBUG_DIR; no-op otherwise"""
+        if not self.debug_dir:
+            return None
+        path = tempfile.mkdtemp(prefix='pptx-job-', dir=self.debug_dir)
+        with open(os.path.join(path, 'job.json'), 'w', encoding='utf-8') as f:
+            json.dump({'slides': slide_structure, 'brand': brand_config}, f, indent=2, ensure_ascii=False)
+        if pptx_data is not None:
+            with open(os.path.join(path, 'output.pptx'), 'wb') as f:
+                f.write(pptx_data)
+        return path
+
+    def render_once(self, slide_structure, brand_config, timeout=RENDER_TIMEOUT):
+        """Render a deck in a one-off node process and return the PPTX bytes"""
+        job = json.dumps({'slides': slide_structure, 'brand': brand_config}).encode('utf-8')
+        try:
+            result = subprocess.run(['node', DECK_RENDERER, '-', '-'], input=job, cwd=BASE_DIR,
+                                    env=self.node_env(), capture_output=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise RenderError(f"Render timed out after {timeout}s")
+        if result.returncode != 0 or not result.stdout:
+            self.save_debug(slide_structure, brand_config, None)
+            raise RenderError(result.stderr.decode('utf-8', 'replace') or "Renderer returned no data. Try again.")
+        self.save_debug(slide_structure, brand_config, result.stdout)
+        return result.stdout
+
+
+_workspace = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace():
+    """Process-wide workspace, resolved once"""
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            _workspace = RenderWorkspace()
+        return _workspace
@@ -0,0 +1,155 @@
+"""Check that the Node and native engines draw the same shape trees.
+
+Usage: python renderer_parity.py [fixture.json]
+
+The fixture holds {"slides": <slide structure>, "brand": <brand_config>}.
+Slides are compared as drawn, including the brand chrome they inherit from
+their slide layout. A Node deck assembled from the slide cache must also be the
+same package, part for part, as one pptxgenjs rendered in one go. Exits non-zero
+and prints the first differences when the engines disagree.
+"""
+import io
+import json
+import os
+import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pptx_native
+from render_pool import get_render_pool
+from renderers import render_deck
+from text_fit import fit_deck
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURE = os.path.join(BASE_DIR, 'fixtures', 'all_layouts.json')
+
+A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+
+
+def _fill(parent):
+    clr = parent.find(f'{A}solidFill/{A}srgbClr') if parent is not None else None
+    return clr.get('val') if clr is not None else None
+
+
+def _shapes(root):
+    shapes = []
+    for sp in root.iter(f'{P}sp'):
+        sp_pr = sp.find(f'{P}spPr')
+        off = sp_pr.find(f'{A}xfrm/{A}off')
+        ext = sp_pr.find(f'{A}xfrm/{A}ext')
+        ln = sp_pr.find(f'{A}ln')
+        desc = {
+            'name': sp.find(f'{P}nvSpPr/{P}cNvPr').get('name'),
+            'geom': sp_pr.find(f'{A}prstGeom').get('prst'),
+            'box': tuple(int(v) for v in (off.get('x'), off.get('y'), ext.get('cx'), ext.get('cy'))),
+            'fill': _fill(sp_pr),
+            'line': (ln.get('w'), _fill(ln)) if ln is not None else None,
+        }
+        body = sp.find(f'{P}txBody')
+        if body is not None:
+            paras = body.findall(f'{A}p')
+            rpr = body.find(f'.//{A}rPr')
+            ppr = paras[0].find(f'{A}pPr')
+            desc.update({
+                'text': '\n'.join(''.join(t.text or '' for t in p.iter(f'{A}t')) for p in paras),
+                'anchor': body.find(f'{A}bodyPr').get('anchor'),
+                'align': ppr.get('algn') if ppr is not None else None,
+                'font': (rpr.get('sz'), rpr.get('b'), rpr.get('i'), _fill(rpr),
+                         rpr.find(f'{A}latin').get('typeface')) if rpr is not None else None,
+            })
+        shapes.append(desc)
+    return shapes
+
+
+def _layout_part(z, slide_name):
+    """Part name of the slide layout a slide references"""
+    rels = ET.fromstring(z.read(slide_name.replace('slides/', 'slides/_rels/') + '.rels'))
+    for rel in rels:
+        if rel.get('Type').endswith('/slideLayout'):
+            return 'ppt/slideLayouts/' + rel.get('Target').rsplit('/', 1)[-1]
+    return None
+
+
+def shape_tree(pptx_bytes):
+    """One list of shape descriptors per slide, in slide order: the background the slide
+    ends up with, then the shapes it inherits from its layout, then its own"""
+    z = zipfile.ZipFile(io.BytesIO(pptx_bytes))
+    names = sorted((n for n in z.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', n)),
+                   key=lambda n: int(n[len('ppt/slides/slide'):-len('.xml')]))
+    slides = []
+    for name in names:
+        root = ET.fromstring(z.read(name))
+        background = _fill(root.find(f'{P}cSld/{P}bg/{P}bgPr'))
+        inherited = []
+        layout_name = _layout_part(z, name)
+        if layout_name:
+            layout = ET.fromstring(z.read(layout_name))
+            background = background or _fill(layout.find(f'{P}cSld/{P}bg/{P}bgPr'))
+            inherited = [dict(shape, layout=True) for shape in _shapes(layout)]
+        slides.append([('background', background)] + inherited + _shapes(root))
+    return slides
+
+
+def package_parts(pptx_bytes):
+    with zipfile.ZipFile(io.BytesIO(pptx_bytes)) as z:
+        parts = {name: z.read(name) for name in z.namelist()}
+    # Two renders a second apart only differ in when they were made
+    if 'docProps/core.xml' in parts:
+        parts['docProps/core.xml'] = re.sub(rb'(<dcterms:(created|modified)[^>]*>)[^<]*', rb'\1', parts['docProps/core.xml'])
+    return parts
+
+
+def package_diff(name, pptx_bytes, expected):
+    """Parts that are missing, extra or different in pptx_bytes compared with expected"""
+    parts, want = package_parts(pptx_bytes), package_parts(expected)
+    problems = [f"{name}: missing part {part}" for part in sorted(set(want) - set(parts))]
+    problems += [f"{name}: extra part {part}" for part in sorted(set(parts) - set(want))]
+    problems += [f"{name}: part {part} differs" for part in sorted(set(parts) & set(want)) if parts[part] != want[part]]
+    return problems
+
+
+def render_all(slide_structure, brand_config):
+    """Each engine's own package, plus the Node deck assembled from the slide cache"""
+    fitted, _ = fit_deck(slide_structure, brand_config)
+    # The first render fills the slide cache, the second is put together from it
+    render_deck(slide_structure, brand_config, renderer='node')
+    return {
+        'node': get_render_pool().render_deck(fitted, brand_config),
+        'native': pptx_native.render_deck(fitted, brand_config),
+        'node (cached)': render_deck(slide_structure, brand_config, renderer='node'),
+    }
+
+
+def compare(fixture_path=DEFAULT_FIXTURE):
+    with open(fixture_path, encoding='utf-8') as f:
+        fixture = json.load(f)
+    packages = render_all(fixture['slides'], fixture['brand'])
+    trees = {name: shape_tree(data) for name, data in packages.items()}
+    native = trees.pop('native')
+    problems = package_diff('node (cached)', packages['node (cached)'], packages['node'])
+    for engine, tree in trees.items():
+        if len(tree) != len(native):
+            problems.append(f"slide count: {engine}={len(tree)} native={len(native)}")
+        for number, (a, b) in enumerate(zip(tree, native), 1):
+            if len(a) != len(b):
+                problems.append(f"slide {number}: {engine} has {len(a)} shapes, native has {len(b)}")
+            for x, y in zip(a, b):
+                if x != y:
+                    problems.append(f"slide {number}:\n  {engine:6} {x}\n  native {y}")
+    return len(native), sum(len(s) for s in native), problems
+
+
+def main():
+    fixture = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURE
+    slides, shapes, problems = compare(fixture)
+    if problems:
+        print('\n'.join(problems[:20]))
+        print(f"FAIL: {len(problems)} differences")
+        sys.exit(1)
+    print(f"OK: {slides} slides, {shapes} shapes identical")
+
+
+if __name__ == '__main__':
+    main()
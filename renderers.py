@@ -0,0 +1,253 @@
+"""Choose the engine that turns a slide structure into PPTX bytes.
+
+- node:   deck_renderer.js on the warm Node worker pool (default)
+- native: pptx_native.py, in-process, no Node needed
+
+Set PPTX_RENDERER to change the default for every entry point.
+
+Before rendering, text_fit shrinks text frames that would overflow their boxes;
+DeckBuilder.overflow lists the texts that still don't fit. PPTX_TEXT_FIT=0
+turns that off.
+
+DeckBuilder takes slides one at a time while the LLM is still streaming. The
+native engine writes each slide into the zip as it arrives; pptxgenjs has to
+build the package in one go, so the node engine validates slides as they come
+in and renders on finish() rather than holding a pool worker for the length of
+an LLM stream. A streamed slide that can't be rendered yet, such as one with an
+unknown layout, doesn't fail the deck: it and the slides after it are held back
+until finish() gets the structure slide_repair has fixed.
+
+Both engines go through the slide cache (slide_cache.py), keyed by engine and
+engine version: slides whose XML part is already cached for this brand are not
+drawn again. The native engine zips cached and fresh parts into its own package.
+The node engine still has pptxgenjs build the package, with an empty
+placeholder slide in place of each cached one, and the cached parts are swapped
+in afterwards, so a node deck is a pptxgenjs package either way. DeckWriter is
+the exception: large decks are written into the native package as they arrive,
+and with the node engine only the slides themselves come from pptxgenjs.
+SLIDE_CACHE_MAX_MB=0 turns the cache off.
+"""
+import os
+
+import pptx_native
+import telemetry
+import text_fit
+from render_pool import get_render_pool
+from render_workspace import RenderError
+from slide_cache import brand_hash, get_slide_cache, numbered, replace_slide_parts, slide_key, slide_parts
+
+RENDERERS = ('node', 'native')
+DEFAULT_RENDERER = os.environ.get('PPTX_RENDERER', 'node')
+TEXT_FIT = os.environ.get('PPTX_TEXT_FIT', '1') != '0'
+
+
+def _check_renderer(renderer):
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown renderer {renderer!r}, expected one of {', '.join(RENDERERS)}")
+    return renderer
+
+
+_node_version = None
+
+
+def renderer_version(renderer):
+    """Engine version that goes into the slide cache key"""
+    global _node_version
+    if renderer == 'native':
+        return pptx_native.NATIVE_RENDERER_VERSION
+    if _node_version is None:
+        # Waits for a worker to answer, so a cold start shows up here
+        with telemetry.span('worker_ping'):
+            _node_version = get_render_pool().renderer_version
+    return _node_version
+
+
+def _render_parts(slides, brand_config, renderer, theme):
+    """Freshly rendered slide XML, one part per slide"""
+    if renderer == 'native':
+        try:
+            with telemetry.span('native_render', slides=len(slides)):
+                return [pptx_native.build_slide(slide, theme).to_xml(n) for n, slide in enumerate(slides, 1)]
+        except (ValueError, KeyError, TypeError) as e:
+            raise RenderError(str(e)) from e
+    return slide_parts(get_render_pool().render_deck({'slides': slides}, brand_config))
+
+
+def cached_parts(slides, brand_config, renderer, theme=None):
+    """Slide XML templates for slides, rendering only the ones missing from the slide cache"""
+    cache = get_slide_cache()
+    version = renderer_version(renderer)
+    brand = brand_hash(brand_config)
+    keys = [slide_key(renderer, version, brand, slide) for slide in slides]
+    parts = [cache.get(key) for key in keys]
+    missing = [i for i, part in enumerate(parts) if part is None]
+    if missing:
+        fresh = _render_parts([slides[i] for i in missing], brand_config, renderer,
+                              theme or pptx_native.make_theme(brand_config))
+        for i, xml in zip(missing, fresh):
+            parts[i] = cache.put(keys[i], xml)
+    telemetry.annotate(cache_hits=len(slides) - len(missing), cache_misses=len(missing))
+    return parts
+
+
+def node_deck(slides, brand_config):
+    """A pptxgenjs package for slides, drawing only the slides missing from the slide cache"""
+    cache = get_slide_cache()
+    version = renderer_version('node')
+    brand = brand_hash(brand_config)
+    keys = [slide_key('node', version, brand, slide) for slide in slides]
+    parts = [cache.get(key) for key in keys]
+    job = [slide if part is None else {'placeholder': True} for slide, part in zip(slides, parts)]
+    pptx_data = get_render_pool().render_deck({'slides': job}, brand_config)
+    fresh = slide_parts(pptx_data)
+    cached = {}
+    for i, part in enumerate(parts):
+        if part is None:
+            cache.put(keys[i], fresh[i])
+        else:
+            cached[i + 1] = numbered(part, i + 1)
+    telemetry.annotate(cache_hits=len(cached), cache_misses=len(slides) - len(cached))
+    if not cached:
+        return pptx_data
+    with telemetry.span('package', slides=len(slides)):
+        return replace_slide_parts(pptx_data, cached)
+
+
+def assemble_deck(slides, brand_config, renderer):
+    """PPTX bytes built from cached slide parts plus freshly rendered ones"""
+    if renderer == 'node':
+        return node_deck(slides, brand_config)
+    builder = pptx_native.PptxBuilder(brand_config)
+    for number, part in enumerate(cached_parts(slides, brand_config, renderer), 1):
+        builder.add_slide_xml(numbered(part, number))
+    with telemetry.span('package', slides=len(slides)):
+        return builder.finish()
+
+
+def render_deck(slide_structure, brand_config, renderer=None, fit_text=None):
+    """Render a slide structure with the chosen engine and return the PPTX bytes"""
+    renderer = _check_renderer(renderer or DEFAULT_RENDERER)
+    fit_text = TEXT_FIT if fit_text is None else fit_text
+    if fit_text:
+        try:
+            with telemetry.span('fit', slides=len(slide_structure['slides'])):
+                slide_structure, _ = text_fit.fit_deck(slide_structure, brand_config)
+        except (ValueError, KeyError, TypeError) as e:
+            raise RenderError(str(e)) from e
+    with telemetry.span('render', renderer=renderer, slides=len(slide_structure['slides'])):
+        if get_slide_cache().enabled:
+            return assemble_deck(slide_structure['slides'], brand_config, renderer)
+        if renderer == 'node':
+            return get_render_pool().render_deck(slide_structure, brand_config)
+        try:
+            with telemetry.span('native_render', slides=len(slide_structure['slides'])):
+                return pptx_native.render_deck(slide_structure, brand_config)
+        except (ValueError, KeyError, TypeError) as e:
+            raise RenderError(str(e)) from e
+
+
+class DeckBuilder:
+    """Collects slides as they stream in and renders the deck on finish()"""
+
+    def __init__(self, brand_config, renderer=None):
+        self.renderer = _check_renderer(renderer or DEFAULT_RENDERER)
+        self.brand_config = brand_config
+        self.slides = []
+        self.held = []       # streamed slides waiting for finish(), from the first one that couldn't be rendered
+        self.overflow = []   # (slideNumber, text) still too long at the smallest font size
+        self._theme = pptx_native.make_theme(brand_config) if TEXT_FIT else None
+        self._native = pptx_native.PptxBuilder(brand_config) if self.renderer == 'native' else None
+
+    def add_slide(self, slide):
+        layout = slide.get('layout') or 'numbered_boxes'
+        if not slide.get('isTitle') and layout not in pptx_native.LAYOUTS:
+            raise RenderError(f'Unknown layout "{layout}" on slide {slide.get("slideNumber")}')
+        try:
+            if self._theme:
+                with telemetry.span('fit', slides=1):
+                    slide, texts = text_fit.fit_slide(slide, self._theme)
+                self.overflow.extend((slide.get('slideNumber', len(self.slides) + 1), text) for text in texts)
+            if self._native:
+                # Slides go into the zip as they stream in, so each one is its own render span
+                with telemetry.span('render', renderer='native', slides=1):
+                    if get_slide_cache().enabled:
+                        part, = cached_parts([slide], self.brand_config, 'native', self._native.theme)
+                        self._native.add_slide_xml(numbered(part, self._native.slide_count + 1))
+                    else:
+                        with telemetry.span('native_render', slides=1):
+                            self._native.add_slide(slide)
+        except (ValueError, KeyError, TypeError) as e:
+            raise RenderError(str(e)) from e
+        self.slides.append(slide)
+
+    def stream_slide(self, slide):
+        """add_slide() for a slide the LLM has just finished; one that can't be rendered (an unknown layout,
+        say) is held back with everything after it, for the repaired structure given to finish() to replace"""
+        if not self.held:
+            try:
+                self.add_slide(slide)
+                return
+            except RenderError:
+                pass
+        self.held.append(slide)
+
+    @property
+    def received(self):
+        return len(self.slides) + len(self.held)
+
+    def finish(self, slide_structure=None):
+        """Render the deck; slides in slide_structure that were never streamed, or were held back, are added first"""
+        pending = slide_structure.get('slides', [])[len(self.slides):] if slide_structure else self.held
+        self.held = []
+        for slide in pending:
+            self.add_slide(slide)
+        with telemetry.span('render', renderer=self.renderer, slides=len(self.slides)):
+            if self._native:
+                with telemetry.span('package', slides=len(self.slides)):
+                    return self._native.finish()
+            if get_slide_cache().enabled:
+                return assemble_deck(self.slides, self.brand_config, self.renderer)
+            return get_render_pool().render_deck({'slides': self.slides}, self.brand_config)
+
+
+class DeckWriter:
+    """Renders batches of slides straight into a PPTX package, keeping nothing per slide but its overflow"""
+
+    def __init__(self, brand_config, fileobj=None, renderer=None):
+        self.renderer = _check_renderer(renderer or DEFAULT_RENDERER)
+        self.brand_config = brand_config
+        self.overflow = []   # (slideNumber, text) still too long at the smallest font size
+        self._package = pptx_native.PptxBuilder(brand_config, fileobj)
+
+    @property
+    def slide_count(self):
+        return self._package.slide_count
+
+    def add_slides(self, slides):
+        """Fit and render slides (a mini-deck on the Node pool for the node engine) and zip them in"""
+        fitted = []
+        try:
+            with telemetry.span('fit', slides=len(slides)):
+                for slide in slides:
+                    layout = slide.get('layout') or 'numbered_boxes'
+                    if not slide.get('isTitle') and layout not in pptx_native.LAYOUTS:
+                        raise RenderError(f'Unknown layout "{layout}" on slide {slide.get("slideNumber")}')
+                    if TEXT_FIT:
+                        slide, texts = text_fit.fit_slide(slide, self._package.theme)
+                        self.overflow.extend((slide.get('slideNumber', self.slide_count + len(fitted) + 1), text)
+                                             for text in texts)
+                    fitted.append(slide)
+            with telemetry.span('render', renderer=self.renderer, slides=len(fitted)):
+                for part in cached_parts(fitted, self.brand_config, self.renderer, self._package.theme):
+                    self._package.add_slide_xml(numbered(part, self.slide_count + 1))
+        except (ValueError, KeyError, TypeError) as e:
+            raise RenderError(str(e)) from e
+
+    def finish(self):
+        """Write the package parts; returns the bytes when no fileobj was given"""
+        with telemetry.span('package', slides=self.slide_count):
+            return self._package.finish()
+
+    def close(self):
+        """Abandon a deck that won't be finished, before its fileobj is closed"""
+        self._package.close()
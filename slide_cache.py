@@ -0,0 +1,144 @@
+"""In-memory cache of rendered slide XML, keyed by what the slide looks like.
+
+Changing one slide or one brand color used to re-render the whole deck. Each
+slide's ppt/slides/slideN.xml part is now cached under a hash of the slide
+(layout, title, content, fitted font sizes), the brand_config and the engine
+name and version, so the deck assembler in renderers.py only renders slides
+whose hash it hasn't seen and takes the rest straight from the cache. Slide
+numbers and the model's reasoning don't change the drawing and are left out of
+the key. Parts are stored with the slide number blanked out and numbered again
+on the way out.
+
+The least recently used parts are evicted once the cache grows past
+SLIDE_CACHE_MAX_MB; 0 turns the cache off.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+
+CACHE_MAX_BYTES = int(float(os.environ.get('SLIDE_CACHE_MAX_MB', 32)) * 1024 * 1024)
+
+# Keys of a slide entry that don't affect the rendered part
+IGNORED_KEYS = ('slideNumber', 'reasoning')
+
+SLIDE_NAME = re.compile(r'<p:cSld name="Slide \d+">')
+NAME_PLACEHOLDER = '<p:cSld name="Slide #">'
+
+
+def _digest(value):
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def brand_hash(brand_config):
+    return _digest(brand_config)
+
+
+def slide_key(renderer, version, brand, slide):
+    """Cache key for a slide; brand is brand_hash(brand_config), computed once per deck"""
+    drawn = {k: v for k, v in slide.items() if k not in IGNORED_KEYS}
+    return f"{renderer}:{version}:{_digest([brand, drawn])}"
+
+
+def to_template(xml):
+    return SLIDE_NAME.sub(NAME_PLACEHOLDER, xml, count=1)
+
+
+def numbered(template, number):
+    """Slide XML for position number in the deck"""
+    return template.replace(NAME_PLACEHOLDER, f'<p:cSld name="Slide {number}">', 1)
+
+
+def slide_parts(pptx_bytes):
+    """Slide XML parts of a rendered package, in slide order"""
+    with zipfile.ZipFile(io.BytesIO(pptx_bytes)) as z:
+        names = sorted((n for n in z.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', n)),
+                       key=lambda n: int(n[len('ppt/slides/slide'):-len('.xml')]))
+        return [z.read(name).decode('utf-8') for name in names]
+
+
+def replace_slide_parts(pptx_bytes, parts):
+    """The package with ppt/slides/slideN.xml replaced by parts[N] (slide XML), every other part as it was"""
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(pptx_bytes)) as src, zipfile.ZipFile(out, 'w') as dst:
+        for info in src.infolist():
+            match = re.fullmatch(r'ppt/slides/slide(\d+)\.xml', info.filename)
+            if match and int(match.group(1)) in parts:
+                dst.writestr(info, parts[int(match.group(1))].encode('utf-8'))
+            else:
+                dst.writestr(info, src.read(info.filename))
+    return out.getvalue()
+
+
+class SlideCache:
+    """Size-bounded LRU of slide XML templates"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._parts = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        with self._lock:
+            template = self._parts.get(key)
+            if template is None:
+                self.stats['misses'] += 1
+                return None
+            self._parts.move_to_end(key)
+            self.stats['hits'] += 1
+            return template
+
+    def put(self, key, xml):
+        """Store a freshly rendered part; returns its template"""
+        template = to_template(xml)
+        size = len(template)
+        with self._lock:
+            if key in self._parts:
+                self._bytes -= len(self._parts.pop(key))
+            if size > self.max_bytes:
+                return template
+            self._parts[key] = template
+            self._bytes += size
+            self.stats['writes'] += 1
+            while self._bytes > self.max_bytes:
+                _, evicted = self._parts.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats['evictions'] += 1
+        return template
+
+    def summary(self):
+        """Counters plus current entry count and size, for the UI"""
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._parts), bytes=self._bytes)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._parts.clear()
+            self._bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_slide_cache():
+    """Process-wide cache, shared across Streamlit reruns and sessions"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SlideCache()
+        return _cache
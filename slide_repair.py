@@ -0,0 +1,234 @@
+"""Per-slide validation against the layout contracts, with targeted repair.
+
+A slide with a missing field (flow_diagram without steps, comparison_table
+without right_points) used to render as an empty box, and the only fix was
+regenerating the whole deck. validate_slide() checks each slide for required
+keys, box counts and word limits. repair_deck() trims slides that only break the
+soft limits (too many entries, too many words) locally, and sends a small
+request for just the slides that break the contract, concurrently, splicing the
+fixes back in. A title slide without a title gets the topic. SLIDE_REPAIR_SOFT=1
+sends soft issues to the model too instead of trimming them.
+
+The report compares that with a full retry: the full retry would have re-sent
+the deck prompt and re-generated every slide, taking about as long as the first
+call. Tokens are estimated at ~4 characters per token.
+"""
+import asyncio
+import json
+import os
+import time
+
+import slide_schema
+import telemetry
+from deck_planner import LAYOUT_FIELDS, SLIDE_CONCURRENCY, STYLE_GUIDE
+from prompt_cache import split_prompt
+
+# (expected item count, max words per item) per list field, and max words per text field,
+# as promised to the model in the prompts
+LIMITS = {
+    'numbered_boxes': {'boxes': (4, 15)},
+    'definition_boxes': {'definition': (None, 40), 'boxes': (3, 12)},
+    'split_layout': {'bullets': (5, 20), 'highlights': (3, 10)},
+    'icon_grid': {'items': (6, 8)},
+    'comparison_table': {'left_title': (None, 6), 'left_points': (3, 12),
+                         'right_title': (None, 6), 'right_points': (3, 12)},
+    'flow_diagram': {'steps': (4, 8), 'outcome': (None, 15)},
+    'three_boxes': {'boxes': (3, 12)},
+}
+CHARS_PER_TOKEN = 4
+REPAIR_SOFT = os.environ.get('SLIDE_REPAIR_SOFT', '0') != '0'
+
+
+def _words(value):
+    if isinstance(value, dict):
+        value = ' '.join(v for v in value.values() if isinstance(v, str))
+    return len(str(value).split())
+
+
+def validate_slide(slide, number=1):
+    """(hard, soft) issue lists. Hard issues make the slide unusable; soft ones would overflow or leave gaps."""
+    try:
+        typed = slide_schema.parse_slide(slide, number)
+    except slide_schema.SchemaError as e:
+        return [str(e)], []
+    if isinstance(typed, slide_schema.TitleSlide):
+        return [], []
+    soft = []
+    for name, (count, max_words) in LIMITS[typed.layout].items():
+        value = getattr(typed.content, name)
+        if count is None:
+            if _words(value) > max_words:
+                soft.append(f"{name} has {_words(value)} words, max {max_words}")
+            continue
+        if len(value) != count:
+            soft.append(f"{name} has {len(value)} entries, needs exactly {count}")
+        long_items = [i + 1 for i, item in enumerate(value) if _words(item) > max_words]
+        if long_items:
+            soft.append(f"{name} entries {', '.join(map(str, long_items))} are over {max_words} words")
+    return [], soft
+
+
+def validate_deck(slide_structure):
+    """{slide index: (hard, soft)} for every slide with a problem"""
+    problems = {}
+    for index, slide in enumerate(slide_structure.get('slides', [])):
+        hard, soft = validate_slide(slide, index + 1)
+        if hard or soft:
+            problems[index] = (hard, soft)
+    return problems
+
+
+def _trim_words(text, max_words):
+    words = text.split()
+    return text if len(words) <= max_words else ' '.join(words[:max_words])
+
+
+def trim_slide(slide):
+    """The slide with lists cut to their expected count and plain-text entries cut to the word limit"""
+    content = slide.get('content') if isinstance(slide, dict) else None
+    if not isinstance(content, dict) or slide.get('isTitle') or slide.get('layout') not in LIMITS:
+        return slide
+    content = dict(content)
+    for name, (count, max_words) in LIMITS[slide['layout']].items():
+        value = content.get(name)
+        if isinstance(value, str):
+            content[name] = _trim_words(value, max_words)
+        elif isinstance(value, list):
+            content[name] = [_trim_words(item, max_words) if isinstance(item, str) else item
+                             for item in value[:count]]
+    return dict(slide, content=content)
+
+
+def _fix_locally(slide, topic):
+    """The slide with what can be fixed without the model fixed: soft limits trimmed, a title slide's title"""
+    if isinstance(slide, dict) and slide.get('isTitle'):
+        return slide if str(slide.get('title') or '').strip() else dict(slide, title=topic)
+    return trim_slide(slide)
+
+
+def repair_prompt(topic, slide, issues):
+    layout = slide.get('layout') if slide.get('layout') in LAYOUT_FIELDS else 'numbered_boxes'
+    fields, _ = LAYOUT_FIELDS[layout]
+    problems = '\n'.join(f'- {issue}' for issue in issues)
+    title = str(slide.get('title') or '').strip()
+    return split_prompt(STYLE_GUIDE, f"""Fix one slide of a presentation on "{topic}".
+
+Slide {slide.get('slideNumber')}: "{title}" (layout: {layout})
+Current content: {json.dumps(slide.get('content') or {}, ensure_ascii=False)}
+
+Problems:
+{problems}
+
+The content object MUST have: {fields}
+Keep what is already good. Plain text only, no markdown.
+
+Return ONLY pure JSON: {{{'"title": "...", ' if not title else ''}"content": {{...}}}}""")
+
+
+def _tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+async def _repair_one(call, topic, slide, issues, semaphore, slide_prompt):
+    # Only the repair prompt asks for a missing title
+    if slide_prompt and str(slide.get('title') or '').strip() and slide.get('layout') in LAYOUT_FIELDS:
+        prompt = slide_prompt(slide, issues)
+    else:
+        prompt = repair_prompt(topic, slide, issues)
+    layout = slide.get('layout') if slide.get('layout') in LAYOUT_FIELDS else 'numbered_boxes'
+    async with semaphore:
+        response = await asyncio.to_thread(call, prompt, f'content:{layout}')
+    content = response.get('content', response) if isinstance(response, dict) else response
+    repaired = dict(slide, layout=layout, content=content)
+    if not str(slide.get('title') or '').strip() and isinstance(response, dict) and response.get('title'):
+        repaired['title'] = response['title']
+    return repaired, _tokens(prompt) + _tokens(json.dumps(response, ensure_ascii=False))
+
+
+async def _repair_all(call, topic, slides, problems, concurrency, slide_prompt):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    jobs = [_repair_one(call, topic, slides[i], hard + soft, semaphore, slide_prompt)
+            for i, (hard, soft) in problems.items()]
+    return await asyncio.gather(*jobs, return_exceptions=True)
+
+
+def repair_deck(call, topic, slide_structure, prompt='', elapsed_s=0.0, concurrency=SLIDE_CONCURRENCY,
+                repair_soft=REPAIR_SOFT, slide_prompt=None):
+    """Repair failing slides in place of a full retry.
+
+    call(prompt, schema) returns parsed JSON. prompt is the single-shot deck prompt a
+    full retry would re-send; for decks written slide by slide, pass
+    slide_prompt(slide, issues) instead, which also builds the repair requests so
+    a fix regenerates just that slide the way it was first written. Soft issues
+    are trimmed locally and only slides that break the contract are sent to the
+    model (soft ones too with repair_soft). Returns (slide_structure, failed, report): slides still missing
+    required fields after the repair are left out and listed in failed as
+    (slideNumber, error); slides that only miss the soft limits are kept.
+    """
+    slides = list(slide_structure.get('slides', []))
+    problems = validate_deck(slide_structure)
+    report = {'checked': len(slides), 'failing': len(problems), 'fixed_locally': 0, 'sent': 0, 'repaired': 0,
+              'still_failing': 0, 'repair_s': 0.0, 'repair_tokens': 0, 'full_retry_s': round(elapsed_s, 2),
+              'full_retry_tokens': _tokens(json.dumps(slide_structure, ensure_ascii=False))}
+    if prompt:
+        report['full_retry_tokens'] += _tokens(prompt)
+    elif slide_prompt:
+        report['full_retry_tokens'] += sum(_tokens(slide_prompt(slide, [])) for slide in slides
+                                           if isinstance(slide, dict) and not slide.get('isTitle')
+                                           and slide.get('layout') in LAYOUT_FIELDS and slide.get('title'))
+    failed = []
+    to_send = {}
+    for index, (hard, soft) in problems.items():
+        fixed = _fix_locally(slides[index], topic)
+        if fixed is not slides[index]:
+            new_hard, new_soft = validate_slide(fixed, index + 1)
+            if len(new_hard) + len(new_soft) < len(hard) + len(soft):
+                slides[index] = fixed
+                hard, soft = new_hard, new_soft
+                report['fixed_locally'] += 1
+        problems[index] = (hard, soft)
+        # A title slide has no layout content for the model to fix
+        if (hard or soft and repair_soft) and not (isinstance(slides[index], dict) and slides[index].get('isTitle')):
+            to_send[index] = (hard, soft)
+    report['sent'] = len(to_send)
+    if to_send:
+        started = time.perf_counter()
+        with telemetry.span('repair', failing=len(to_send)):
+            results = asyncio.run(_repair_all(call, topic, slides, to_send, concurrency, slide_prompt))
+        report['repair_s'] = round(time.perf_counter() - started, 2)
+        for index, result in zip(to_send, results):
+            hard, soft = problems[index]
+            if not isinstance(result, Exception):
+                repaired, tokens = result
+                report['repair_tokens'] += tokens
+                new_hard, new_soft = validate_slide(repaired, index + 1)
+                if not new_hard and len(new_soft) < len(hard) + len(soft):
+                    slides[index] = repaired
+                    problems[index] = new_hard, new_soft
+                    report['repaired'] += 1
+    dropped = set()
+    for index, (hard, soft) in problems.items():
+        if hard or soft:
+            report['still_failing'] += 1
+        if hard:
+            failed.append((slides[index].get('slideNumber', index + 1) if isinstance(slides[index], dict)
+                           else index + 1, hard[0]))
+            dropped.add(index)
+    slides = [slide for index, slide in enumerate(slides) if index not in dropped]
+    report['tokens_saved'] = report['full_retry_tokens'] - report['repair_tokens'] if to_send else 0
+    report['seconds_saved'] = round(report['full_retry_s'] - report['repair_s'], 2) if to_send else 0.0
+    return dict(slide_structure, slides=slides), failed, report
+
+
+def describe(report):
+    """One line for the UI / logs, or '' when nothing needed fixing"""
+    if not report or not report['failing']:
+        return ''
+    parts = []
+    if report['fixed_locally']:
+        parts.append(f"Fixed {report['fixed_locally']} slide(s) locally")
+    if report['sent']:
+        parts.append(f"Repaired {report['repaired']}/{report['sent']} slide(s) in {report['repair_s']:.1f}s "
+                     f"(~{report['repair_tokens']:,} tokens) instead of a full retry; "
+                     f"saved ~{report['tokens_saved']:,} tokens and {report['seconds_saved']:.1f}s")
+    return '; '.join(parts)
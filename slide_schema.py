@@ -0,0 +1,275 @@
+"""The slide structure contract as typed objects and as provider JSON schemas.
+
+The renderers take {"slides": [...]} where every content slide carries one of
+seven layouts, each with its own content fields. The dataclasses below are that
+contract; parse_deck() turns model output into them, raising SchemaError with
+the slide and field at fault. call_llm runs it on every deck reply and doesn't
+cache one that breaks the contract; slide_repair fixes its slides instead.
+
+The same dataclasses generate the schemas for structured output: an Anthropic
+tool input_schema, which can express one required-field set per layout with
+anyOf, and a Gemini response_schema. Gemini's schema subset has no unions, so
+there every content field of a deck is optional and the per-layout required
+fields are enforced by parse_deck() instead. A request for one slide's content
+names its layout ('content:<layout>'), so both schemas require that layout's
+fields, and call_llm checks the reply with check_content() before caching it.
+"""
+from dataclasses import dataclass, field, fields
+from typing import Union
+
+
+class SchemaError(ValueError):
+    """Raised when a slide doesn't match its layout's contract"""
+
+
+# List entries may be plain strings or small objects ({"text": ...}); both renderers run them through extractText
+Text = str
+TextList = list
+
+
+@dataclass
+class NumberedBoxes:
+    boxes: TextList
+
+
+@dataclass
+class DefinitionBoxes:
+    definition: Text
+    boxes: TextList
+
+
+@dataclass
+class SplitLayout:
+    bullets: TextList
+    highlights: TextList
+
+
+@dataclass
+class IconGrid:
+    items: TextList
+
+
+@dataclass
+class ComparisonTable:
+    left_title: Text
+    left_points: TextList
+    right_title: Text
+    right_points: TextList
+
+
+@dataclass
+class FlowDiagram:
+    steps: TextList
+    outcome: Text
+
+
+@dataclass
+class ThreeBoxes:
+    boxes: TextList
+
+
+CONTENT_TYPES = {
+    'numbered_boxes': NumberedBoxes,
+    'definition_boxes': DefinitionBoxes,
+    'split_layout': SplitLayout,
+    'icon_grid': IconGrid,
+    'comparison_table': ComparisonTable,
+    'flow_diagram': FlowDiagram,
+    'three_boxes': ThreeBoxes,
+}
+LAYOUT_NAMES = list(CONTENT_TYPES)
+
+Content = Union[NumberedBoxes, DefinitionBoxes, SplitLayout, IconGrid, ComparisonTable, FlowDiagram, ThreeBoxes]
+
+
+@dataclass
+class TitleSlide:
+    slide_number: int
+    title: str
+    subtitle: str = ''
+
+
+@dataclass
+class ContentSlide:
+    slide_number: int
+    title: str
+    layout: str
+    content: Content
+    reasoning: str = ''
+    extra: dict = field(default_factory=dict)
+
+
+def _text(value, where):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip():
+        raise SchemaError(f"{where} must be non-empty text")
+    return value
+
+
+def _text_list(value, where):
+    if not isinstance(value, list) or not value:
+        raise SchemaError(f"{where} must be a non-empty list")
+    for i, item in enumerate(value):
+        if isinstance(item, dict):
+            if not any(isinstance(v, str) and v.strip() for v in item.values()):
+                raise SchemaError(f"{where}[{i}] has no text")
+        else:
+            _text(item, f"{where}[{i}]")
+    return value
+
+
+def parse_content(layout, content, where='content'):
+    """Typed content for a layout; extra keys are dropped"""
+    if layout not in CONTENT_TYPES:
+        raise SchemaError(f'Unknown layout "{layout}"')
+    if not isinstance(content, dict):
+        raise SchemaError(f"{where} must be an object")
+    cls = CONTENT_TYPES[layout]
+    values = {}
+    for f in fields(cls):
+        if f.name not in content:
+            raise SchemaError(f"{where} is missing {f.name} ({layout})")
+        check = _text_list if f.type is TextList else _text
+        values[f.name] = check(content[f.name], f"{where}.{f.name}")
+    return cls(**values)
+
+
+def parse_slide(data, number):
+    """TitleSlide or ContentSlide from one entry of slides[]"""
+    where = f"slide {number}"
+    if not isinstance(data, dict):
+        raise SchemaError(f"{where} must be an object")
+    slide_number = data.get('slideNumber') or number
+    title = _text(data.get('title'), f"{where} title")
+    if data.get('isTitle'):
+        return TitleSlide(slide_number, title, data.get('subtitle') or '')
+    layout = data.get('layout') or 'numbered_boxes'
+    known = {'slideNumber', 'title', 'layout', 'content', 'reasoning', 'isTitle', 'subtitle'}
+    return ContentSlide(slide_number, title, layout, parse_content(layout, data.get('content'), f"{where} content"),
+                        data.get('reasoning') or '', {k: v for k, v in data.items() if k not in known})
+
+
+def parse_deck(structure):
+    """List of typed slides; raises SchemaError naming the first slide that breaks the contract"""
+    slides = structure.get('slides') if isinstance(structure, dict) else None
+    if not isinstance(slides, list) or not slides:
+        raise SchemaError("Response has no slides")
+    return [parse_slide(slide, number) for number, slide in enumerate(slides, 1)]
+
+
+# --- JSON schemas for structured output ---
+
+def _content_schema(cls, required=True):
+    props = {f.name: ({'type': 'array', 'items': {'type': 'string'}} if f.type is TextList else {'type': 'string'})
+             for f in fields(cls)}
+    schema = {'type': 'object', 'properties': props}
+    if required:
+        schema['required'] = list(props)
+    return schema
+
+
+def _slide_schema(content):
+    return {
+        'type': 'object',
+        'properties': {
+            'slideNumber': {'type': 'integer'},
+            'title': {'type': 'string'},
+            'subtitle': {'type': 'string'},
+            'isTitle': {'type': 'boolean'},
+            'layout': {'type': 'string', 'enum': LAYOUT_NAMES},
+            'reasoning': {'type': 'string'},
+            **({'content': content} if content else {}),
+        },
+        'required': ['slideNumber', 'title'],
+    }
+
+
+def _deck(slide):
+    return {'type': 'object', 'properties': {'slides': {'type': 'array', 'items': slide}}, 'required': ['slides']}
+
+
+def _sections():
+    section = {'type': 'object',
+               'properties': {'title': {'type': 'string'}, 'summary': {'type': 'string'}, 'slides': {'type': 'integer'}},
+               'required': ['title', 'slides']}
+    return {'type': 'object',
+            'properties': {'title': {'type': 'string'}, 'subtitle': {'type': 'string'},
+                           'sections': {'type': 'array', 'items': section}},
+            'required': ['sections']}
+
+
+def _union_content():
+    props = {}
+    for cls in CONTENT_TYPES.values():
+        props.update(_content_schema(cls, required=False)['properties'])
+    return {'type': 'object', 'properties': props}
+
+
+def content_layout(kind):
+    """The layout a 'content:<layout>' schema asks for"""
+    layout = kind.partition(':')[2]
+    if layout not in CONTENT_TYPES:
+        raise ValueError(f"Unknown schema {kind!r}")
+    return layout
+
+
+def check_content(kind, response):
+    """Raise SchemaError if a reply to a 'content:<layout>' request doesn't fill that layout"""
+    content = response.get('content', response) if isinstance(response, dict) else response
+    parse_content(content_layout(kind), content)
+
+
+def _content_reply(content):
+    # title is only filled in when a repair asks for a missing one (slide_repair)
+    return {'type': 'object', 'properties': {'title': {'type': 'string'}, 'content': content}, 'required': ['content']}
+
+
+def json_schema(kind):
+    """Full JSON Schema: 'deck' (slides with content), 'outline' (no content), 'content:<layout>' (one slide's
+    content, and its title when a repair asks for one) or 'sections' (a large deck's plan, see large_deck.py)"""
+    if kind == 'deck':
+        return _deck(_slide_schema({'anyOf': [_content_schema(cls) for cls in CONTENT_TYPES.values()]}))
+    if kind == 'outline':
+        return _deck(_slide_schema(None))
+    if kind.startswith('content:'):
+        return _content_reply(_content_schema(CONTENT_TYPES[content_layout(kind)]))
+    if kind == 'sections':
+        return _sections()
+    raise ValueError(f"Unknown schema {kind!r}")
+
+
+def _gemini_types(schema):
+    out = {k: v for k, v in schema.items() if k not in ('type', 'properties', 'items')}
+    out['type'] = schema['type'].upper()
+    if 'properties' in schema:
+        out['properties'] = {k: _gemini_types(v) for k, v in schema['properties'].items()}
+    if 'items' in schema:
+        out['items'] = _gemini_types(schema['items'])
+    return out
+
+
+def gemini_schema(kind):
+    """response_schema for Gemini; a deck's content fields are a flat optional union"""
+    if kind == 'deck':
+        schema = _deck(_slide_schema(_union_content()))
+    elif kind == 'outline':
+        schema = _deck(_slide_schema(None))
+    elif kind.startswith('content:'):
+        schema = _content_reply(_content_schema(CONTENT_TYPES[content_layout(kind)]))
+    elif kind == 'sections':
+        schema = _sections()
+    else:
+        raise ValueError(f"Unknown schema {kind!r}")
+    return _gemini_types(schema)
+
+
+TOOL_NAME = 'emit_slides'
+
+
+def anthropic_tool(kind):
+    return {
+        'name': TOOL_NAME,
+        'description': "Return the presentation content. Plain text only, no markdown.",
+        'input_schema': json_schema(kind),
+    }
@@ -0,0 +1,358 @@
+"""Per-stage timing and token counts for the generate flow.
+
+A slow deck used to be a single number. Now every stage runs inside a span:
+
+- prompt       building the LLM prompt
+- llm          one provider call (provider, model, schema, cached, input and
+               output tokens, prompt cache reads and writes); the time spent
+               parsing the stream is recorded under it as parse
+- hedge        a "fastest" mode call (hedging.py): the primary's and, if it
+               fired, the other provider's llm spans, with the deadline,
+               the reason for hedging and the winner
+- throttle     waiting for a provider's rate limit buckets or a free
+               concurrency slot (provider_gateway.py)
+- backoff      waiting before a retried provider request, with the status
+               that caused it
+- repair       fixing slides that break their layout contract
+- fit          shrinking text to its frames
+- render       turning slides into PPTX bytes, with slide cache hits/misses;
+               under it worker_start (spawning the Node pool, once per
+               process), worker_wait (waiting for an idle worker), node_render
+               (the request round trip; a worker's first job includes Node
+               loading pptxgenjs), read_back (decoding the reply),
+               native_render and package (writing the zip)
+
+Spans opened inside trace() are collected into one trace per deck. Spans
+follow the context they were opened in, including asyncio tasks and
+asyncio.to_thread, so parallel slide calls end up in the deck's trace.
+
+Every finished span feeds a process-wide registry exported in OpenMetrics text
+format: openmetrics() returns it, and METRICS_PORT starts an HTTP endpoint that
+serves it. Other modules add their own metric families with add_collector().
+When TELEMETRY_LOG is set, every finished trace is written to it as one JSON
+line ('-' for stderr, or a file path to append); unset, empty or '0' is off.
+"""
+import contextvars
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_LOG = os.environ.get('TELEMETRY_LOG', '')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0))
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+
+# Histogram buckets in seconds: sub-millisecond fitting up to multi-minute LLM calls
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PREFIX = 'pptgen'
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+_current = contextvars.ContextVar('telemetry_span', default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """One timed stage; attrs are free-form and end up in the JSON log"""
+
+    def __init__(self, name, trace=None, parent=None, attrs=None):
+        self.id = next(_span_ids)
+        self.name = name
+        self.trace = trace
+        self.parent_id = parent.id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.path = parent.path + (name,) if parent else ()
+        self.attrs = dict(attrs or {})
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self._started = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self, duration=None, error=None):
+        self.duration = time.perf_counter() - self._started if duration is None else duration
+        self.error = error
+        if self.trace:
+            self.trace.add(self)
+        get_telemetry().observe(self)
+
+    def to_dict(self):
+        entry = {'name': self.name, 'id': self.id, 'parent': self.parent_id, 'depth': self.depth,
+                 'start': round(self.start, 6), 'duration_s': round(self.duration or 0.0, 6)}
+        if self.attrs:
+            entry['attrs'] = self.attrs
+        if self.error:
+            entry['error'] = self.error
+        return entry
+
+
+class Trace:
+    """Finished spans of one deck, in the order they finished"""
+
+    def __init__(self, name, attrs=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.root = Span(name, None, None, attrs)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def tokens(self):
+        """(input, output) tokens over every provider call in the trace"""
+        with self._lock:
+            spans = list(self.spans)
+        return (sum(s.attrs.get('input_tokens', 0) for s in spans),
+                sum(s.attrs.get('output_tokens', 0) for s in spans))
+
+    def cache_tokens(self):
+        """(read, written) input tokens of the prompt cache over every provider call in the trace"""
+        with self._lock:
+            spans = list(self.spans)
+        return (sum(s.attrs.get('cache_read_tokens', 0) for s in spans),
+                sum(s.attrs.get('cache_write_tokens', 0) for s in spans))
+
+    def breakdown(self):
+        """Rows of {stage, depth, calls, seconds, share}, one per stage and parent stage, as a tree.
+
+        Repeated stages (fit per slide, llm per parallel call) are summed, so
+        shares of calls that overlapped can add up to more than 100%.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        total = self.root.duration or sum(s.duration for s in spans if s.depth == 1) or 1.0
+        rows = {}
+        for span in sorted(spans, key=lambda s: s.start):
+            row = rows.setdefault(span.path, {'stage': span.name, 'depth': span.depth, 'calls': 0, 'seconds': 0.0})
+            row['calls'] += 1
+            row['seconds'] += span.duration
+        for row in rows.values():
+            row['seconds'] = round(row['seconds'], 6)
+            row['share'] = round(row['seconds'] / total, 4)
+        # Children right after their parent, siblings in the order they first started; a parent still
+        # running (no row yet) sorts its children first
+        order = {path: i for i, path in enumerate(rows)}
+        return [rows[path] for path in sorted(rows, key=lambda p: [order.get(p[:i + 1], -1) for i in range(len(p))])]
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        input_tokens, output_tokens = self.tokens()
+        cache_read, cache_write = self.cache_tokens()
+        return {'trace': self.id, 'name': self.name, 'start': round(self.root.start, 6),
+                'duration_s': round(self.root.duration or 0.0, 6), 'status': 'error' if self.root.error else 'ok',
+                'error': self.root.error, 'attrs': self.root.attrs, 'input_tokens': input_tokens,
+                'output_tokens': output_tokens, 'cache_read_tokens': cache_read, 'cache_write_tokens': cache_write,
+                'stages': self.breakdown(), 'spans': [s.to_dict() for s in spans]}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class Telemetry:
+    """Process-wide registry of stage durations, errors and token counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}   # stage -> [bucket counts..., +Inf count, sum]
+        self._errors = {}      # stage -> count
+        self._tokens = {}      # (provider, model, direction) -> count
+        self._traces = {}      # (name, status) -> count
+        self._collectors = []  # callables returning more OpenMetrics lines, e.g. hedging stats
+        self.logger = logging.getLogger('ppt_generator.telemetry')
+        self.server = None
+
+    def observe(self, span):
+        with self._lock:
+            hist = self._durations.setdefault(span.name, [0] * (len(BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    hist[i] += 1
+            hist[len(BUCKETS)] += 1
+            hist[-1] += span.duration
+            if span.error:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            provider = span.attrs.get('provider')
+            for direction in ('input', 'output', 'cache_read', 'cache_write'):
+                count = span.attrs.get(f'{direction}_tokens')
+                if provider and count:
+                    key = (provider, span.attrs.get('model', ''), direction)
+                    self._tokens[key] = self._tokens.get(key, 0) + count
+
+    def add_collector(self, collect):
+        """Include collect()'s OpenMetrics lines (families without '# EOF') in every export"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def finish_trace(self, trace):
+        status = 'error' if trace.root.error else 'ok'
+        with self._lock:
+            self._traces[(trace.name, status)] = self._traces.get((trace.name, status), 0) + 1
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(json.dumps(trace.to_dict(), ensure_ascii=False, default=str))
+
+    def openmetrics(self):
+        """Everything observed so far in OpenMetrics text format"""
+        with self._lock:
+            durations = {k: list(v) for k, v in self._durations.items()}
+            errors, tokens, traces = dict(self._errors), dict(self._tokens), dict(self._traces)
+            collectors = list(self._collectors)
+        name = f'{PREFIX}_stage_duration_seconds'
+        lines = [f'# TYPE {name} histogram', f'# UNIT {name} seconds',
+                 f'# HELP {name} Time spent in each stage of deck generation.']
+        for stage, hist in sorted(durations.items()):
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f'{name}_bucket{_labels(stage=stage, le=float(bound))} {count}')
+            lines.append(f'{name}_bucket{_labels(stage=stage, le="+Inf")} {hist[len(BUCKETS)]}')
+            lines.append(f'{name}_count{_labels(stage=stage)} {hist[len(BUCKETS)]}')
+            lines.append(f'{name}_sum{_labels(stage=stage)} {hist[-1]:.6f}')
+        name = f'{PREFIX}_stage_errors'
+        lines += [f'# TYPE {name} counter', f'# HELP {name} Stages that raised.']
+        lines += [f'{name}_total{_labels(stage=stage)} {count}' for stage, count in sorted(errors.items())]
+        name = f'{PREFIX}_llm_tokens'
+        lines += [f'# TYPE {name} counter', f'# HELP {name} Tokens sent to and received from LLM providers; '
+                  f'cache_read and cache_write are the input tokens served from or stored in the prompt cache.']
+        lines += [f'{name}_total{_labels(provider=p, model=m, direction=d)} {count}'
+                  for (p, m, d), count in sorted(tokens.items())]
+        name = f'{PREFIX}_traces'
+        lines += [f'# TYPE {name} counter', f'# HELP {name} Finished traces by outcome.']
+        lines += [f'{name}_total{_labels(name=n, status=s)} {count}' for (n, s), count in sorted(traces.items())]
+        for collect in collectors:
+            lines += collect()
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=METRICS_PORT, host=METRICS_HOST):
+        """Serve openmetrics() over HTTP from a daemon thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.openmetrics().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True).start()
+        return self.server
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._errors.clear()
+            self._tokens.clear()
+            self._traces.clear()
+
+
+def _configure_log(logger, target):
+    if target in ('', '0') or logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if target == '-' else logging.FileHandler(target, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Process-wide registry, shared across Streamlit reruns and sessions"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry()
+            _configure_log(_telemetry.logger, TELEMETRY_LOG)
+            if METRICS_PORT:
+                _telemetry.serve()
+        return _telemetry
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Collect every span opened inside into one trace; yields the Trace"""
+    tr = Trace(name, attrs)
+    token = _current.set(tr.root)
+    tr.root.trace = tr
+    error = None
+    try:
+        yield tr
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        tr.root.trace = None
+        tr.root.finish(error=error)
+        get_telemetry().finish_trace(tr)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a stage; outside any trace it still counts towards the metrics"""
+    parent = _current.get()
+    sp = Span(name, parent.trace if parent else None, parent, attrs)
+    token = _current.set(sp)
+    error = None
+    try:
+        yield sp
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        sp.finish(error=error)
+
+
+def record(name, seconds, **attrs):
+    """Add a stage that was timed elsewhere, e.g. parse time summed over a stream"""
+    parent = _current.get()
+    Span(name, parent.trace if parent else None, parent, attrs).finish(seconds)
+
+
+def annotate(**attrs):
+    """Set attrs on the innermost open span, if any"""
+    current = _current.get()
+    if current:
+        current.set(**attrs)
+
+
+def current_span():
+    return _current.get()
+
+
+def openmetrics():
+    return get_telemetry().openmetrics()
+
+
+def add_collector(collect):
+    get_telemetry().add_collector(collect)
+
+
+def timing_table(stages):
+    """Rows for the UI's timing breakdown, from Trace.breakdown(); nested stages are indented"""
+    # Non-breaking spaces, which HTML tables don't collapse
+    return [{'Stage': '\u00a0\u00a0\u00a0' * (row['depth'] - 1) + row['stage'], 'Calls': row['calls'],
+             'Seconds': f"{row['seconds']:.3f}", 'Share': f"{row['share']:.0%}"} for row in stages]
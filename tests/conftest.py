@@ -0,0 +1,37 @@
+"""Shared setup for the unit tests: run with python -m pytest -q from the repo root"""
+import os
+import sys
+import threading
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+# Nothing read or written under .cache, and no span log on stdout
+os.environ.setdefault('LLM_CACHE_PATH', ':memory:')
+os.environ['TELEMETRY_LOG'] = ''
+
+from fake_llm_server import FakeLLM, make_server  # noqa: E402
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """A fake_llm_server on a free port, with the provider clients pointed at it; yields the FakeLLM"""
+    import llm_cache
+    import llm_clients
+    import prompt_cache
+    import provider_gateway
+    fake = FakeLLM(seed=1)
+    server = make_server(fake, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(llm_clients, 'BASE_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(llm_clients, '_registry', None)
+    # Nothing cached for, or learned from, another server
+    monkeypatch.setattr(llm_cache, '_cache', None)
+    monkeypatch.setattr(prompt_cache, '_prompt_cache', None)
+    monkeypatch.setattr(provider_gateway, '_gateway', None)
+    try:
+        yield fake
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+
+import pytest
+
+import batch_generate
+from fake_llm_server import FakeLLM
+from generation import DEFAULT_BRAND, deck_prompt
+
+
+def test_brand_override_with_colors(tmp_path):
+    brand = {'company_name': 'Acme', 'colors': {'yellow': '111111', 'coral': '222222'}}
+    (tmp_path / 'acme.json').write_text(json.dumps(brand), encoding='utf-8')
+    for value in ('acme.json', json.dumps(brand)):
+        merged = batch_generate.load_brand(value, str(tmp_path))
+        assert merged['company_name'] == 'Acme'
+        assert merged['tagline_1'] == DEFAULT_BRAND['tagline_1']
+        assert merged['colors'] == dict(DEFAULT_BRAND['colors'], yellow='111111', coral='222222')
+    # The default brand is left as it was
+    assert DEFAULT_BRAND['colors']['yellow'] != '111111'
+
+
+def test_manifest_rows_with_brand_colors(tmp_path):
+    manifest = tmp_path / 'manifest.jsonl'
+    rows = [{'topic': 'Tides', 'brand': {'colors': {'blue': '000000'}}}, {'topic': 'Rivers', 'slide_count': 3}]
+    manifest.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+    items = batch_generate.prepare_items(batch_generate.load_manifest(str(manifest)), str(manifest))
+    assert [item['id'] for item in items] == ['0001-tides', '0002-rivers']
+    assert items[0]['brand']['colors']['blue'] == '000000'
+    assert items[1]['brand'] is DEFAULT_BRAND
+
+
+def test_failed_large_item_leaves_no_part_file(tmp_path, monkeypatch):
+    def broken(provider, api_key, topic, slide_count, writer, *args):
+        writer.add_slides(FakeLLM().reply(deck_prompt(topic, 3))['slides'])
+        raise RuntimeError('chunk failed')
+    monkeypatch.setattr(batch_generate, 'generate_large', broken)
+    args = argparse.Namespace(out=str(tmp_path), provider='anthropic', renderer='native', model=None, no_cache=True)
+    item = {'id': 'big', 'topic': 'Tides', 'slide_count': 40, 'instructions': '', 'brand': DEFAULT_BRAND}
+    with pytest.raises(RuntimeError, match='chunk failed'):
+        batch_generate.generate_large_item(item, args, 'test-key')
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,181 @@
+import io
+import json
+import os
+import time
+import zipfile
+
+import pytest
+
+import job_queue
+from conftest import BASE_DIR
+from fake_llm_server import FakeLLM
+from generation import deck_prompt
+from job_queue import JobQueue, QueueFull
+
+with open(os.path.join(BASE_DIR, 'fixtures', 'all_layouts.json'), encoding='utf-8') as f:
+    BRAND = json.load(f)['brand']
+
+
+@pytest.fixture
+def jobs():
+    queue = JobQueue(workers=1, max_depth=4)
+    yield queue
+    queue.close()
+
+
+def wait(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.status(job_id)
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job still {status['status']} after {timeout}s")
+
+
+def submit(queue, **kwargs):
+    args = dict(provider='anthropic', api_key='test-key', topic='Tides', slide_count=3, brand_config=BRAND,
+                renderer='native')
+    args.update(kwargs)
+    return queue.submit(**args)
+
+
+def fake_generate(*args, **kwargs):
+    """generate_slides streaming the fake server's deck"""
+    on_slide = args[8]
+    structure = FakeLLM().reply(deck_prompt(args[2], args[3]))
+    for slide in structure['slides']:
+        on_slide(slide)
+    return structure, [], None
+
+
+def test_deck_is_rendered(jobs, monkeypatch):
+    monkeypatch.setattr(job_queue, 'generate_slides', fake_generate)
+    job_id = submit(jobs)
+    status = wait(jobs, job_id)
+    assert status['status'] == 'done', status['error']
+    assert len(status['slides']) == 4
+    with zipfile.ZipFile(io.BytesIO(jobs.result(job_id))) as package:
+        assert package.testzip() is None
+        assert len([n for n in package.namelist() if n.startswith('ppt/slides/slide')]) == 4
+
+
+def test_generation_error_fails_the_job_not_the_worker(jobs, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError('provider exploded')
+    monkeypatch.setattr(job_queue, 'generate_slides', broken)
+    status = wait(jobs, submit(jobs))
+    assert status['status'] == 'failed'
+    assert status['error'] == 'provider exploded'
+    assert status['finished'] is not None
+    # The one worker is still serving jobs
+    monkeypatch.setattr(job_queue, 'generate_slides', fake_generate)
+    assert wait(jobs, submit(jobs))['status'] == 'done'
+    assert jobs.summary()['failed'] == 1 and jobs.summary()['done'] == 1
+
+
+def test_setup_error_fails_the_job(jobs, monkeypatch):
+    monkeypatch.setattr(job_queue, 'generate_slides', fake_generate)
+    status = wait(jobs, submit(jobs, renderer='bogus'))
+    assert status['status'] == 'failed'
+    assert 'Unknown renderer' in status['error']
+    assert jobs.result(status['id']) is None
+    assert wait(jobs, submit(jobs))['status'] == 'done'
+
+
+def test_api_key_is_dropped_when_the_job_ends(jobs, monkeypatch):
+    monkeypatch.setattr(job_queue, 'generate_slides', fake_generate)
+    job_id = submit(jobs)
+    wait(jobs, job_id)
+    assert jobs._jobs[job_id].request['api_key'] is None
+
+
+def test_large_deck_is_written_to_a_file(jobs, monkeypatch):
+    def generate(provider, api_key, topic, slide_count, writer, instructions, model, use_cache, on_slide):
+        slides = FakeLLM().reply(deck_prompt(topic, slide_count))['slides']
+        writer.add_slides(slides)
+        for slide in slides:
+            on_slide(slide)
+        return None, [], None
+    monkeypatch.setattr(job_queue, 'generate_large', generate)
+    job_id = submit(jobs, large_deck=True)
+    assert wait(jobs, job_id)['status'] == 'done'
+    assert os.path.exists(jobs._jobs[job_id].result_path)
+    with zipfile.ZipFile(io.BytesIO(jobs.result(job_id))) as package:
+        assert package.testzip() is None
+        assert len([n for n in package.namelist() if n.startswith('ppt/slides/slide')]) == 4
+    jobs._remove_result(jobs._jobs[job_id])
+
+
+# The abandoned zip must not try to write to the closed file when it is collected
+@pytest.mark.filterwarnings('error::pytest.PytestUnraisableExceptionWarning')
+def test_failed_large_deck_removes_its_file(jobs, monkeypatch):
+    paths = []
+
+    def broken(provider, api_key, topic, slide_count, writer, *args):
+        paths.append(jobs._jobs[job_id].result_path)
+        writer.add_slides(FakeLLM().reply(deck_prompt(topic, slide_count))['slides'][:2])
+        raise RuntimeError('chunk failed')
+    monkeypatch.setattr(job_queue, 'generate_large', broken)
+    job_id = submit(jobs, large_deck=True)
+    status = wait(jobs, job_id)
+    assert status['status'] == 'failed' and status['error'] == 'chunk failed'
+    assert paths and not os.path.exists(paths[0])
+    assert jobs._jobs[job_id].result_path is None
+
+
+def test_rebuilds_from_the_final_structure_after_repair(jobs, monkeypatch):
+    def repaired(*args, **kwargs):
+        structure, _, _ = fake_generate(*args, **kwargs)
+        # One streamed slide was dropped by the repair
+        structure = dict(structure, slides=structure['slides'][:-1])
+        report = {'repaired': 0, 'fixed_locally': 0}
+        return structure, [(4, 'content missing')], report
+    monkeypatch.setattr(job_queue, 'generate_slides', repaired)
+    job_id = submit(jobs)
+    assert wait(jobs, job_id)['status'] == 'done'
+    with zipfile.ZipFile(io.BytesIO(jobs.result(job_id))) as package:
+        assert len([n for n in package.namelist() if n.startswith('ppt/slides/slide')]) == 3
+
+
+def test_unknown_layout_while_streaming_waits_for_the_repair(jobs, monkeypatch):
+    def repaired(*args, **kwargs):
+        on_slide = args[8]
+        structure = FakeLLM().reply(deck_prompt(args[2], args[3]))
+        streamed = [dict(slide) for slide in structure['slides']]
+        streamed[2]['layout'] = 'bogus'
+        for slide in streamed:
+            on_slide(slide)
+        # No rebuild: the held-back slides come from the repaired structure
+        return structure, [], None
+    monkeypatch.setattr(job_queue, 'generate_slides', repaired)
+    job_id = submit(jobs)
+    status = wait(jobs, job_id)
+    assert status['status'] == 'done', status['error']
+    assert len(status['slides']) == 4
+    with zipfile.ZipFile(io.BytesIO(jobs.result(job_id))) as package:
+        assert len([n for n in package.namelist() if n.startswith('ppt/slides/slide')]) == 4
+
+
+def test_unknown_layout_left_after_the_repair_fails_the_job(jobs, monkeypatch):
+    def unrepaired(*args, **kwargs):
+        structure = FakeLLM().reply(deck_prompt(args[2], args[3]))
+        structure['slides'][2]['layout'] = 'bogus'
+        for slide in structure['slides']:
+            args[8](slide)
+        return structure, [], None
+    monkeypatch.setattr(job_queue, 'generate_slides', unrepaired)
+    status = wait(jobs, submit(jobs))
+    assert status['status'] == 'failed'
+    assert 'Unknown layout "bogus"' in status['error']
+
+
+def test_full_queue_refuses_jobs(monkeypatch):
+    queue = JobQueue(workers=1, max_depth=1)
+    queue.close()
+    time.sleep(0.6)   # the worker notices close() at its next poll
+    monkeypatch.setattr(job_queue, 'generate_slides', fake_generate)
+    submit(queue)
+    with pytest.raises(QueueFull):
+        submit(queue)
+    assert queue.summary()['rejected'] == 1
@@ -0,0 +1,34 @@
+import pytest
+
+from generation import deck_prompt
+from llm_clients import ClientRegistry
+
+
+class Client:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_evicted_client_is_dropped_not_closed():
+    registry = ClientRegistry(max_clients=2)
+    first = registry._get('anthropic', 'key-1', lambda key: Client())
+    registry._get('anthropic', 'key-2', lambda key: Client())
+    registry._get('anthropic', 'key-3', lambda key: Client())
+    assert registry.stats['evicted'] == 1
+    # A generation still streaming through the first client can finish
+    assert not first.closed
+    assert registry._get('anthropic', 'key-1', lambda key: Client()) is not first
+
+
+@pytest.mark.parametrize('provider', ['anthropic', 'gemini'])
+def test_pool_stats_count_both_providers(fake_server, provider):
+    pytest.importorskip('anthropic' if provider == 'anthropic' else 'google.ai.generativelanguage')
+    import llm_clients
+    from llm_providers import call_llm
+    call_llm(provider, 'test-key', deck_prompt('Tides', 3), use_cache=False, failover=False)
+    stats = llm_clients.get_clients().pool_stats()
+    assert stats[f'{provider}_clients'] == 1
+    assert stats[f'{provider}_connections'] >= 1
+    assert stats['http_connections'] == stats['anthropic_connections'] + stats['gemini_connections']
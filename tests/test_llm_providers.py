@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+import llm_providers
+from deck_planner import fill_outline, regenerate_slide
+from fake_llm_server import FakeLLM
+from generation import deck_prompt
+from llm_cache import LLMCache
+from llm_providers import call_llm
+from slide_schema import SchemaError
+
+PROMPT = deck_prompt('Tides', 3)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Replaces the provider stream with scripted replies (dicts, sent as JSON in chunks); records the requests"""
+    monkeypatch.setattr(llm_providers, 'get_llm_cache', lambda cache=LLMCache(':memory:'): cache)
+    monkeypatch.setattr(llm_providers, 'STRUCTURED_OUTPUT', True)
+    replies = []
+    requests = []
+
+    def text_stream(provider, api_key, model, prompt, max_tokens=None, schema=None):
+        requests.append((prompt, schema))
+        text = json.dumps(replies[min(len(requests), len(replies)) - 1])
+        return iter([text[i:i + 50] for i in range(0, len(text), 50)])
+    monkeypatch.setattr(llm_providers, 'text_stream', text_stream)
+    return replies, requests
+
+
+def call(prompt=PROMPT, schema='deck', use_cache=True):
+    return call_llm('anthropic', 'test-key', prompt, use_cache=use_cache, schema=schema, failover=False)
+
+
+def test_valid_deck_is_cached(provider):
+    replies, requests = provider
+    replies.append(FakeLLM().reply(PROMPT))
+    assert call() == call() == replies[0]
+    assert len(requests) == 1
+
+
+def test_deck_breaking_the_contract_is_returned_but_not_cached(provider):
+    replies, requests = provider
+    deck = FakeLLM().reply(PROMPT)
+    deck['slides'][1]['content'] = {}
+    replies.append(deck)
+    assert call() == deck
+    # Asking again reaches the provider instead of the bad reply
+    assert call() == deck
+    assert len(requests) == 2
+
+
+def test_content_missing_the_layout_fields_raises_and_is_not_cached(provider):
+    replies, requests = provider
+    replies += [{'content': {'boxes': []}}, FakeLLM().reply('(layout: numbered_boxes)')]
+    with pytest.raises(SchemaError, match='content.boxes must be a non-empty list'):
+        call('slide prompt', 'content:numbered_boxes')
+    assert call('slide prompt', 'content:numbered_boxes') == replies[1]
+    assert call('slide prompt', 'content:numbered_boxes') == replies[1]
+    assert len(requests) == 2
+
+
+def test_slide_retry_reaches_the_provider_again(provider):
+    replies, requests = provider
+    deck = FakeLLM().reply(PROMPT)
+    good = {'content': deck['slides'][2]['content']}
+    replies += [{'content': {'boxes': []}}, good]
+
+    def llm(prompt, schema):
+        return call_llm('anthropic', 'test-key', prompt, use_cache=True, schema=schema, failover=False)
+    slide = regenerate_slide(llm, 'Tides', deck, 2, retries=1)
+    assert slide['content'] == good['content']
+    assert len(requests) == 2
+    assert requests[0] == requests[1]
+    assert requests[0][1] == f"content:{deck['slides'][2]['layout']}"
+
+
+def test_outline_slides_are_retried_past_a_bad_reply(provider):
+    replies, requests = provider
+    outline = FakeLLM().reply(deck_prompt('Tides', 1))
+    layout = outline['slides'][1]['layout']
+    replies += [{'content': {}}, FakeLLM().reply(f'(layout: {layout})')]
+
+    def llm(prompt, schema):
+        return call_llm('anthropic', 'test-key', prompt, use_cache=True, schema=schema, failover=False)
+    structure, failed = asyncio.run(fill_outline(llm, 'Tides', outline))
+    assert failed == []
+    assert structure['slides'][1]['content'] == replies[1]['content']
+    assert len(requests) == 2
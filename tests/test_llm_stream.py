@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from fake_llm_server import FakeLLM
+from generation import deck_prompt
+from llm_stream import IncompleteReply, SlideStreamParser, replay_slides, stream_slides
+
+PROMPT = deck_prompt('Photosynthesis', 6)
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('structured', [True, False])
+@pytest.mark.parametrize('size', [1, 7, 40, 100000])
+def test_slides_arrive_as_they_complete(structured, size):
+    text, _ = FakeLLM().render(PROMPT, structured, None)
+    expected = json.loads(text[text.index('{'):text.rindex('}') + 1])['slides']
+    parser = SlideStreamParser()
+    seen = []
+    for chunk in chunked(text, size):
+        seen += parser.feed(chunk)
+    assert seen == expected
+    assert parser.result()['slides'] == expected
+
+
+def test_each_slide_is_emitted_on_its_closing_brace():
+    parser = SlideStreamParser()
+    assert parser.feed('Sure! {"slides": [{"title": "A"') == []
+    assert parser.feed('}') == [{'title': 'A'}]
+    assert parser.feed(', {"title": "B"}') == [{'title': 'B'}]
+    assert parser.feed(']}') == []
+    assert parser.result() == {'slides': [{'title': 'A'}, {'title': 'B'}]}
+
+
+def test_braces_and_quotes_inside_strings():
+    slide = {'title': 'Sets {a, b} and "quotes" \\ slashes', 'content': {'points': ['[x]', '}{']}}
+    text = 'Note: "slides" below.\n```json\n' + json.dumps({'slides': [slide, {'title': 'Next'}]}) + '\n```'
+    parser = SlideStreamParser()
+    seen = [s for chunk in chunked(text, 3) for s in parser.feed(chunk)]
+    assert seen == [slide, {'title': 'Next'}]
+
+
+def test_nested_slides_key_is_not_the_deck():
+    parser = SlideStreamParser()
+    text = json.dumps({'meta': {'slides': [{'title': 'no'}]}, 'slides': [{'title': 'yes'}]})
+    assert parser.feed(text) == [{'title': 'yes'}]
+
+
+def test_truncated_reply_raises_after_the_finished_slides():
+    text, _ = FakeLLM().render(PROMPT, True, None)
+    full = json.loads(text)['slides']
+    cut = text[:text.index(json.dumps(full[3]['title'], ensure_ascii=False))]
+    received = []
+    with pytest.raises(IncompleteReply, match='after 3 complete slide'):
+        stream_slides(chunked(cut, 40), received.append)
+    # What did arrive was still shown as it streamed
+    assert received == full[:3]
+
+
+def test_malformed_reply_raises():
+    fake = FakeLLM(malformed_rate=1.0)
+    text, _ = fake.render(PROMPT, False, 'malformed')
+    with pytest.raises(IncompleteReply):
+        stream_slides(chunked(text, 40))
+
+
+def test_reply_without_json_raises():
+    with pytest.raises(ValueError):
+        stream_slides(['I cannot help with that.'])
+
+
+def test_structure_the_scanner_missed_is_still_announced():
+    received = []
+    # The scanner compares the raw key, so it never sees this array; the final parse decodes it to "slides"
+    result = stream_slides(['{"\\u0073lides": [{"title": ', '"A"}, {"title": "B"}]}'], received.append)
+    assert result == {'slides': [{'title': 'A'}, {'title': 'B'}]}
+    assert received == result['slides']
+
+
+def test_replay_slides():
+    received = []
+    replay_slides({'slides': [{'title': 'A'}, {'title': 'B'}]}, received.append)
+    replay_slides({'slides': [{'title': 'C'}]}, None)
+    assert received == [{'title': 'A'}, {'title': 'B'}]
+
+
+@pytest.mark.parametrize('schema', ['deck', None])
+def test_call_llm_streams_slides_from_the_fake_server(fake_server, schema):
+    pytest.importorskip('anthropic')
+    from llm_providers import call_llm
+    received = []
+    result = call_llm('anthropic', 'test-key', PROMPT, use_cache=False, on_slide=received.append, schema=schema)
+    assert len(result['slides']) == 7
+    assert received == result['slides']
+    assert fake_server.stats['streamed'] >= 1
+
+
+@pytest.mark.parametrize('provider', ['anthropic', 'gemini'])
+@pytest.mark.parametrize('schema', ['deck', None])
+def test_reply_cut_off_at_max_tokens_raises_and_is_not_cached(fake_server, provider, schema):
+    pytest.importorskip('anthropic' if provider == 'anthropic' else 'google.ai.generativelanguage')
+    from llm_providers import call_llm
+    fake_server.truncate_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(IncompleteReply):
+            call_llm(provider, 'test-key', PROMPT, on_slide=lambda slide: None, schema=schema, failover=False)
+    assert fake_server.stats['truncated'] == 2
@@ -0,0 +1,112 @@
+import copy
+import io
+import json
+import os
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+import pptx_native
+from conftest import BASE_DIR
+
+with open(os.path.join(BASE_DIR, 'fixtures', 'all_layouts.json'), encoding='utf-8') as f:
+    FIXTURE = json.load(f)
+SLIDES, BRAND = FIXTURE['slides'], FIXTURE['brand']
+RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+TYPES_NS = '{http://schemas.openxmlformats.org/package/2006/content-types}'
+
+
+def check_package(data):
+    """Assert the bytes are a well-formed PPTX package; returns the open zip"""
+    package = zipfile.ZipFile(io.BytesIO(data))
+    assert package.testzip() is None
+    names = set(package.namelist())
+    for name in names:
+        if name.endswith(('.xml', '.rels')):
+            ElementTree.fromstring(package.read(name))
+    types = ElementTree.fromstring(package.read('[Content_Types].xml'))
+    overrides = {o.get('PartName').lstrip('/') for o in types.iter(f'{TYPES_NS}Override')}
+    assert overrides <= names
+    # Every relationship points at a part that exists
+    for name in names:
+        if not name.endswith('.rels'):
+            continue
+        base = posixpath.dirname(posixpath.dirname(name))
+        for rel in ElementTree.fromstring(package.read(name)).iter(f'{RELS_NS}Relationship'):
+            if rel.get('TargetMode') == 'External':
+                continue
+            assert posixpath.normpath(posixpath.join(base, rel.get('Target'))) in names, (name, rel.get('Target'))
+    return package
+
+
+def slide_names(package):
+    return sorted(n for n in package.namelist() if n.startswith('ppt/slides/slide') and n.endswith('.xml'))
+
+
+def test_fixture_deck_is_a_valid_package():
+    package = check_package(pptx_native.render_deck(SLIDES, BRAND))
+    assert len(slide_names(package)) == len(SLIDES['slides'])
+    types = package.read('[Content_Types].xml').decode('utf-8')
+    for name in slide_names(package):
+        assert f'/{name}' in types
+
+
+def test_python_pptx_opens_it():
+    pptx = pytest.importorskip('pptx')
+    deck = pptx.Presentation(io.BytesIO(pptx_native.render_deck(SLIDES, BRAND)))
+    assert len(deck.slides) == len(SLIDES['slides'])
+    texts = [shape.text_frame.text for shape in deck.slides[0].shapes if shape.has_text_frame]
+    assert SLIDES['slides'][0]['title'] in texts
+    assert BRAND['company_name'] in [shape.text_frame.text for shape in deck.slides[0].slide_layout.shapes
+                                     if shape.has_text_frame]
+
+
+def test_markup_in_text_and_brand_is_escaped():
+    brand = dict(BRAND, font='Font "Quoted" & <Co>', company_name='A & B <Ltd> "Inc"')
+    slides = copy.deepcopy(SLIDES)
+    slides['slides'][1]['title'] = 'Less <than> & "more" \x0b than'
+    data = pptx_native.render_deck(slides, brand)
+    package = check_package(data)
+    slide = package.read(slide_names(package)[1]).decode('utf-8')
+    assert 'Less &lt;than&gt; &amp; &quot;more&quot;  than' in slide
+    assert 'typeface="Font &quot;Quoted&quot; &amp; &lt;Co&gt;"' in slide
+
+
+def test_streaming_to_a_file_matches_in_memory(tmp_path):
+    path = tmp_path / 'deck.pptx'
+    with open(path, 'wb') as f:
+        builder = pptx_native.PptxBuilder(BRAND, f)
+        for slide in SLIDES['slides']:
+            builder.add_slide(slide)
+        assert builder.finish() is None
+    in_memory = zipfile.ZipFile(io.BytesIO(pptx_native.render_deck(SLIDES, BRAND)))
+    check_package(path.read_bytes())
+    with zipfile.ZipFile(path) as on_disk:
+        for name in slide_names(in_memory):
+            assert on_disk.read(name) == in_memory.read(name)
+
+
+def test_unknown_layout_is_refused():
+    with pytest.raises(ValueError, match='Unknown layout'):
+        pptx_native.render_deck({'slides': [{'slideNumber': 2, 'title': 'X', 'layout': 'bogus'}]}, BRAND)
+
+
+def test_empty_content_still_renders():
+    slides = {'slides': [{'slideNumber': n + 2, 'title': layout, 'layout': layout, 'content': {}}
+                         for n, layout in enumerate(pptx_native.LAYOUTS)]}
+    package = check_package(pptx_native.render_deck(slides, BRAND))
+    assert len(slide_names(package)) == len(pptx_native.LAYOUTS)
+
+
+def test_slide_without_a_title_still_renders():
+    slides = {'slides': [{'slideNumber': 1, 'isTitle': True}, {'slideNumber': 2, 'layout': 'three_boxes',
+                                                                'content': {'boxes': ['a', 'b', 'c']}}]}
+    package = check_package(pptx_native.render_deck(slides, BRAND))
+    assert len(slide_names(package)) == 2
+
+
+def test_numbers_are_written_like_javascript():
+    assert [pptx_native.extract_text(v) for v in (1.0, 2.5, 3, -4.0, 1e-7, 1e21, True)] == \
+        ['1', '2.5', '3', '-4', '1e-7', '1e+21', 'true']
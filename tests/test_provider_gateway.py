@@ -0,0 +1,208 @@
+import threading
+import time
+
+import pytest
+
+import provider_gateway
+from provider_gateway import AdaptiveLimit, CircuitBreaker, Gateway, ProviderUnavailable, TokenBucket
+from slide_schema import SchemaError
+
+
+class Overloaded(Exception):
+    status_code = 529
+    retry_after = None
+
+
+class NotImplementedByServer(Exception):
+    status_code = 501
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(provider_gateway, 'BACKOFF_BASE_S', 0.0)
+
+
+def scripted(*outcomes, chunks=('{"slides": []}',)):
+    """attempt() that streams chunks and then, per call, raises the next outcome or returns it"""
+    calls = []
+
+    def attempt(provider, api_key, model, watch):
+        calls.append(provider)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, tuple):
+            # (error, chunks before it)
+            outcome, sent = outcome
+            for _ in watch(iter(chunks[:sent])):
+                pass
+        if isinstance(outcome, Exception):
+            raise outcome
+        for _ in watch(iter(chunks)):
+            pass
+        return outcome
+    attempt.calls = calls
+    return attempt
+
+
+# Providers without RATE_LIMITS get unlimited buckets, so nothing here waits on them
+
+def test_retries_overload_before_the_first_chunk():
+    gateway = Gateway(max_retries=3)
+    attempt = scripted(Overloaded(), Overloaded(), {'slides': []})
+    assert gateway.call('test', 'key', 'model', attempt, 100) == ({'slides': []}, 'test', 'model')
+    lane = gateway.lane('test', 'key')
+    assert len(attempt.calls) == 3
+    assert lane.stats['retries'] == 2
+    assert lane.stats['overloaded'] == 2
+    assert lane.stats['ok'] == 1
+
+
+def test_no_retry_once_a_chunk_has_arrived():
+    gateway = Gateway(max_retries=3)
+    attempt = scripted((Overloaded(), 1))
+    with pytest.raises(Overloaded):
+        gateway.call('test', 'key', 'model', attempt, 100)
+    assert len(attempt.calls) == 1
+    assert gateway.lane('test', 'key').stats['retries'] == 0
+
+
+def test_other_errors_are_not_retried():
+    gateway = Gateway(max_retries=3)
+    attempt = scripted(BadRequest())
+    with pytest.raises(BadRequest):
+        gateway.call('test', 'key', 'model', attempt, 100)
+    assert len(attempt.calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    gateway = Gateway(max_retries=2)
+    attempt = scripted(Overloaded())
+    with pytest.raises(Overloaded):
+        gateway.call('test', 'key', 'model', attempt, 100)
+    assert len(attempt.calls) == 3
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, cooldown=60)
+    for _ in range(2):
+        breaker.record(False)
+    assert breaker.state == 'closed'
+    breaker.record(True)
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == 'open'
+    assert breaker.opens == 1
+    assert not breaker.allow()
+    assert breaker.retry_in() > 0
+
+
+def test_breaker_lets_one_probe_through_after_cooldown():
+    breaker = CircuitBreaker(failures=1, cooldown=0)
+    breaker.record(False)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == 'open'
+    assert breaker.opens == 2
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_neutral_outcome_frees_the_probe():
+    breaker = CircuitBreaker(failures=1, cooldown=0)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(None)
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+
+
+def test_invalid_replies_neither_open_nor_close_the_circuit():
+    gateway = Gateway(max_retries=0)
+    lane = gateway.lane('test', 'key')
+    lane.breaker.failures = 2
+    for _ in range(5):
+        with pytest.raises(SchemaError):
+            gateway.call('test', 'key', 'model', scripted(SchemaError('Response has no slides')), 100)
+    assert lane.breaker.state == 'closed'
+    assert lane.breaker.consecutive == 0
+    for error in (Overloaded(), NotImplementedByServer()):
+        with pytest.raises(type(error)):
+            gateway.call('test', 'key', 'model', scripted(error), 100)
+    assert lane.breaker.state == 'open'
+
+
+def test_open_circuit_fails_over_or_fails_fast():
+    gateway = Gateway(max_retries=0)
+    lane = gateway.lane('test', 'key')
+    lane.breaker.cooldown = 60
+    for _ in range(lane.breaker.failures):
+        lane.breaker.record(False)
+    attempt = scripted({'slides': []})
+    with pytest.raises(ProviderUnavailable):
+        gateway.call('test', 'key', 'model', attempt, 100)
+    assert attempt.calls == []
+    result = gateway.call('test', 'key', 'model', attempt, 100, failover=('other', 'key2', 'model2'))
+    assert result == ({'slides': []}, 'other', 'model2')
+    assert attempt.calls == ['other']
+    assert lane.stats['failovers'] == 1
+
+
+def test_aimd_grows_while_busy_and_fast():
+    limit = AdaptiveLimit(initial=4, minimum=1, maximum=8)
+    tickets = [limit.acquire() for _ in range(4)]
+    limit.release(tickets[0], first_chunk=0.1)
+    assert limit.limit == pytest.approx(4.25)
+    assert limit.increases == 1
+    # Half the slots free is no longer busy
+    limit.release(tickets[1], first_chunk=0.1)
+    limit.release(tickets[2], first_chunk=0.1)
+    assert limit.increases == 2
+
+
+def test_aimd_halves_once_per_round_on_overload():
+    limit = AdaptiveLimit(initial=8, minimum=1, maximum=16)
+    tickets = [limit.acquire() for _ in range(3)]
+    time.sleep(0.001)
+    limit.release(tickets[0], overloaded=True)
+    limit.release(tickets[1], overloaded=True)
+    assert limit.limit == 4
+    assert limit.decreases == 1
+    # A request sent after the decrease sees the new load and may lower it again
+    limit.release(limit.acquire(), overloaded=True)
+    assert limit.limit == 2
+    limit.release(tickets[2])
+
+
+def test_aimd_backs_off_when_first_chunk_slows():
+    limit = AdaptiveLimit(initial=8, minimum=1, maximum=16, tolerance=2.0)
+    for _ in range(provider_gateway.LATENCY_MIN_SAMPLES):
+        limit.release(limit.acquire(), first_chunk=0.1)
+    before = limit.limit
+    limit.release(limit.acquire(), first_chunk=0.5)
+    assert limit.limit == pytest.approx(before * provider_gateway.LATENCY_DECREASE)
+
+
+def test_aimd_blocks_at_the_limit():
+    limit = AdaptiveLimit(initial=1, minimum=1, maximum=1)
+    ticket = limit.acquire()
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (limit.acquire(), acquired.set()), daemon=True).start()
+    assert not acquired.wait(0.05)
+    limit.release(ticket)
+    assert acquired.wait(1)
+
+
+def test_token_bucket_debt_and_refund():
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(30) == pytest.approx(30, abs=0.1)
+    bucket.refund(30)
+    assert bucket.reserve(1) == pytest.approx(1, abs=0.1)
+    assert TokenBucket(0).reserve(10 ** 6) == 0
@@ -0,0 +1,40 @@
+import copy
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import BASE_DIR
+
+pytestmark = pytest.mark.skipif(
+    not shutil.which('node') or not os.path.isdir(os.path.join(BASE_DIR, 'node_modules', 'pptxgenjs')),
+    reason='needs node and pptxgenjs (npm install)')
+
+renderer_parity = pytest.importorskip('renderer_parity')
+
+with open(renderer_parity.DEFAULT_FIXTURE, encoding='utf-8') as f:
+    FIXTURE = json.load(f)
+
+
+def compare(tmp_path, fixture):
+    path = tmp_path / 'fixture.json'
+    path.write_text(json.dumps(fixture), encoding='utf-8')
+    return renderer_parity.compare(str(path))
+
+
+def test_engines_draw_the_fixture_alike():
+    slides, shapes, problems = renderer_parity.compare()
+    assert problems == []
+    assert slides == len(FIXTURE['slides']['slides']) and shapes
+
+
+def test_numbers_in_content_are_written_alike(tmp_path):
+    fixture = copy.deepcopy(FIXTURE)
+    slides = fixture['slides']['slides']
+    boxes = next(s for s in slides if s.get('layout') == 'numbered_boxes')
+    boxes['content']['boxes'] = [1.0, 2.5, 3, 1e-7]
+    flow = next(s for s in slides if s.get('layout') == 'flow_diagram')
+    flow['content']['steps'] = ['Receive', 2.0, {'text': 'Resolve'}, True]
+    _, _, problems = compare(tmp_path, fixture)
+    assert problems == []
@@ -0,0 +1,158 @@
+import copy
+
+import pytest
+
+from deck_planner import slide_prompt
+from fake_llm_server import FakeLLM
+from generation import deck_prompt
+from slide_repair import describe, repair_deck, trim_slide, validate_deck, validate_slide
+
+TOPIC = 'Tides'
+
+
+@pytest.fixture
+def deck():
+    # Title slide plus one slide of every layout, all within the limits
+    return FakeLLM().reply(deck_prompt(TOPIC, 7))
+
+
+class Model:
+    """call(prompt, schema) answered by the fake server's reply builder, recording the prompts"""
+
+    def __init__(self, title=None, error=None):
+        self.fake = FakeLLM()
+        self.title = title
+        self.error = error
+        self.prompts = []
+
+    def __call__(self, prompt, schema):
+        self.prompts.append(prompt)
+        if self.error:
+            raise self.error
+        response = self.fake.reply(prompt)
+        if self.title:
+            response['title'] = self.title
+        return response
+
+
+def slide_of(deck, layout):
+    return next(i for i, s in enumerate(deck['slides']) if s.get('layout') == layout)
+
+
+def test_valid_deck_needs_no_calls(deck):
+    assert validate_deck(deck) == {}
+    model = Model()
+    repaired, failed, report = repair_deck(model, TOPIC, deck)
+    assert repaired == deck and failed == [] and model.prompts == []
+    assert report['failing'] == 0
+    assert describe(report) == ''
+
+
+def test_missing_field_is_repaired_with_one_call(deck):
+    index = slide_of(deck, 'flow_diagram')
+    del deck['slides'][index]['content']['steps']
+    hard, _ = validate_slide(deck['slides'][index], index + 1)
+    assert hard
+    model = Model()
+    repaired, failed, report = repair_deck(model, TOPIC, deck, prompt=deck_prompt(TOPIC, 7), elapsed_s=10.0)
+    assert failed == []
+    assert len(model.prompts) == 1
+    assert '(layout: flow_diagram)' in model.prompts[0]
+    assert validate_slide(repaired['slides'][index], index + 1) == ([], [])
+    assert repaired['slides'][index]['title'] == deck['slides'][index]['title']
+    assert report['sent'] == report['repaired'] == 1
+    assert report['tokens_saved'] > 0
+    assert 'Repaired 1/1' in describe(report)
+
+
+def test_soft_issues_are_trimmed_without_a_call(deck):
+    index = slide_of(deck, 'numbered_boxes')
+    boxes = deck['slides'][index]['content']['boxes']
+    boxes.append('One box too many')
+    boxes[0] = ' '.join(['word'] * 30)
+    original = copy.deepcopy(deck)
+    model = Model()
+    repaired, failed, report = repair_deck(model, TOPIC, deck)
+    assert model.prompts == [] and failed == []
+    assert report['fixed_locally'] == 1 and report['sent'] == 0
+    assert validate_slide(repaired['slides'][index], index + 1) == ([], [])
+    assert repaired['slides'][index]['content']['boxes'][0] == ' '.join(['word'] * 15)
+    # The input is left as it was
+    assert deck == original
+    assert describe(report) == 'Fixed 1 slide(s) locally'
+
+
+def test_soft_issues_go_to_the_model_when_asked(deck):
+    index = slide_of(deck, 'three_boxes')
+    deck['slides'][index]['content']['boxes'].pop()
+    model = Model()
+    repaired, failed, report = repair_deck(model, TOPIC, deck, repair_soft=True)
+    assert len(model.prompts) == 1
+    assert report['sent'] == report['repaired'] == 1
+    assert len(repaired['slides'][index]['content']['boxes']) == 3
+
+
+def test_title_slide_gets_the_topic_locally(deck):
+    deck['slides'][0]['title'] = ''
+    model = Model()
+    repaired, failed, report = repair_deck(model, TOPIC, deck)
+    assert model.prompts == [] and failed == []
+    assert repaired['slides'][0]['title'] == TOPIC
+    assert report['fixed_locally'] == 1
+
+
+def test_missing_title_is_asked_for(deck):
+    index = slide_of(deck, 'icon_grid')
+    deck['slides'][index]['title'] = ''
+    model = Model(title='Tide tables')
+    repaired, failed, report = repair_deck(model, TOPIC, deck, slide_prompt=lambda slide, issues: 'unused')
+    # Without a title the per-slide prompt can't be used; the repair prompt asks for one
+    assert '"title": "..."' in model.prompts[0]
+    assert repaired['slides'][index]['title'] == 'Tide tables'
+    assert failed == []
+
+
+def test_slide_prompt_builds_the_repair_request(deck):
+    index = slide_of(deck, 'split_layout')
+    deck['slides'][index]['content'] = {}
+    built = []
+
+    def slide_prompt(slide, issues):
+        built.append((slide['slideNumber'], issues))
+        return f"Write slide {slide['slideNumber']} (layout: {slide['layout']})"
+
+    model = Model()
+    repaired, failed, report = repair_deck(model, TOPIC, deck, slide_prompt=slide_prompt)
+    assert model.prompts == [f"Write slide {index + 1} (layout: split_layout)"]
+    assert failed == []
+    # Every content slide's prompt is counted for the full-retry baseline, then the failing one is sent
+    assert [number for number, issues in built if not issues] == list(range(2, 9))
+    assert built[-1][0] == index + 1 and built[-1][1]
+
+
+def test_two_phase_repair_request_lists_the_issues(deck):
+    index = slide_of(deck, 'split_layout')
+    deck['slides'][index]['content'] = {}
+    issues = validate_slide(deck['slides'][index], index + 1)[0]
+    model = Model()
+    repair_deck(model, TOPIC, deck,
+                slide_prompt=lambda slide, issues: slide_prompt(TOPIC, slide, deck, issues=issues))
+    assert len(model.prompts) == 1
+    assert issues and all(issue in model.prompts[0] for issue in issues)
+
+
+def test_unrepairable_slides_are_dropped(deck):
+    index = slide_of(deck, 'comparison_table')
+    deck['slides'][index]['content'] = {}
+    number = deck['slides'][index]['slideNumber']
+    repaired, failed, report = repair_deck(Model(error=RuntimeError('down')), TOPIC, deck)
+    assert [n for n, _ in failed] == [number]
+    assert number not in [s['slideNumber'] for s in repaired['slides']]
+    assert len(repaired['slides']) == len(deck['slides']) - 1
+    assert report['still_failing'] == 1 and report['repaired'] == 0
+
+
+def test_trim_slide_leaves_other_slides_alone(deck):
+    title = deck['slides'][0]
+    assert trim_slide(title) is title
+    assert trim_slide({'layout': 'bogus', 'content': {}}) == {'layout': 'bogus', 'content': {}}
@@ -0,0 +1,206 @@
+"""Predict text overflow from font metrics before rendering.
+
+Neither engine turns on autofit, so a frame with more text than it can hold
+spills over its box (and the boxes drawn behind it) in PowerPoint. fit_slide()
+builds the slide's frames with the native layouts, word-wraps each text the way
+PowerPoint does using advance widths for the brand font, and where a frame
+would overflow picks the largest smaller font size that fits. The sizes go on
+the slide as "fontSizes" ({shape index: size}), which both renderers apply.
+Frames that don't fit even at the smallest allowed size get that size anyway
+and are reported so the slide can be flagged.
+
+The font files aren't shipped, so the advance widths (ASCII, per em) for
+Calibri and Arial are embedded below. Carlito and Liberation Sans/Arimo are
+metric-compatible and share the tables; any other font is measured as Arial,
+which runs wider than Calibri and so errs towards shrinking. Word widths and
+per-frame results are cached across slides and decks.
+
+Only the slide's own frames are fitted; the brand header and footer live on the
+slide layout and come from the brand config, not the model.
+"""
+import math
+import os
+import unicodedata
+from functools import lru_cache
+
+import pptx_native
+
+MIN_FONT_SIZE = float(os.environ.get('TEXT_FIT_MIN_PT', 8))
+MIN_SCALE = float(os.environ.get('TEXT_FIT_MIN_SCALE', 0.6))   # never shrink below 60% of the design size
+
+# PowerPoint's default left/right bodyPr inset; both engines leave the insets unset
+INSET_X_PT = 0.1 * 72
+
+# (units per em, line height in em, advance widths for chars 32..126)
+METRICS = {
+    ('calibri', False): (2048, 1.2207, (
+        463, 544, 823, 1019, 1038, 1463, 1397, 452, 621, 621, 1019, 1019, 511, 627, 517, 786,
+        1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 548, 548, 1019, 1019, 1019, 944,
+        1838, 1185, 1114, 1092, 1260, 1000, 941, 1292, 1276, 516, 653, 1064, 861, 1751, 1322, 1356,
+        1058, 1378, 1112, 941, 998, 1314, 1162, 1822, 1063, 998, 959, 628, 786, 628, 1019, 1019,
+        584, 981, 1076, 866, 1076, 1019, 625, 964, 1076, 470, 490, 931, 470, 1636, 1076, 1080,
+        1076, 1076, 714, 801, 686, 1076, 925, 1464, 887, 927, 809, 640, 943, 640, 1019)),
+    ('calibri', True): (2048, 1.2207, (
+        463, 568, 895, 1019, 1038, 1472, 1423, 452, 637, 637, 1019, 1019, 528, 625, 542, 786,
+        1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 568, 568, 1019, 1019, 1019, 948,
+        1832, 1235, 1149, 1084, 1290, 1007, 941, 1314, 1290, 546, 681, 1112, 866, 1778, 1329, 1384,
+        1082, 1405, 1146, 943, 996, 1346, 1215, 1867, 1114, 1048, 961, 663, 786, 663, 1019, 1019,
+        590, 1011, 1096, 856, 1096, 1034, 648, 968, 1096, 502, 524, 980, 502, 1673, 1096, 1100,
+        1096, 1096, 729, 817, 710, 1096, 967, 1519, 928, 969, 812, 664, 981, 664, 1019)),
+    ('arial', False): (1000, 1.149, (
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584)),
+    ('arial', True): (1000, 1.149, (
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584)),
+}
+FONT_ALIASES = {
+    'calibri': 'calibri', 'carlito': 'calibri',
+    'arial': 'arial', 'helvetica': 'arial', 'liberation sans': 'arial', 'arimo': 'arial',
+}
+FALLBACK_FONT = 'arial'
+
+# Typographic characters the models like, measured as their ASCII look-alikes
+PUNCTUATION = {'\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"', '\u2013': '-', '\u2014': 'W',
+               '\u2022': 'o', '\u2026': '...', '\u00a0': ' '}
+
+
+def font_key(font):
+    """Metrics family for a font name; unknown fonts fall back to Arial"""
+    return FONT_ALIASES.get(str(font or '').strip().lower(), FALLBACK_FONT)
+
+
+def _char_units(widths, em, ch):
+    code = ord(ch)
+    if 32 <= code < 127:
+        return widths[code - 32]
+    if ch in PUNCTUATION:
+        return sum(widths[ord(c) - 32] for c in PUNCTUATION[ch])
+    if unicodedata.east_asian_width(ch) in ('W', 'F') or code >= 0x1F000:
+        return em   # CJK and emoji are square
+    if unicodedata.combining(ch):
+        return 0
+    base = unicodedata.normalize('NFKD', ch)[0]
+    if 32 <= ord(base) < 127:
+        return widths[ord(base) - 32]   # accented Latin
+    return widths[ord('n') - 32]
+
+
+@lru_cache(maxsize=65536)
+def word_units(family, bold, word):
+    """Advance width of a word in font units"""
+    em, _, widths = METRICS[(family, bold)]
+    return sum(_char_units(widths, em, ch) for ch in word)
+
+
+def count_lines(text, family, bold, max_units):
+    """Lines PowerPoint needs for text when lines wrap at max_units (font units)"""
+    em, _, widths = METRICS[(family, bold)]
+    space = widths[0]
+    lines = 0
+    for paragraph in str(text).replace('\r\n', '\n').split('\n'):
+        lines += 1
+        used = 0
+        for word in paragraph.split(' '):
+            if not word:
+                if used:
+                    used += space
+                continue
+            units = word_units(family, bold, word)
+            if used and used + space + units <= max_units:
+                used += space + units
+                continue
+            if used:
+                lines += 1
+            if units <= max_units:
+                used = units
+                continue
+            # A word wider than the frame breaks between characters
+            used = 0
+            for ch in word:
+                w = _char_units(widths, em, ch)
+                if used and used + w > max_units:
+                    lines += 1
+                    used = 0
+                used += w
+    return lines
+
+
+def fits(text, font, size, w, h, bold=False):
+    """Whether text at size (pt) fits a w x h inch frame.
+
+    Lines wrap inside the left/right insets. Vertically the text may use the
+    top/bottom insets, and a single line always counts as fitting: several
+    template frames (footer, taglines) are drawn shorter than one line.
+    """
+    family = font_key(font)
+    em, line_height, _ = METRICS[(family, bool(bold))]
+    max_units = (w * 72 - 2 * INSET_X_PT) * em / size
+    if max_units <= 0:
+        return False
+    lines = count_lines(text, family, bool(bold), max_units)
+    return lines == 1 or lines * size * line_height <= h * 72
+
+
+def min_font_size(size):
+    return min(size, max(MIN_FONT_SIZE, math.ceil(size * MIN_SCALE)))
+
+
+@lru_cache(maxsize=16384)
+def fit_font_size(text, font, size, w, h, bold=False):
+    """(font size to use, fits): size itself when the text fits, else the largest whole-point size down to
+    min_font_size() that does, else the minimum with fits=False"""
+    if fits(text, font, size, w, h, bold):
+        return size, True
+    floor = min_font_size(size)
+    candidate = math.ceil(size) - 1
+    while candidate > floor:
+        if fits(text, font, candidate, w, h, bold):
+            return candidate, True
+        candidate -= 1
+    return floor, fits(text, font, floor, w, h, bold)
+
+
+def fit_slide(slide, theme):
+    """(slide with "fontSizes" for the frames that need shrinking, texts that overflow even at the minimum)"""
+    unfitted = {k: v for k, v in slide.items() if k != 'fontSizes'}
+    sizes, overflow = {}, []
+    for idx, (kind, text, x, y, w, h, opts) in enumerate(pptx_native.build_slide(unfitted, theme).shapes):
+        if kind != 'text' or not str(text).strip():
+            continue
+        size, ok = fit_font_size(str(text), opts['font'], opts['font_size'], w, h, opts['bold'])
+        if size != opts['font_size']:
+            sizes[str(idx)] = size
+        if not ok:
+            overflow.append(str(text))
+    if sizes:
+        unfitted['fontSizes'] = sizes
+    return unfitted, overflow
+
+
+def fit_deck(slide_structure, brand_config):
+    """(fitted slide structure, [(slideNumber, overflowing text)])"""
+    theme = pptx_native.make_theme(brand_config)
+    slides, overflow = [], []
+    for number, slide in enumerate(slide_structure['slides'], 1):
+        fitted, texts = fit_slide(slide, theme)
+        slides.append(fitted)
+        overflow.extend((slide.get('slideNumber', number), text) for text in texts)
+    return dict(slide_structure, slides=slides), overflow
+
+
+def describe(overflow):
+    """One line for the UI / logs, or '' when everything fits"""
+    if not overflow:
+        return ''
+    numbers = dict.fromkeys(number for number, _ in overflow)
+    return (f"Text still overflows on slide(s) {', '.join(map(str, numbers))} at the smallest allowed size; "
+            "consider shortening it")